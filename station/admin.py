@@ -9,12 +9,13 @@ from station.models import (
     Station,
     Route,
     Journey,
+    JourneyTemplate,
+    SeatHold,
 )
 
 
 from django.contrib import admin
 
-
 admin.site.register(TrainType)
 
 
@@ -73,6 +74,21 @@ class JourneyAdmin(ModelAdmin):
     )
 
 
+@admin.register(JourneyTemplate)
+class JourneyTemplateAdmin(ModelAdmin):
+    list_display = (
+        "route",
+        "train",
+        "departure",
+        "valid_from",
+        "valid_until",
+    )
+    list_filter = (
+        "train",
+        "route",
+    )
+
+
 class TicketInline(TabularInline):
     model = Ticket
 
@@ -86,3 +102,14 @@ class OrderAdmin(ModelAdmin):
         "user",
     )
     search_fields = ("user",)
+
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(ModelAdmin):
+    list_display = (
+        "journey",
+        "cargo",
+        "seat",
+        "user",
+        "expires_at",
+    )
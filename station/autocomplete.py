@@ -0,0 +1,170 @@
+import re
+import threading
+import unicodedata
+import uuid
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+from station.models import Station
+
+MAX_SUGGESTIONS = 50
+MAX_DISTANCE = 1
+MIN_FUZZY_LENGTH = 3
+VERSION_KEY = "station:autocomplete:version"
+
+
+def normalize(name: str) -> str:
+    """Case, accents and punctuation folded: "Kyïv-Pas." -> "kyiv pas" """
+    name = unicodedata.normalize("NFKD", name.casefold())
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", name))
+
+
+class PrefixTrie:
+    """
+    Every node keeps the first MAX_SUGGESTIONS station ids below it in
+    insertion order, so a prefix lookup is a walk down the query's
+    characters with no traversal of the subtree.
+    """
+
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []
+
+    def insert(self, key: str, station_id: int) -> None:
+        node = self
+        for char in key:
+            node = node.children.setdefault(char, PrefixTrie())
+            if len(node.ids) < MAX_SUGGESTIONS and station_id not in node.ids:
+                node.ids.append(station_id)
+
+    def lookup(self, prefix: str) -> list[int]:
+        node = self
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ids
+
+    def lookup_fuzzy(self, prefix: str, max_distance: int) -> Iterator[list]:
+        """
+        Ids below every key within max_distance edits (insertion,
+        deletion, substitution or swap of neighbours) of the prefix. The
+        walk only follows existing children and spends one edit per
+        detour, so it stays close to the exact path instead of comparing
+        against every key.
+        """
+        stack = [(self, 0, max_distance)]
+        seen = set()
+        while stack:
+            node, position, edits = stack.pop()
+            if not edits or position == len(prefix):
+                # Out of edits: the rest of the prefix must match exactly
+                for char in prefix[position:]:
+                    node = node.children.get(char)
+                    if node is None:
+                        break
+                else:
+                    if id(node) not in seen:
+                        seen.add(id(node))
+                        yield node.ids
+                continue
+
+            char = prefix[position]
+            child = node.children.get(char)
+            if child is not None:
+                stack.append((child, position + 1, edits))
+            stack.append((node, position + 1, edits - 1))
+            if position + 1 < len(prefix):
+                swapped = node.children.get(prefix[position + 1])
+                if swapped is not None:
+                    swapped = swapped.children.get(char)
+                if swapped is not None:
+                    stack.append((swapped, position + 2, edits - 1))
+            for other, child in node.children.items():
+                stack.append((child, position, edits - 1))
+                if other != char:
+                    stack.append((child, position + 1, edits - 1))
+
+
+class StationIndex:
+    """
+    Station names held in memory for type-ahead: a trie of whole names
+    and a trie of the words inside names ("main" finds "Lviv Main"),
+    both searched exactly first and then with up to MAX_DISTANCE typos.
+    """
+
+    def __init__(self, stations: Iterable[tuple[int, str]]):
+        self.names = {}
+        self.name_trie = PrefixTrie()
+        self.word_trie = PrefixTrie()
+
+        stations = sorted(stations, key=lambda station: normalize(station[1]))
+        for station_id, name in stations:
+            self.names[station_id] = name
+            key = normalize(name)
+            self.name_trie.insert(key, station_id)
+            for word in key.split()[1:]:
+                self.word_trie.insert(word, station_id)
+
+    def suggest(
+        self, query: str, limit: int = 10, max_distance: int = MAX_DISTANCE
+    ) -> list[dict]:
+        """
+        Stations whose name starts with the query, then those with a later
+        word starting with it, then the same within max_distance typos
+        (for queries of at least MIN_FUZZY_LENGTH characters)
+        """
+        query = normalize(query)
+        limit = min(limit, MAX_SUGGESTIONS)
+        if not query or limit < 1:
+            return []
+
+        found = dict.fromkeys(self.name_trie.lookup(query))
+        found.update(dict.fromkeys(self.word_trie.lookup(query)))
+        fuzzy = max_distance and len(query) >= MIN_FUZZY_LENGTH
+        if fuzzy and len(found) < limit:
+            for trie in (self.name_trie, self.word_trie):
+                for ids in trie.lookup_fuzzy(query, max_distance):
+                    if len(found) >= limit:
+                        break
+                    found.update(dict.fromkeys(ids))
+
+        return [
+            {"id": station_id, "name": self.names[station_id]}
+            for station_id in islice(found, limit)
+        ]
+
+
+_index: Optional[StationIndex] = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def get_station_index() -> StationIndex:
+    """
+    The process-wide index, built on first use and rebuilt once the
+    shared version changes (so every worker sees station edits)
+    """
+    global _index, _index_version
+
+    version = cache.get(VERSION_KEY)
+    if _index is None or version != _index_version:
+        with _lock:
+            if _index is None or version != _index_version:
+                stations = Station.objects.order_by().values_list("id", "name")
+                _index = StationIndex(stations)
+                _index_version = version
+    return _index
+
+
+def forget_station_index() -> None:
+    """Make every process rebuild its index once the transaction commits"""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    )
@@ -0,0 +1,241 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from station.exceptions import SeatsTaken
+from station.models import Journey, Order, Ticket, SeatHold
+from station.recurrence import Occurrence, materialize
+from station.seatmap import forget_seat_maps
+
+
+def unavailable_seats(seats: list[dict], user=None) -> list[dict]:
+    """Requested seats that are sold or held by somebody other than user"""
+    sold = (
+        Ticket.objects.among(seats)
+        .order_by()
+        .values_list("journey_id", "cargo", "seat")
+    )
+    held = (
+        SeatHold.objects.among(seats)
+        .active()
+        .exclude(user=user)
+        .order_by()
+        .values_list("journey_id", "cargo", "seat")
+    )
+    return [
+        {"journey": journey, "cargo": cargo, "seat": seat}
+        for journey, cargo, seat in sorted(sold.union(held))
+    ]
+
+
+def lock_journeys(journey_ids) -> None:
+    """
+    Take row locks on the journeys so that concurrent buyers of the same
+    journey queue up instead of racing on unique_seat_booking.
+    Locks are taken in id order to avoid deadlocks between group orders.
+    The journey lock guards every ticket and hold of that journey.
+    """
+    list(
+        Journey.objects.select_for_update()
+        .filter(pk__in=journey_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def _materialize(seats: list[dict]) -> list[dict]:
+    """
+    The seats with occurrences of templates replaced by the journeys
+    made of them, created in the caller's transaction
+    """
+    journeys = {}
+    resolved = []
+    for seat in seats:
+        journey = seat["journey"]
+        if isinstance(journey, Occurrence):
+            if journey.id not in journeys:
+                try:
+                    journeys[journey.id] = materialize(
+                        journey.template.pk, journey.day
+                    )
+                except Journey.DoesNotExist:
+                    raise ValidationError(
+                        {"journey": [f"{journey.id} has been cancelled."]}
+                    )
+            journey = journeys[journey.id]
+        resolved.append({**seat, "journey": journey})
+    return resolved
+
+
+def _release_holds(holds) -> int:
+    """Delete holds of journeys locked by the caller, freeing their seats"""
+    released = Counter(holds.values_list("journey_id", flat=True))
+    if released:
+        holds.delete()
+    for journey, count in released.items():
+        Journey.objects.filter(pk=journey).shift_tickets_available(count)
+    forget_seat_maps(released)
+    return sum(released.values())
+
+
+def book_tickets(tickets: list[dict], **order_fields) -> Order:
+    """
+    Create an order with the given tickets (dicts with journey instance,
+    cargo and seat) or raise SeatsTaken listing the seats sold meanwhile.
+    Seats the user holds are converted into the tickets. Occurrences of
+    templates are made into journeys, which a failed booking rolls back.
+    """
+    user = order_fields.get("user")
+
+    with transaction.atomic():
+        tickets = _materialize(tickets)
+        booked_per_journey = Counter(
+            ticket["journey"].pk for ticket in tickets
+        )
+        lock_journeys(booked_per_journey)
+
+        others_holds = SeatHold.objects.among(tickets).exclude(user=user)
+        _release_holds(others_holds.expired())
+
+        taken = unavailable_seats(tickets, user)
+        if taken:
+            raise SeatsTaken(taken)
+
+        order = Order.objects.create(**order_fields)
+        try:
+            with transaction.atomic():
+                Ticket.objects.bulk_create(
+                    Ticket(order=order, **ticket) for ticket in tickets
+                )
+        except IntegrityError:
+            # Only reachable for tickets written around the booking engine
+            raise SeatsTaken(unavailable_seats(tickets, user))
+
+        # Held seats are already counted as unavailable
+        own_holds = SeatHold.objects.among(tickets).filter(user=user)
+        booked_per_journey.subtract(
+            own_holds.values_list("journey_id", flat=True)
+        )
+        own_holds.delete()
+
+        # bulk_create bypasses the Ticket signals maintaining the counter.
+        # Journeys booked from holds only are shifted by 0 all the same,
+        # which moves their updated_at on for the snapshots of tickets
+        for journey, booked in booked_per_journey.items():
+            Journey.objects.filter(pk=journey).shift_tickets_available(-booked)
+        forget_seat_maps(booked_per_journey)
+
+    return order
+
+
+def hold_seats(
+    user, seats: list[dict], ttl: timedelta = None
+) -> list[SeatHold]:
+    """
+    Reserve the seats for the user until the hold expires.
+    Holding a seat the user already holds extends the hold, and
+    occurrences of templates are made into journeys as in book_tickets.
+    """
+    expires_at = timezone.now() + (ttl or settings.SEAT_HOLD_TTL)
+
+    with transaction.atomic():
+        seats = _materialize(seats)
+        held_per_journey = Counter(seat["journey"].pk for seat in seats)
+        lock_journeys(held_per_journey)
+
+        others_holds = SeatHold.objects.among(seats).exclude(user=user)
+        _release_holds(others_holds.expired())
+
+        taken = unavailable_seats(seats, user)
+        if taken:
+            raise SeatsTaken(taken)
+
+        own_holds = SeatHold.objects.among(seats).filter(user=user)
+        already_held = set(
+            own_holds.values_list("journey_id", "cargo", "seat")
+        )
+        own_holds.update(expires_at=expires_at)
+
+        new_holds = [
+            SeatHold(user=user, expires_at=expires_at, **seat)
+            for seat in seats
+            if (seat["journey"].pk, seat["cargo"], seat["seat"])
+            not in already_held
+        ]
+        SeatHold.objects.bulk_create(new_holds)
+
+        for journey, held in Counter(
+            hold.journey_id for hold in new_holds
+        ).items():
+            Journey.objects.filter(pk=journey).shift_tickets_available(-held)
+        forget_seat_maps(held_per_journey)
+
+    return list(SeatHold.objects.among(seats).filter(user=user).order_by("pk"))
+
+
+def cancel_hold(hold: SeatHold) -> None:
+    with transaction.atomic():
+        lock_journeys([hold.journey_id])
+        _release_holds(SeatHold.objects.filter(pk=hold.pk))
+
+
+def checkout_holds(user, hold_ids: list[int]) -> Order:
+    """
+    Turn the user's holds into an order. The holds are read under the
+    journey locks, so one expiring meanwhile is never booked.
+    """
+    holds = SeatHold.objects.filter(user=user, pk__in=hold_ids)
+    with transaction.atomic():
+        lock_journeys(holds.values_list("journey_id", flat=True))
+        holds = list(holds.active().select_related("journey__train"))
+        if len(holds) != len(set(hold_ids)):
+            raise ValidationError(
+                {"holds": ["Some of the holds have expired or do not exist."]}
+            )
+
+        return book_tickets(
+            [
+                {
+                    "journey": hold.journey,
+                    "cargo": hold.cargo,
+                    "seat": hold.seat,
+                }
+                for hold in holds
+            ],
+            user=user,
+        )
+
+
+def release_expired_holds(batch_size: int = 500) -> int:
+    """
+    Free the seats of expired holds, walking the expires_at index in
+    batches. Journeys locked by a booking in progress are skipped
+    (SKIP LOCKED) and picked up on the next run.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            journey_ids = set(
+                SeatHold.objects.expired()
+                .order_by("expires_at")
+                .values_list("journey_id", flat=True)[:batch_size]
+            )
+            if not journey_ids:
+                break
+
+            locked = list(
+                Journey.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=journey_ids)
+                .values_list("pk", flat=True)
+            )
+            if not locked:
+                break
+
+            released += _release_holds(
+                SeatHold.objects.expired().filter(journey_id__in=locked)
+            )
+    return released
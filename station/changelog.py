@@ -0,0 +1,71 @@
+import uuid
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class ChangeLog:
+    """
+    Ids of changed rows, numbered in the shared cache, so that every
+    process can bring its in-memory structures up to date by re-reading
+    only what changed. A log that was evicted or is too far behind tells
+    the reader to rebuild from scratch instead.
+    """
+
+    def __init__(self, name: str, timeout: int = 24 * 60 * 60, limit=1000):
+        self.name = name
+        self.timeout = timeout
+        self.limit = limit
+
+    @property
+    def _epoch_key(self) -> str:
+        return f"station:{self.name}:epoch"
+
+    def _key(self, epoch: str, suffix) -> str:
+        return f"station:{self.name}:{epoch}:{suffix}"
+
+    def position(self) -> tuple[str, int]:
+        """(epoch, last change number) the log has reached"""
+        cache.add(self._epoch_key, uuid.uuid4().hex, None)
+        epoch = cache.get(self._epoch_key)
+        return epoch, cache.get(self._key(epoch, "sequence"), 0)
+
+    def changes(
+        self, since: tuple[str, int], until: tuple[str, int]
+    ) -> Optional[set[int]]:
+        """Ids changed between the positions, None if they are lost"""
+        if since[0] != until[0]:
+            return None
+        missed = range(since[1] + 1, until[1] + 1)
+        if len(missed) > self.limit or since[1] > until[1]:
+            return None
+
+        keys = [self._key(until[0], number) for number in missed]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return None
+        return set().union(*changes.values())
+
+    def record(self, ids: Iterable[int]) -> None:
+        """Add the ids to the log once the transaction commits"""
+        ids = list(set(ids))
+
+        def log():
+            epoch, _ = self.position()
+            key = self._key(epoch, "sequence")
+            cache.add(key, 0, None)
+            number = cache.incr(key)
+            cache.set(self._key(epoch, number), ids, self.timeout)
+
+        if ids:
+            transaction.on_commit(log)
+
+    def reset(self) -> None:
+        """
+        Start a new epoch once the transaction commits, so that every
+        reader rebuilds (for changes too many to list)
+        """
+        transaction.on_commit(
+            lambda: cache.set(self._epoch_key, uuid.uuid4().hex, None)
+        )
@@ -0,0 +1,173 @@
+import math
+import threading
+import uuid
+from typing import Iterable, Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+
+from station.models import Station
+
+VERSION_KEY = "station:clusters:version"
+# Grid cells per side of a 256 px map tile, as a power of two (64 px cells)
+CELL_BITS = 2
+# Zooms above this one get its grid, where a cell is about 600 m wide
+MAX_ZOOM = 14
+MAX_MAP_ZOOM = 22
+# A viewport spanning more cells than that is served from a coarser zoom
+MAX_CELLS = 1024
+MAX_LATITUDE = 85.05112878
+
+
+def mercator(latitude, longitude) -> tuple:
+    """Web Mercator position scaled to [0, 1), y growing southwards"""
+    latitude = np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE)
+    x = (np.asarray(longitude, dtype=float) + 180) / 360
+    y = (1 - np.arcsinh(np.tan(np.radians(latitude))) / math.pi) / 2
+    return np.clip(x, 0, 1 - 1e-12), np.clip(y, 0, 1 - 1e-12)
+
+
+def _cells(position, bits: int):
+    """Index of the grid cell, 2 ** bits of them per side, of a position"""
+    return (np.asarray(position) * (1 << bits)).astype(np.int64)
+
+
+class _Grid:
+    """Occupied cells of one zoom, sorted by key = x << bits | y"""
+
+    def __init__(self, keys, counts, latitudes, longitudes, stations):
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, counts).astype(np.int64)
+        self.latitudes = np.bincount(inverse, latitudes * counts)
+        self.latitudes = self.latitudes / self.counts
+        self.longitudes = np.bincount(inverse, longitudes * counts)
+        self.longitudes = self.longitudes / self.counts
+        # Lowest station id in the cell, the station itself when alone
+        self.stations = np.full(len(self.keys), np.iinfo(np.int64).max)
+        np.minimum.at(self.stations, inverse, stations)
+
+    def coarser(self, bits: int) -> "_Grid":
+        """The grid of the zoom below, four cells merged into one"""
+        x, y = self.keys >> bits, self.keys & ((1 << bits) - 1)
+        return _Grid(
+            (x >> 1) << (bits - 1) | y >> 1,
+            self.counts,
+            self.latitudes,
+            self.longitudes,
+            self.stations,
+        )
+
+
+class StationClusters:
+    """
+    Stations counted in the cells of a square grid laid over the Web
+    Mercator map at every zoom, each cell placed at the mean position of
+    its stations. All zooms are computed up front from the finest one,
+    so a viewport is answered with two binary searches per grid column,
+    and it never spans more than MAX_CELLS cells.
+    """
+
+    def __init__(self, stations: Iterable[tuple[int, str, float, float]]):
+        self.names = {}
+        ids, latitudes, longitudes = [], [], []
+        for station_id, name, latitude, longitude in stations:
+            self.names[station_id] = name
+            ids.append(station_id)
+            latitudes.append(latitude)
+            longitudes.append(longitude)
+        latitudes = np.array(latitudes, dtype=float)
+        longitudes = np.array(longitudes, dtype=float)
+
+        bits = MAX_ZOOM + CELL_BITS
+        x, y = mercator(latitudes, longitudes)
+        self.grids = [
+            _Grid(
+                _cells(x, bits) << bits | _cells(y, bits),
+                np.ones(len(ids), np.int64),
+                latitudes,
+                longitudes,
+                np.array(ids, dtype=np.int64),
+            )
+        ]
+        for zoom in range(MAX_ZOOM, 0, -1):
+            self.grids.append(self.grids[-1].coarser(zoom + CELL_BITS))
+        self.grids.reverse()
+
+    def clusters(
+        self,
+        west: float,
+        south: float,
+        east: float,
+        north: float,
+        zoom: int,
+    ) -> tuple[int, list[dict]]:
+        """
+        (zoom served, clusters) of the stations inside the bounding box,
+        which crosses the antimeridian when west > east
+        """
+        left, top = mercator(north, west)
+        right, bottom = mercator(south, east)
+        zoom = min(zoom, MAX_ZOOM)
+        while True:
+            bits = zoom + CELL_BITS
+            first, last = int(_cells(left, bits)), int(_cells(right, bits))
+            if west > east:
+                xs = np.r_[first : 1 << bits, 0 : last + 1]
+            else:
+                xs = np.arange(first, last + 1)
+            rows = int(_cells(top, bits)), int(_cells(bottom, bits))
+            if not zoom or len(xs) * (rows[1] - rows[0] + 1) <= MAX_CELLS:
+                break
+            zoom -= 1
+
+        grid = self.grids[zoom]
+        starts = np.searchsorted(grid.keys, xs << bits | rows[0])
+        ends = np.searchsorted(grid.keys, xs << bits | rows[1], "right")
+
+        clusters = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            for index in range(start, end):
+                count = int(grid.counts[index])
+                station = int(grid.stations[index]) if count == 1 else None
+                clusters.append(
+                    {
+                        "latitude": round(float(grid.latitudes[index]), 6),
+                        "longitude": round(float(grid.longitudes[index]), 6),
+                        "count": count,
+                        "station": station,
+                        "name": self.names.get(station),
+                    }
+                )
+        return zoom, clusters
+
+
+_clusters: Optional[StationClusters] = None
+_clusters_version = None
+_lock = threading.Lock()
+
+
+def get_station_clusters() -> StationClusters:
+    """
+    The process-wide clusters, built on first use and rebuilt once the
+    shared version changes
+    """
+    global _clusters, _clusters_version
+
+    version = cache.get(VERSION_KEY)
+    if _clusters is None or version != _clusters_version:
+        with _lock:
+            if _clusters is None or version != _clusters_version:
+                stations = Station.objects.order_by().values_list(
+                    "id", "name", "latitude", "longitude"
+                )
+                _clusters = StationClusters(stations)
+                _clusters_version = version
+    return _clusters
+
+
+def forget_station_clusters() -> None:
+    """Make every process regroup the stations once the transaction commits"""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    )
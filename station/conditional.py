@@ -0,0 +1,118 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from station.response_cache import cache_response, get_cached_response
+from station.versions import table_versions
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETag and Last-Modified headers on list and retrieve, derived
+    from the versions of the tables their responses are built from
+    (version_tables), so a client holding the current representation
+    gets 304 Not Modified before any query runs or anything is
+    serialized.
+
+    Responses that also change with the clock (like seats held until a
+    moment) set validators_lifetime, the seconds after which their
+    validators change anyway.
+
+    With cache_responses, anonymous JSON responses are also kept rendered
+    in the "responses" cache under their ETag, which any write to the
+    tables moves on, so stale entries are never read again.
+    """
+
+    version_tables: tuple = ()
+    validators_lifetime: int = 0
+    cache_responses: bool = False
+    # (versions, last modified) of version_tables read for this request
+    versions: tuple = None
+
+    def get_validators(
+        self, request, versions: tuple = None
+    ) -> tuple[str, datetime]:
+        """
+        ETag and Last-Modified of the response to the request, at the
+        given (versions, last modified) of version_tables or the current
+        ones
+        """
+        versions, last_modified = versions or table_versions(
+            self.version_tables
+        )
+        user = request.user
+        representation = [
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+            user.pk if user.is_authenticated else None,
+            versions,
+        ]
+        if self.validators_lifetime:
+            period = int(time.time()) // self.validators_lifetime
+            representation.append(period)
+            started = datetime.fromtimestamp(
+                period * self.validators_lifetime, dt_timezone.utc
+            )
+            last_modified = max(last_modified, started)
+
+        digest = hashlib.blake2b(
+            repr(representation).encode(), digest_size=16
+        ).hexdigest()
+        return f'"{digest}"', last_modified
+
+    def can_cache_response(self, request) -> bool:
+        """
+        Only JSON responses that are the same for every anonymous client;
+        the browsable API pages carry per-session data like CSRF tokens
+        """
+        return (
+            self.cache_responses
+            and isinstance(
+                getattr(request, "accepted_renderer", None), JSONRenderer
+            )
+            and not request.user.is_authenticated
+            and "HTTP_AUTHORIZATION" not in request.META
+        )
+
+    def conditional(self, handler, request, *args, **kwargs):
+        self.versions = table_versions(self.version_tables)
+        etag, last_modified = self.get_validators(request, self.versions)
+        timestamp = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None and self.can_cache_response(request):
+            response = get_cached_response(self.basename, etag)
+            if response is None:
+                response = handler(request, *args, **kwargs)
+                cache_response(etag, response)
+                response["X-Cache"] = "MISS"
+            else:
+                response["X-Cache"] = "HIT"
+        elif response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+        if "ETag" not in response:
+            self.set_validators(response, etag, last_modified)
+        elif response["ETag"] != etag:
+            # Built from older versions, which the client may hold already
+            response = get_conditional_response(
+                request, etag=response["ETag"], response=response
+            )
+        return response
+
+    @staticmethod
+    def set_validators(response, etag: str, last_modified: datetime):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
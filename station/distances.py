@@ -0,0 +1,217 @@
+import heapq
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from station.models import Station, Route
+
+VERSION_KEY = "station:distances:version"
+# Share of connected station pairs above which the vectorized
+# Floyd-Warshall beats a pure Python Dijkstra run from every station
+# (measured: they break even around 1000 stations with 2500 routes)
+DENSE_RATIO = 0.0025
+# Seconds after which the matrices of other versions are deleted, long
+# enough for a process building or loading one of them to be done
+STALE_AGE = 3600
+
+
+def floyd_warshall(matrix: np.ndarray) -> np.ndarray:
+    """Relax every pair through each station in turn, one row at a time"""
+    for via in range(len(matrix)):
+        np.minimum(
+            matrix, matrix[:, via, None] + matrix[None, via, :], out=matrix
+        )
+    return matrix
+
+
+def dijkstra(matrix: np.ndarray) -> np.ndarray:
+    """Shortest paths from every station over the finite entries only"""
+    adjacency = [
+        [
+            (int(neighbour), float(row[neighbour]))
+            for neighbour in np.flatnonzero(np.isfinite(row))
+            if neighbour != station
+        ]
+        for station, row in enumerate(matrix)
+    ]
+    result = np.full_like(matrix, np.inf)
+    for start in range(len(matrix)):
+        best = {start: 0.0}
+        queue = [(0.0, start)]
+        while queue:
+            distance, station = heapq.heappop(queue)
+            if distance > best[station]:
+                continue
+            for neighbour, length in adjacency[station]:
+                candidate = distance + length
+                if candidate < best.get(neighbour, np.inf):
+                    best[neighbour] = candidate
+                    heapq.heappush(queue, (candidate, neighbour))
+        result[start, list(best)] = list(best.values())
+    return result
+
+
+def shortest_distances(
+    stations: list[int], routes: Iterable[tuple[int, int, int]]
+) -> np.ndarray:
+    """
+    All-pairs shortest distances over routes (source, destination,
+    distance), which are one-way. Unreachable pairs are inf.
+    """
+    position = {station: index for index, station in enumerate(stations)}
+    matrix = np.full((len(stations), len(stations)), np.inf, np.float32)
+    np.fill_diagonal(matrix, 0)
+    for source, destination, distance in routes:
+        i, j = position[source], position[destination]
+        matrix[i, j] = min(matrix[i, j], distance)
+
+    edges = np.isfinite(matrix).sum() - len(stations)
+    if edges >= DENSE_RATIO * len(stations) ** 2:
+        return floyd_warshall(matrix)
+    return dijkstra(matrix)
+
+
+class DistanceMatrix:
+    """Shortest distances between stations, memory-mapped from disk"""
+
+    def __init__(self, stations: np.ndarray, distances: np.ndarray):
+        self.stations = stations
+        self.distances = distances
+
+    def index(self, station_ids: Iterable[int]) -> np.ndarray:
+        """Matrix positions of the stations, -1 for unknown ones"""
+        station_ids = np.asarray(list(station_ids), dtype=np.int64)
+        positions = np.searchsorted(self.stations, station_ids)
+        positions = np.minimum(positions, len(self.stations) - 1)
+        found = len(self.stations) > 0
+        if found:
+            found = self.stations[positions] == station_ids
+        return np.where(found, positions, -1)
+
+    def from_station(self, station_id: int) -> list[dict]:
+        """Every station reachable from this one, nearest first"""
+        (position,) = self.index([station_id])
+        if position < 0:
+            return []
+        row = self.distances[position]
+        reachable = np.flatnonzero(np.isfinite(row))
+        reachable = reachable[reachable != position]
+        reachable = reachable[np.argsort(row[reachable], kind="stable")]
+        return [
+            {"station": int(self.stations[index]), "distance": int(row[index])}
+            for index in reachable
+        ]
+
+    def between(self, station_ids: list[int]) -> list[list[Optional[int]]]:
+        """Distances between the stations, None where there is no way"""
+        positions = self.index(station_ids)
+        known = positions >= 0
+        block = np.full((len(positions), len(positions)), np.inf)
+        block[np.ix_(known, known)] = self.distances[
+            np.ix_(positions[known], positions[known])
+        ]
+        return [
+            [
+                int(distance) if math.isfinite(distance) else None
+                for distance in row
+            ]
+            for row in block.tolist()
+        ]
+
+
+def _paths(version: str) -> tuple[Path, Path]:
+    directory = Path(settings.STATION_DISTANCES_DIR)
+    return (
+        directory / f"stations-{version}.npy",
+        directory / f"distances-{version}.npy",
+    )
+
+
+def build_distance_matrix(version: str) -> None:
+    """Compute the matrix, save it as the version and drop stale ones"""
+    stations = list(
+        Station.objects.order_by("id").values_list("id", flat=True)
+    )
+    routes = Route.objects.order_by().values_list(
+        "source_id", "destination_id", "distance"
+    )
+    distances = shortest_distances(stations, routes)
+
+    directory = Path(settings.STATION_DISTANCES_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path, data in zip(
+        _paths(version), (np.array(stations, dtype=np.int64), distances)
+    ):
+        # Written aside and renamed, so readers never map a partial file
+        partial = path.with_suffix(f".{uuid.uuid4().hex}.partial")
+        with open(partial, "wb") as file:
+            np.save(file, data)
+        os.replace(partial, path)
+
+    # Another process may be building or about to load the current
+    # version, or one it has just read
+    kept = {
+        path.name
+        for kept_version in (version, cache.get(VERSION_KEY))
+        if kept_version is not None
+        for path in _paths(kept_version)
+    }
+    stale = time.time() - STALE_AGE
+    for path in directory.glob("*.npy"):
+        try:
+            if path.name not in kept and path.stat().st_mtime < stale:
+                path.unlink()
+        except FileNotFoundError:
+            # Deleted by another process meanwhile
+            pass
+
+
+def _load(version: str) -> DistanceMatrix:
+    stations_path, distances_path = _paths(version)
+    return DistanceMatrix(
+        np.load(stations_path), np.load(distances_path, mmap_mode="r")
+    )
+
+
+_matrix: Optional[DistanceMatrix] = None
+_matrix_version = None
+_lock = threading.Lock()
+
+
+def get_distance_matrix() -> DistanceMatrix:
+    """
+    The matrix of the current route network version, mapped once per
+    process. The first process to need a version computes and saves it.
+    """
+    global _matrix, _matrix_version
+
+    cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+    version = cache.get(VERSION_KEY)
+    if _matrix is not None and version == _matrix_version:
+        return _matrix
+
+    with _lock:
+        if _matrix is None or version != _matrix_version:
+            try:
+                _matrix = _load(version)
+            except FileNotFoundError:
+                build_distance_matrix(version)
+                _matrix = _load(version)
+            _matrix_version = version
+    return _matrix
+
+
+def forget_distances() -> None:
+    """Have the matrix recomputed for the new network after the commit"""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    )
@@ -0,0 +1,25 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class SeatsTaken(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are already taken."
+    default_code = "seats_taken"
+
+    def __init__(self, taken_seats: list[dict]):
+        super().__init__()
+        # Set after __init__ so the seat numbers are not coerced to strings
+        self.detail = {"detail": self.detail, "taken_seats": taken_seats}
+
+
+class NoContiguousSeats(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "There is no block of adjacent free seats that large."
+    default_code = "no_contiguous_seats"
+
+
+class SnapshotRunning(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A snapshot is being written already."
+    default_code = "snapshot_running"
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db.models import Count, F, QuerySet
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+
+from station.models import Journey, Ticket, Order
+
+# Rows fetched per round trip of the server-side cursor
+CHUNK_SIZE = 2000
+# Bytes collected before they are handed to the client
+FLUSH_SIZE = 64 * 1024
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def day_start(day: date) -> datetime:
+    start = datetime.combine(day, time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start, timezone.get_default_timezone())
+    return start
+
+
+def between_days(
+    queryset: QuerySet, field: str, start: date = None, end: date = None
+) -> QuerySet:
+    """Rows whose field falls on the local days from start to end"""
+    if start is not None:
+        queryset = queryset.filter(**{f"{field}__gte": day_start(start)})
+    if end is not None:
+        queryset = queryset.filter(
+            **{f"{field}__lt": day_start(end + timedelta(days=1))}
+        )
+    return queryset
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Writes rows of values as they are read, in pieces of FLUSH_SIZE, so
+    an export of any length is held in memory one piece at a time
+    """
+
+    charset = "utf-8"
+
+    def stream(self, header: tuple, rows: Iterable[tuple]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        write = self.writer(buffer, header)
+        for row in rows:
+            write([_plain(value) for value in row])
+            if buffer.tell() >= FLUSH_SIZE:
+                yield buffer.getvalue().encode(self.charset)
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """The whole of data given as (header, rows), for small exports"""
+        return b"".join(self.stream(*data))
+
+    def writer(
+        self, buffer: io.StringIO, header: tuple
+    ) -> Callable[[list], None]:
+        """Function writing one row to the buffer"""
+        raise NotImplementedError
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def writer(self, buffer, header):
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        return writer.writerow
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def writer(self, buffer, header):
+        def write(row):
+            buffer.write(
+                json.dumps(dict(zip(header, row)), ensure_ascii=False)
+            )
+            buffer.write("\n")
+
+        return write
+
+
+def _rows(queryset: QuerySet, header: tuple) -> tuple[tuple, Iterator]:
+    return header, queryset.values_list(*header).iterator(CHUNK_SIZE)
+
+
+def journey_rows(
+    start: Optional[date] = None, end: Optional[date] = None
+) -> tuple[tuple, Iterator]:
+    """Journeys departing from start to end with their free seats"""
+    journeys = between_days(
+        Journey.objects.order_by("departure_time", "id"),
+        "departure_time",
+        start,
+        end,
+    ).annotate(
+        source=F("route__source__name"),
+        destination=F("route__destination__name"),
+        train_name=F("train__name"),
+        train_type=F("train__train_type__name"),
+        capacity=F("train__cargo_num") * F("train__places_in_cargo"),
+    )
+    return _rows(
+        journeys,
+        (
+            "id",
+            "source",
+            "destination",
+            "train_name",
+            "train_type",
+            "departure_time",
+            "arrival_time",
+            "capacity",
+            "tickets_available",
+        ),
+    )
+
+
+def ticket_rows(journey: Journey) -> tuple[tuple, Iterator]:
+    """Tickets sold for the journey, seat by seat"""
+    tickets = (
+        Ticket.objects.filter(journey=journey)
+        .order_by("cargo", "seat")
+        .annotate(
+            ordered_at=F("order__created_at"), email=F("order__user__email")
+        )
+    )
+    return _rows(
+        tickets,
+        (
+            "id",
+            "journey_id",
+            "cargo",
+            "seat",
+            "order_id",
+            "ordered_at",
+            "email",
+        ),
+    )
+
+
+def order_rows(
+    start: Optional[date] = None, end: Optional[date] = None
+) -> tuple[tuple, Iterator]:
+    """Orders placed from start to end with the number of their tickets"""
+    orders = between_days(
+        Order.objects.order_by("created_at", "id"), "created_at", start, end
+    ).annotate(email=F("user__email"), tickets_count=Count("tickets"))
+    return _rows(orders, ("id", "created_at", "email", "tickets_count"))
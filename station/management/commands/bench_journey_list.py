@@ -0,0 +1,133 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from station.models import (
+    Crew,
+    Journey,
+    Route,
+    Station,
+    Train,
+    TrainType,
+)
+from station.serializers import (
+    JourneyListSerializer,
+    JourneyRowSerializer,
+    JourneyRowListSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rendering journey lists from model instances and from "
+        "column rows. Works on synthetic journeys inside a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--journeys", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        stations = Station.objects.bulk_create(
+            Station(name=f"Bench {i}", latitude=48 + i, longitude=24 + i)
+            for i in range(10)
+        )
+        routes = Route.objects.bulk_create(
+            Route(source=source, destination=destination, distance=500)
+            for source in stations
+            for destination in stations
+            if source != destination
+        )
+        train_type = TrainType.objects.create(name="Bench")
+        trains = Train.objects.bulk_create(
+            Train(
+                name=f"Bench {i}",
+                cargo_num=10,
+                places_in_cargo=50,
+                train_type=train_type,
+            )
+            for i in range(20)
+        )
+        crew = Crew.objects.bulk_create(
+            Crew(first_name=f"Bench {i}", last_name="Crew") for i in range(30)
+        )
+        start = timezone.make_aware(datetime(2030, 1, 1))
+        journeys = Journey.objects.bulk_create(
+            (
+                Journey(
+                    route=routes[i % len(routes)],
+                    train=trains[i % len(trains)],
+                    departure_time=start + timedelta(minutes=17 * i),
+                    tickets_available=500,
+                )
+                for i in range(options["journeys"])
+            ),
+            batch_size=5000,
+        )
+        Journey.crew_members.through.objects.bulk_create(
+            (
+                Journey.crew_members.through(
+                    journey=journey, crew=crew[(i + j) % len(crew)]
+                )
+                for i, journey in enumerate(journeys)
+                for j in range(3)
+            ),
+            batch_size=5000,
+        )
+        if connection.vendor == "postgresql":
+            # Fresh statistics so the planner sees the synthetic journeys
+            with connection.cursor() as cursor:
+                for model in (Journey, Journey.crew_members.through):
+                    cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+        ids = [journey.id for journey in journeys]
+        self.stdout.write(
+            f"{'journeys':>8} {'instances, ms':>14} {'rows, ms':>10}"
+        )
+        for size in (20, 100, 1000, len(ids)):
+            page = Journey.objects.filter(id__in=ids[:size]).order_by(
+                "-departure_time", "-id"
+            )
+            instances = self.measure(
+                lambda: JourneyListSerializer(
+                    page.select_related(
+                        "train__train_type",
+                        "route__source",
+                        "route__destination",
+                    ).prefetch_related("crew_members"),
+                    many=True,
+                ).data,
+                options["repeat"],
+            )
+            rows = self.measure(
+                lambda: JourneyRowSerializer(
+                    page.values(*JourneyRowListSerializer.COLUMNS), many=True
+                ).data,
+                options["repeat"],
+            )
+            if instances[1] != rows[1]:
+                raise CommandError(f"Rendered lists of {size} differ")
+            self.stdout.write(
+                f"{size:>8} {instances[0]:>14.2f} {rows[0]:>10.2f}"
+            )
+
+    @staticmethod
+    def measure(serialize, repeat) -> tuple[float, bytes]:
+        """Median milliseconds to fetch and render, and the rendered bytes"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = JSONRenderer().render(serialize())
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000, content
@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from station.models import Order
+from station.views import OrderPagination, OrderCursorPagination
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare page latency of numbered and cursor order pages at "
+        "growing depth. Works on synthetic orders inside a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=50_000)
+        parser.add_argument("--page-size", type=int, default=8)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        user = get_user_model().objects.create(email="bench@bench.bench")
+        Order.objects.bulk_create(
+            (Order(user=user) for _ in range(options["orders"])),
+            batch_size=5000,
+        )
+        if connection.vendor == "postgresql":
+            # Fresh statistics so the planner sees the synthetic orders
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Order._meta.db_table}")
+        orders = Order.objects.filter(user=user)
+        page_size = options["page_size"]
+        pages = options["orders"] // page_size
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+
+        self.stdout.write(
+            f"{'page':>8} {'numbered, ms':>14} {'cursor, ms':>12}"
+        )
+        for page in (1, pages // 100, pages // 10, pages // 2, pages):
+            page = max(page, 1)
+            numbered = Request(
+                factory.get("/", {"page": page, "page_size": page_size})
+            )
+
+            # The cursor a client would hold after reaching this depth
+            cursor = None
+            if page > 1:
+                last_seen = orders.order_by("-created_at", "-id")[
+                    (page - 1) * page_size - 1
+                ]
+                paginator = OrderCursorPagination()
+                paginator.base_url = "http://localhost/"
+                paginator.fields = ["created_at", "id"]
+                cursor = paginator.encode_cursor(False, last_seen)
+            keyset = Request(factory.get(cursor or "/"))
+
+            repeat = options["repeat"]
+            numbered_ms = self.measure(
+                OrderPagination, orders, numbered, repeat
+            )
+            cursor_ms = self.measure(
+                OrderCursorPagination, orders, keyset, repeat
+            )
+            self.stdout.write(
+                f"{page:>8} {numbered_ms:>14.2f} {cursor_ms:>12.2f}"
+            )
+
+    @staticmethod
+    def measure(pagination_class, queryset, request, repeat) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            paginator = pagination_class()
+            page = paginator.paginate_queryset(queryset, request)
+            paginator.get_paginated_response([order.pk for order in page])
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000
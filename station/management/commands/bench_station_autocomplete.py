@@ -0,0 +1,94 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from station.autocomplete import StationIndex
+from station.models import Station
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare type-ahead latency of the in-memory station index with "
+        "the icontains list query. Works on synthetic stations inside a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stations", type=int, default=20_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        rand = random.Random(options["seed"])
+
+        def word():
+            return "".join(
+                rand.choices(string.ascii_lowercase, k=rand.randint(4, 9))
+            ).capitalize()
+
+        names = {
+            f"{word()} {word()} {number}"
+            for number in range(options["stations"])
+        }
+        Station.objects.bulk_create(
+            (Station(name=name, latitude=0, longitude=0) for name in names),
+            batch_size=5000,
+        )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Station._meta.db_table}")
+
+        started = time.perf_counter()
+        index = StationIndex(
+            Station.objects.order_by().values_list("id", "name")
+        )
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f"index of {len(names)} names built in " f"{build_ms:.0f} ms"
+        )
+
+        samples = rand.sample(sorted(names), options["queries"])
+        prefixes = [name[: rand.randint(2, 6)] for name in samples]
+        typos = []
+        for name in samples:
+            first = name.split()[0].lower()
+            position = rand.randrange(len(first))
+            typos.append(
+                first[:position]
+                + rand.choice(string.ascii_lowercase)
+                + first[position + 1 :]
+            )
+
+        self.stdout.write(
+            f"{'query':>8} {'icontains, us':>15} {'index, us':>11}"
+        )
+        for label, queries in (("prefix", prefixes), ("typo", typos)):
+            database = self.measure(
+                lambda query: list(
+                    Station.objects.filter(name__icontains=query).values(
+                        "id", "name"
+                    )[:10]
+                ),
+                queries,
+            )
+            memory = self.measure(index.suggest, queries)
+            self.stdout.write(f"{label:>8} {database:>15.1f} {memory:>11.1f}")
+
+    @staticmethod
+    def measure(lookup, queries) -> float:
+        """Median microseconds per lookup"""
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            lookup(query)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1_000_000
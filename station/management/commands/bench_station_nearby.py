@@ -0,0 +1,77 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from station.nearby import StationTree, unit_vector, chord_to_km
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure nearest-station lookups in the k-d tree against a full "
+        "scan, on synthetic stations spread evenly over the globe"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stations", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--radius", type=float, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rand = random.Random(options["seed"])
+
+        def point():
+            latitude = math.degrees(math.asin(rand.uniform(-1, 1)))
+            return latitude, rand.uniform(-180, 180)
+
+        stations = [
+            (number, f"Station {number}", *point())
+            for number in range(options["stations"])
+        ]
+        started = time.perf_counter()
+        tree = StationTree(stations)
+        build = time.perf_counter() - started
+        self.stdout.write(
+            f"tree of {len(tree)} stations built in {build * 1000:.0f} ms"
+        )
+
+        queries = [point() for _ in range(options["queries"])]
+        k, radius = options["k"], options["radius"]
+        self.stdout.write(f"{'lookup':>12} {'median, us':>12}")
+        for label, lookup in (
+            (f"{k} nearest", lambda lat, lon: tree.search(lat, lon, k)),
+            (
+                f"{radius:g} km",
+                lambda lat, lon: tree.search(lat, lon, radius=radius),
+            ),
+            ("full scan", lambda lat, lon: self.scan(tree, lat, lon, k)),
+        ):
+            repeat = queries if label != "full scan" else queries[:20]
+            self.stdout.write(
+                f"{label:>12} {self.measure(lookup, repeat):>12.1f}"
+            )
+
+    @staticmethod
+    def scan(tree, latitude, longitude, k):
+        query = unit_vector(latitude, longitude)
+        nearest = sorted(
+            (math.dist(point, query), station_id)
+            for station_id, point in tree.points.items()
+        )[:k]
+        return [
+            (chord_to_km(chord), station_id) for chord, station_id in nearest
+        ]
+
+    @staticmethod
+    def measure(lookup, queries) -> float:
+        """Median microseconds per lookup"""
+        timings = []
+        for latitude, longitude in queries:
+            started = time.perf_counter()
+            lookup(latitude, longitude)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2] * 1_000_000
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from station.distances import get_distance_matrix
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the shortest distances between stations for the current "
+        "route network ahead of the first request that needs them"
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        matrix = get_distance_matrix()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Distances between {len(matrix.stations)} stations "
+                f"ready in {elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from station.timetable import TimetableError, import_timetable
+
+
+class Command(BaseCommand):
+    help = (
+        "Import stations.csv, routes.csv, trips.csv and "
+        "crew_assignments.csv from a directory in one transaction, "
+        "refusing all of it if any row is at fault"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            rows, written = import_timetable(options["directory"])
+        except TimetableError as error:
+            raise CommandError(f"Nothing imported:\n{error}")
+        elapsed = time.perf_counter() - started
+
+        for table, count in written.items():
+            rows_of = ", ".join(f"{n} {what}" for what, n in count.items())
+            self.stdout.write(f"{table}: {rows_of}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{rows} rows imported in {elapsed:.2f}s "
+                f"({rows / max(elapsed, 1e-9):.0f} rows/s)."
+            )
+        )
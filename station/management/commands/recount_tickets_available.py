@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from station.models import Journey
+
+
+class Command(BaseCommand):
+    help = (
+        "Find journeys whose stored tickets_available counter drifted "
+        "from the tickets actually sold and seats held, and repair them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "journey_ids",
+            nargs="*",
+            type=int,
+            help="Only check these journeys (all journeys by default)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report drifted journeys without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        journeys = Journey.objects.all()
+        if options["journey_ids"]:
+            journeys = journeys.filter(pk__in=options["journey_ids"])
+
+        drifted = list(
+            journeys.order_by()
+            .annotate(actual=Journey.objects.actual_tickets_available())
+            .filter(~Q(tickets_available=F("actual")))
+            .values_list("pk", flat=True)
+        )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("No drift found."))
+            return
+
+        self.stdout.write(f"Drifted journeys: {len(drifted)}")
+        if options["dry_run"]:
+            return
+
+        with transaction.atomic():
+            fixed = Journey.objects.filter(
+                pk__in=drifted
+            ).recount_tickets_available()
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed} journeys."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from station.booking import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Free the seats of expired seat holds"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of holds released per transaction",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep sweeping every INTERVAL seconds instead of once",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_holds(options["batch_size"])
+            self.stdout.write(f"Released {released} expired holds.")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from station.response_cache import (
+    response_cache_stats,
+    reset_response_cache_stats,
+)
+from station.urls import router
+
+
+class Command(BaseCommand):
+    help = "Show hits and misses of the response cache per endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Start the counters over after showing them",
+        )
+
+    def handle(self, *args, **options):
+        names = [
+            basename
+            for _, viewset, basename in router.registry
+            if getattr(viewset, "cache_responses", False)
+        ]
+        for name, counts in response_cache_stats(names).items():
+            requests = counts["hits"] + counts["misses"]
+            ratio = counts["hits"] / requests if requests else 0
+            self.stdout.write(
+                f"{name}: {counts['hits']} hits, {counts['misses']} misses"
+                f" ({ratio:.0%} hit rate)"
+            )
+
+        if options["reset"]:
+            reset_response_cache_stats(names)
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from station.exceptions import SnapshotRunning
+from station.snapshots import FORMATS, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the changes to stations, routes, journeys, tickets and "
+        "orders since the previous run to the columnar snapshot in "
+        "SNAPSHOTS_DIR, partitioned by day"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=FORMATS, default="parquet")
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rewrite the whole snapshot",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            written = write_snapshot(options["format"], options["full"])
+        except SnapshotRunning as error:
+            raise CommandError(error.detail)
+        elapsed = time.perf_counter() - started
+
+        for table, rows in written.items():
+            self.stdout.write(f"{table}: {rows} rows")
+        self.stdout.write(
+            self.style.SUCCESS(f"Snapshot up to date in {elapsed:.2f}s.")
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:20
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def fill_tickets_available(apps, schema_editor):
+    Journey = apps.get_model("station", "Journey")
+    journeys = Journey.objects.order_by().annotate(
+        actual=F("train__cargo_num") * F("train__places_in_cargo")
+        - Count("tickets")
+    )
+    for journey in journeys.iterator():
+        Journey.objects.filter(pk=journey.pk).update(
+            tickets_available=journey.actual
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("station", "0008_alter_crew_email"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journey",
+            name="tickets_available",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            fill_tickets_available, migrations.RunPython.noop
+        ),
+    ]
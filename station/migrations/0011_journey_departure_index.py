@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("station", "0010_seathold"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="journey",
+            options={"ordering": ["-departure_time", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="journey",
+            index=models.Index(
+                fields=["-departure_time", "-id"],
+                name="journey_departure_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:33
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_departure_minute(apps, schema_editor):
+    Journey = apps.get_model("station", "Journey")
+    zone = timezone.get_default_timezone()
+    for journey in Journey.objects.only("departure_time").iterator():
+        departure = journey.departure_time
+        if timezone.is_aware(departure):
+            departure = timezone.localtime(departure, zone)
+        Journey.objects.filter(pk=journey.pk).update(
+            departure_minute=departure.hour * 60 + departure.minute
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("station", "0012_order_user_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journey",
+            name="departure_minute",
+            field=models.SmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_departure_minute, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="journey",
+            index=models.Index(
+                fields=["route", "-departure_time"],
+                name="journey_route_departure_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="journey",
+            index=models.Index(
+                fields=["departure_minute", "-departure_time"],
+                name="journey_minute_departure_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:05
+
+from django.db import migrations
+
+TRIGRAM_INDEXES = {
+    "station_name_trgm_idx": "name gin_trgm_ops",
+    "station_name_upper_trgm_idx": "UPPER(name) gin_trgm_ops",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    GIN trigram indexes serve both the similarity operator (on the name)
+    and icontains, which Django compiles to UPPER(name) LIKE. Skipped
+    where pg_trgm cannot be installed; search then falls back to plain
+    substring matching.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} "
+            f"ON station_station USING gin ({expression})"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("station", "0013_journey_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("station", "0014_station_name_trigram"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journey",
+            name="arrival_time",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
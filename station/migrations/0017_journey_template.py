@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("station", "0016_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JourneyTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("departure", models.TimeField()),
+                ("travel_time", models.DurationField(blank=True, null=True)),
+                ("weekdays", models.PositiveSmallIntegerField(default=127)),
+                ("valid_from", models.DateField()),
+                ("valid_until", models.DateField()),
+                (
+                    "cancelled_dates",
+                    models.JSONField(blank=True, default=list),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["departure", "id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="journey",
+            name="service_date",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="journeytemplate",
+            name="crew_members",
+            field=models.ManyToManyField(
+                related_name="journey_templates", to="station.crew"
+            ),
+        ),
+        migrations.AddField(
+            model_name="journeytemplate",
+            name="route",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="templates",
+                to="station.route",
+            ),
+        ),
+        migrations.AddField(
+            model_name="journeytemplate",
+            name="train",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="templates",
+                to="station.train",
+            ),
+        ),
+        migrations.AddField(
+            model_name="journey",
+            name="template",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="journeys",
+                to="station.journeytemplate",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="journey",
+            constraint=models.UniqueConstraint(
+                fields=("template", "service_date"),
+                name="unique_journey_occurrence",
+            ),
+        ),
+    ]
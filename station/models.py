@@ -1,16 +1,33 @@
 import os
 import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Optional
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import (
+    UniqueConstraint,
+    Q,
+    F,
+    Count,
+    OuterRef,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 
+from station.versions import VersionedQuerySet
+
 
 class TrainType(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
@@ -35,6 +52,9 @@ class Train(models.Model):
     image = models.ImageField(
         blank=True, null=True, upload_to=train_image_file_path
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
@@ -61,6 +81,9 @@ class Station(models.Model):
     image = models.ImageField(
         null=True, blank=True, upload_to=station_image_file_path
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
 
     class Meta:
         ordering = ["name"]
@@ -90,6 +113,9 @@ class Route(models.Model):
     description = models.TextField(
         default="Straight to the point of destination"
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
 
     class Meta:
         ordering = ["-distance"]
@@ -108,6 +134,9 @@ class Crew(models.Model):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
     email = models.EmailField(blank=True, null=True, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
 
     class Meta:
         ordering = ["last_name", "first_name"]
@@ -116,6 +145,116 @@ class Crew(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
+def _count_per_journey(model) -> Subquery:
+    return Coalesce(
+        Subquery(
+            model.objects.filter(journey_id=OuterRef("pk"))
+            .order_by()
+            .values("journey_id")
+            .annotate(taken=Count("pk"))
+            .values("taken")
+        ),
+        Value(0),
+    )
+
+
+class JourneyQuerySet(VersionedQuerySet):
+    def shift_tickets_available(self, delta: int) -> int:
+        return self.update(tickets_available=F("tickets_available") + delta)
+
+    @staticmethod
+    def actual_tickets_available():
+        """Train capacity minus sold tickets and held seats"""
+        capacity = Train.objects.filter(pk=OuterRef("train_id")).values(
+            capacity=F("cargo_num") * F("places_in_cargo")
+        )
+        return (
+            Subquery(capacity)
+            - _count_per_journey(Ticket)
+            - _count_per_journey(SeatHold)
+        )
+
+    def recount_tickets_available(self) -> int:
+        """Recompute the stored counter from the train, tickets and holds"""
+        return self.update(tickets_available=self.actual_tickets_available())
+
+    def departing_on(self, day: date) -> "JourneyQuerySet":
+        """
+        Journeys leaving on the local calendar day, as a half-open range
+        on departure_time so that its indexes can be used
+        """
+        start = datetime.combine(day, time.min)
+        end = datetime.combine(day + timedelta(days=1), time.min)
+        if settings.USE_TZ:
+            zone = timezone.get_default_timezone()
+            start = timezone.make_aware(start, zone)
+            end = timezone.make_aware(end, zone)
+        return self.filter(departure_time__gte=start, departure_time__lt=end)
+
+    def departing_at(self, moment: time) -> "JourneyQuerySet":
+        """Journeys leaving at the local hour and minute on any day"""
+        return self.filter(departure_minute=moment.hour * 60 + moment.minute)
+
+
+class JourneyTemplate(models.Model):
+    """
+    A departure repeated on some weekdays from valid_from to valid_until.
+    Its journeys are not stored: lists and searches work them out on the
+    fly (see station.recurrence), and one becomes a Journey only once it
+    is booked or edited.
+    """
+
+    EVERY_DAY = 0b1111111
+
+    route = models.ForeignKey(
+        "Route", on_delete=models.CASCADE, related_name="templates"
+    )
+    train = models.ForeignKey(
+        "Train", on_delete=models.CASCADE, related_name="templates"
+    )
+    # Local time of day, to the minute
+    departure = models.TimeField()
+    travel_time = models.DurationField(null=True, blank=True)
+    # Bit 0 is Monday, bit 6 Sunday
+    weekdays = models.PositiveSmallIntegerField(default=EVERY_DAY)
+    valid_from = models.DateField()
+    valid_until = models.DateField()
+    # ISO dates of the days it does not run after all
+    cancelled_dates = models.JSONField(default=list, blank=True)
+    crew_members = models.ManyToManyField(
+        "Crew", related_name="journey_templates"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VersionedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["departure", "id"]
+
+    def runs_on(self, day: date) -> bool:
+        return bool(
+            self.valid_from <= day <= self.valid_until
+            and self.weekdays >> day.weekday() & 1
+            and day.isoformat() not in self.cancelled_dates
+        )
+
+    def departure_on(self, day: date) -> datetime:
+        moment = datetime.combine(day, self.departure)
+        if settings.USE_TZ:
+            moment = timezone.make_aware(
+                moment, timezone.get_default_timezone()
+            )
+        return moment
+
+    def arrival_on(self, day: date) -> Optional[datetime]:
+        if self.travel_time is None:
+            return None
+        return self.departure_on(day) + self.travel_time
+
+    def __str__(self):
+        return f"{self.route}, {self.departure:%H:%M}"
+
+
 class Journey(models.Model):
     route = models.ForeignKey(
         "Route", on_delete=models.CASCADE, related_name="journeys"
@@ -124,10 +263,84 @@ class Journey(models.Model):
         "Train", on_delete=models.CASCADE, related_name="journeys"
     )
     departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField(null=True, blank=True)
+    # Minutes since local midnight, so time-of-day search can use an index
+    departure_minute = models.SmallIntegerField(default=0, editable=False)
     crew_members = models.ManyToManyField("Crew", related_name="journeys")
+    tickets_available = models.IntegerField(default=0, editable=False)
+    # The template and day of a journey made from a JourneyTemplate
+    template = models.ForeignKey(
+        "JourneyTemplate",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="journeys",
+    )
+    service_date = models.DateField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = JourneyQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-departure_time"]
+        ordering = ["-departure_time", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-departure_time", "-id"],
+                name="journey_departure_id_idx",
+            ),
+            models.Index(
+                fields=["route", "-departure_time"],
+                name="journey_route_departure_idx",
+            ),
+            models.Index(
+                fields=["departure_minute", "-departure_time"],
+                name="journey_minute_departure_idx",
+            ),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=["template", "service_date"],
+                name="unique_journey_occurrence",
+            )
+        ]
+
+    @staticmethod
+    def minute_of_day(moment: datetime) -> int:
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(
+                moment, timezone.get_default_timezone()
+            )
+        return moment.hour * 60 + moment.minute
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        self.departure_minute = self.minute_of_day(self.departure_time)
+
+        if self._state.adding:
+            self.tickets_available = self.train.capacity
+            return super().save(
+                force_insert, force_update, using, update_fields
+            )
+
+        # The counter is only ever changed by atomic UPDATEs, so a stale
+        # instance must not write its copy back.
+        if update_fields is None:
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "tickets_available"
+            ]
+        elif "departure_time" in update_fields:
+            update_fields = {*update_fields, "departure_minute"}
+        super().save(force_insert, force_update, using, update_fields)
+        Journey.objects.filter(pk=self.pk).recount_tickets_available()
+        self.refresh_from_db(fields=["tickets_available"])
 
     def __str__(self):
         return f"{self.route}, {self.departure_time}"
@@ -141,8 +354,29 @@ class Order(models.Model):
         related_name="orders",
     )
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="order_user_created_idx",
+            ),
+        ]
+
+
+class SeatQuerySet(VersionedQuerySet):
+    def among(self, seats: Iterable[dict]) -> "SeatQuerySet":
+        """Rows occupying any of the given journey/cargo/seat places"""
+        query = Q()
+        for seat in seats:
+            query |= Q(
+                journey=seat["journey"], cargo=seat["cargo"], seat=seat["seat"]
+            )
+        if not query:
+            return self.none()
+        return self.filter(query)
 
 
 class Ticket(models.Model):
@@ -155,6 +389,8 @@ class Ticket(models.Model):
         "Order", on_delete=models.CASCADE, related_name="tickets"
     )
 
+    objects = SeatQuerySet.as_manager()
+
     class Meta:
         constraints = [
             UniqueConstraint(
@@ -206,3 +442,48 @@ class Ticket(models.Model):
             f"{self.journey.route}-"
             f", departure: {self.journey.departure_time}"
         )
+
+
+class SeatHoldQuerySet(SeatQuerySet):
+    def active(self) -> "SeatHoldQuerySet":
+        return self.filter(expires_at__gt=timezone.now())
+
+    def expired(self) -> "SeatHoldQuerySet":
+        return self.filter(expires_at__lte=timezone.now())
+
+
+class SeatHold(models.Model):
+    """A seat reserved for a user for a short time before checkout"""
+
+    cargo = models.IntegerField()
+    seat = models.IntegerField()
+    journey = models.ForeignKey(
+        "Journey", on_delete=models.CASCADE, related_name="holds"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="seat_holds",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    objects = SeatHoldQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["expires_at"]
+        constraints = [
+            UniqueConstraint(
+                fields=["seat", "cargo", "journey"],
+                name="unique_seat_hold",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="seat_hold_expires_idx"),
+        ]
+
+    def __str__(self):
+        return (
+            f"Cargo {self.cargo}, seat {self.seat} of {self.journey_id} "
+            f"held until {self.expires_at}"
+        )
@@ -0,0 +1,271 @@
+import heapq
+import math
+import threading
+from typing import Iterable, Optional
+
+from station.changelog import ChangeLog
+from station.models import Station
+
+EARTH_RADIUS = 6371.0088
+LEAF_SIZE = 16
+MAX_NEARBY = 100
+
+
+def unit_vector(latitude: float, longitude: float) -> tuple:
+    """
+    The point on the unit sphere, where the straight-line (chord)
+    distance grows with the distance along the surface
+    """
+    phi, lam = math.radians(latitude), math.radians(longitude)
+    return (
+        math.cos(phi) * math.cos(lam),
+        math.cos(phi) * math.sin(lam),
+        math.sin(phi),
+    )
+
+
+def chord_to_km(chord: float) -> float:
+    """Great-circle (haversine) distance of two points chord apart"""
+    return 2 * EARTH_RADIUS * math.asin(min(chord / 2, 1.0))
+
+
+def km_to_chord(distance: float) -> float:
+    return 2 * math.sin(min(distance / EARTH_RADIUS, math.pi) / 2)
+
+
+class _Node:
+    __slots__ = ("axis", "split", "left", "right", "ids")
+
+    def __init__(self, ids=None):
+        self.axis = None
+        self.split = 0.0
+        self.left = self.right = None
+        self.ids = ids
+
+
+class StationTree:
+    """
+    k-d tree over stations as 3D unit vectors, with buckets of up to
+    LEAF_SIZE stations in the leaves. Stations are added and removed in
+    place (a bucket splits when it grows to twice its size), and a tree
+    that shrank or grew a lot since it was built is rebuilt to stay
+    balanced. A tree being searched is patched as a copy().
+    """
+
+    def __init__(self, stations: Iterable[tuple[int, str, float, float]]):
+        self.points = {}
+        self.stations = {}
+        for station_id, name, latitude, longitude in stations:
+            self.stations[station_id] = (name, latitude, longitude)
+            self.points[station_id] = unit_vector(latitude, longitude)
+        self.root = self._build(list(self.points))
+        self.built_size = len(self.points)
+        self.position = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def copy(self) -> "StationTree":
+        """A tree to patch without sorting the stations again"""
+        tree = StationTree.__new__(StationTree)
+        tree.points = dict(self.points)
+        tree.stations = dict(self.stations)
+        tree.root = self._copy(self.root)
+        tree.built_size = self.built_size
+        tree.position = self.position
+        return tree
+
+    def _copy(self, node: _Node) -> _Node:
+        if node.ids is not None:
+            return _Node(list(node.ids))
+        copy = _Node()
+        copy.axis, copy.split = node.axis, node.split
+        copy.left, copy.right = self._copy(node.left), self._copy(node.right)
+        return copy
+
+    def _build(self, ids: list[int]) -> _Node:
+        if len(ids) <= LEAF_SIZE:
+            return _Node(ids)
+
+        points = self.points
+        columns = list(zip(*map(points.__getitem__, ids)))
+        spreads = [max(column) - min(column) for column in columns]
+        axis = spreads.index(max(spreads))
+        ids.sort(key=dict(zip(ids, columns[axis])).__getitem__)
+        middle = len(ids) // 2
+        split = points[ids[middle]][axis]
+        # Everything equal to the split goes right
+        while middle and points[ids[middle - 1]][axis] == split:
+            middle -= 1
+        if not middle:
+            return _Node(ids)
+
+        node = _Node()
+        node.axis, node.split = axis, split
+        node.left = self._build(ids[:middle])
+        node.right = self._build(ids[middle:])
+        return node
+
+    def _leaf(self, point: tuple) -> _Node:
+        node = self.root
+        while node.ids is None:
+            node = node.left if point[node.axis] < node.split else node.right
+        return node
+
+    def add(self, station_id: int, name: str, latitude: float, longitude):
+        self.remove(station_id)
+        self.stations[station_id] = (name, latitude, longitude)
+        point = self.points[station_id] = unit_vector(latitude, longitude)
+        leaf = self._leaf(point)
+        leaf.ids.append(station_id)
+        if len(leaf.ids) >= 2 * LEAF_SIZE:
+            split = self._build(leaf.ids)
+            for attribute in _Node.__slots__:
+                setattr(leaf, attribute, getattr(split, attribute))
+
+    def remove(self, station_id: int) -> None:
+        point = self.points.pop(station_id, None)
+        if point is not None:
+            del self.stations[station_id]
+            self._leaf(point).ids.remove(station_id)
+
+    @property
+    def unbalanced(self) -> bool:
+        size = len(self.points)
+        return not self.built_size / 2 <= size <= self.built_size * 2
+
+    def search(
+        self,
+        latitude: float,
+        longitude: float,
+        k: Optional[int] = None,
+        radius: Optional[float] = None,
+    ) -> list[tuple[float, int]]:
+        """
+        (distance in km, station id) of the k nearest stations, or of all
+        of them within radius km, or the k nearest within radius; nearest
+        first
+        """
+        query = unit_vector(latitude, longitude)
+        limit = math.inf if radius is None else km_to_chord(radius) ** 2
+        # Max-heap of the best ones so far as (-squared chord, id)
+        found = []
+        # Nodes to visit with the least squared chord to anything in them
+        stack = [(self.root, 0.0)]
+        while stack:
+            node, least = stack.pop()
+            bound = limit
+            if k is not None and len(found) == k:
+                bound = min(bound, -found[0][0])
+            if least > bound:
+                continue
+
+            if node.ids is None:
+                gap = query[node.axis] - node.split
+                if gap < 0:
+                    near, far = node.left, node.right
+                else:
+                    near, far = node.right, node.left
+                stack.append((far, max(least, gap * gap)))
+                stack.append((near, least))
+                continue
+
+            points = self.points
+            for station_id in node.ids:
+                point = points[station_id]
+                squared = (
+                    (point[0] - query[0]) ** 2
+                    + (point[1] - query[1]) ** 2
+                    + (point[2] - query[2]) ** 2
+                )
+                if squared > limit:
+                    continue
+                if k is None:
+                    found.append((-squared, station_id))
+                elif len(found) < k:
+                    heapq.heappush(found, (-squared, station_id))
+                elif squared < -found[0][0]:
+                    heapq.heapreplace(found, (-squared, station_id))
+
+        return sorted(
+            (chord_to_km(math.sqrt(-squared)), station_id)
+            for squared, station_id in found
+        )
+
+    def nearby(self, latitude, longitude, k=None, radius=None) -> list[dict]:
+        """Stations found by search() with their distance in km"""
+        results = []
+        found = self.search(latitude, longitude, k, radius)
+        for distance, station_id in found:
+            name, *coordinates = self.stations[station_id]
+            results.append(
+                {
+                    "id": station_id,
+                    "name": name,
+                    "latitude": coordinates[0],
+                    "longitude": coordinates[1],
+                    "distance": round(distance, 3),
+                }
+            )
+        return results
+
+
+station_changes = ChangeLog("nearby")
+_tree: Optional[StationTree] = None
+_lock = threading.Lock()
+
+
+def _rows(stations):
+    return stations.order_by().values_list(
+        "id", "name", "latitude", "longitude"
+    )
+
+
+def get_station_tree() -> StationTree:
+    """
+    The process-wide tree, built on first use and then replaced with a
+    copy patched with the stations written since, as told by the change
+    log. A tree once returned is never changed, so it is searched
+    without the lock.
+    """
+    global _tree
+
+    position = station_changes.position()
+    tree = _tree
+    if tree is not None and tree.position == position:
+        return tree
+    with _lock:
+        tree = _tree
+        if tree is not None and tree.position == position:
+            return tree
+        if tree is not None:
+            changed = station_changes.changes(tree.position, position)
+            if changed is None:
+                tree = None
+            else:
+                tree = tree.copy()
+                for station_id in changed:
+                    tree.remove(station_id)
+                for row in _rows(Station.objects.filter(pk__in=changed)):
+                    tree.add(*row)
+                if tree.unbalanced:
+                    tree = None
+
+        if tree is None:
+            tree = StationTree(_rows(Station.objects.all()))
+        tree.position = position
+        _tree = tree
+    return tree
+
+
+def nearby_stations(
+    latitude: float,
+    longitude: float,
+    k: Optional[int] = None,
+    radius: Optional[float] = None,
+) -> list[dict]:
+    return get_station_tree().nearby(latitude, longitude, k, radius)
+
+
+def log_station_changes(station_ids: Iterable[int]) -> None:
+    station_changes.record(station_ids)
@@ -0,0 +1,220 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering such as ("-created_at", "-id").
+    A page is fetched with a WHERE on the last key seen, so its cost does
+    not depend on how deep it is, and no COUNT(*) is ever run.
+    """
+
+    ordering = ("-id",)
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+
+        backwards, key = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if backwards:
+            ordering = [self.flip(field) for field in ordering]
+
+        rows = self.fetch(queryset, ordering, key, self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if backwards:
+            rows.reverse()
+
+        self.has_next = key is not None if backwards else has_more
+        self.has_previous = has_more if backwards else key is not None
+        self.page = rows
+        return rows
+
+    def fetch(self, queryset, ordering, key, limit: int) -> list:
+        """The first limit rows strictly after key in the ordering"""
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self.after(ordering, key))
+        return list(queryset[:limit])
+
+    @staticmethod
+    def flip(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def after(ordering, key) -> Q:
+        """Rows strictly after key in the given ordering"""
+        query = Q()
+        equal = {}
+        for field, value in zip(ordering, key):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            query |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+
+        # The redundant bound on the leading column lets the database
+        # start an index range scan at the key instead of filtering
+        name = ordering[0].lstrip("-")
+        lookup = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{name}__{lookup}": key[0]}) & query
+
+    def row_key(self, row) -> list:
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def encode_cursor(self, backwards: bool, row) -> str:
+        key = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in self.row_key(row)
+        ]
+        payload = json.dumps({"b": backwards, "k": key}).encode()
+        cursor = base64.urlsafe_b64encode(payload).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request, model) -> tuple[bool, list]:
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return False, None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            key = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, payload["k"], strict=True)
+            ]
+            return bool(payload["b"]), key
+        except (
+            binascii.Error,
+            TypeError,
+            ValueError,
+            KeyError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class ApproximateTotalMixin:
+    """
+    Adds an optional total to keyset pages (?total=approximate) that counts
+    at most approximate_total_limit rows, so it stays cheap for heavy users.
+    """
+
+    total_query_param = "total"
+    approximate_total_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = None
+        if request.query_params.get(self.total_query_param) == "approximate":
+            limit = self.approximate_total_limit
+            counted = queryset.order_by().values("pk")[: limit + 1].count()
+            self.total = {
+                "count": min(counted, limit),
+                "is_exact": counted <= limit,
+            }
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.total is not None:
+            response.data["total"] = self.total
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["total"] = {
+            "type": "object",
+            "properties": {
+                "count": {"type": "integer"},
+                "is_exact": {"type": "boolean"},
+            },
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            {
+                "name": self.total_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Include an approximate total "
+                "(?total=approximate).",
+                "schema": {"type": "string", "enum": ["approximate"]},
+            },
+        ]
@@ -0,0 +1,281 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from station.changelog import ChangeLog
+from station.models import Journey
+
+MAX_LEGS = 4
+HORIZON = timedelta(days=2)
+
+NEVER = 2**62
+
+
+def _timestamp(moment: datetime) -> int:
+    return int(moment.timestamp())
+
+
+def _datetime(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc)
+
+
+class ConnectionTable:
+    """
+    Every journey as a connection from its route's source to destination,
+    stored column-wise in arrays sorted by departure (epoch seconds), so
+    a scan is a walk over a few flat arrays from one bisection on.
+
+    Journeys without arrival_time arrive after their route distance at
+    PLANNER_AVERAGE_SPEED km/h.
+    """
+
+    COLUMNS = ("departures", "arrivals", "sources", "destinations", "journeys")
+
+    def __init__(self, position: Optional[tuple] = None):
+        # How far into the journey change log the table is
+        self.position = position
+        for column in self.COLUMNS:
+            setattr(self, column, array("q"))
+        self.departure_of = {}
+
+    def __len__(self):
+        return len(self.journeys)
+
+    @staticmethod
+    def connections(journeys) -> list[tuple[int, int, int, int, int]]:
+        speed = settings.PLANNER_AVERAGE_SPEED
+        rows = journeys.order_by().values_list(
+            "id",
+            "departure_time",
+            "arrival_time",
+            "route__source_id",
+            "route__destination_id",
+            "route__distance",
+        )
+        connections = []
+        for journey, departure, arrival, source, destination, distance in rows:
+            if arrival is None:
+                arrival = departure + timedelta(hours=distance / speed)
+            connections.append(
+                (
+                    _timestamp(departure),
+                    _timestamp(arrival),
+                    source,
+                    destination,
+                    journey,
+                )
+            )
+        return connections
+
+    @classmethod
+    def build(cls, position: Optional[tuple] = None):
+        table = cls(position)
+        for connection in sorted(cls.connections(Journey.objects.all())):
+            table._append(connection)
+        return table
+
+    def _append(self, connection) -> None:
+        for column, value in zip(self.COLUMNS, connection):
+            getattr(self, column).append(value)
+        self.departure_of[connection[-1]] = connection[0]
+
+    def updated(self, journey_ids: Iterable[int], position: tuple):
+        """
+        A copy with the connections of the given journeys re-read from the
+        database (dropped if they are gone). Readers of this table are
+        never disturbed, and only the changed rows are queried.
+        """
+        journey_ids = set(journey_ids)
+        table = ConnectionTable(position)
+        for column in self.COLUMNS:
+            setattr(table, column, array("q", getattr(self, column)))
+        table.departure_of = dict(self.departure_of)
+
+        for journey in journey_ids:
+            departure = table.departure_of.pop(journey, None)
+            if departure is None:
+                continue
+            index = bisect_left(table.departures, departure)
+            while table.journeys[index] != journey:
+                index += 1
+            for column in self.COLUMNS:
+                del getattr(table, column)[index]
+
+        changed = Journey.objects.filter(pk__in=journey_ids)
+        for connection in table.connections(changed):
+            index = bisect_right(table.departures, connection[0])
+            for column, value in zip(self.COLUMNS, connection):
+                getattr(table, column).insert(index, value)
+            table.departure_of[connection[-1]] = connection[0]
+        return table
+
+    def scan(
+        self,
+        source: int,
+        destination: int,
+        after: int,
+        min_transfer: int = 0,
+        max_legs: int = MAX_LEGS,
+        skip: frozenset = frozenset(),
+        horizon: int = int(HORIZON.total_seconds()),
+    ) -> list[list[int]]:
+        """
+        Connection Scan in rounds: round k only boards at stations reached
+        with fewer than k legs, so it yields the earliest arrival with at
+        most k legs. Every round that arrives earlier than the previous
+        ones adds an itinerary, giving the fewest-legs one first and the
+        earliest-arrival one last. Changing trains needs min_transfer
+        seconds. Connections of skipped journeys are not used.
+
+        Itineraries are lists of connection indexes in travel order.
+        """
+        departures, arrivals = self.departures, self.arrivals
+        sources, destinations = self.sources, self.destinations
+        journeys = self.journeys
+        first = bisect_left(departures, after)
+        last = bisect_left(departures, after + horizon)
+
+        # Station -> (earliest time to board there, round that reached it)
+        boarding = {source: (after, 0)}
+        rounds = [{}]
+        itineraries = []
+        best = NEVER
+        for legs in range(1, max_legs + 1):
+            # Station -> (arrival, connection, round boarded from)
+            arrived = {}
+            for index in range(first, last):
+                departure = departures[index]
+                if departure >= best:
+                    break
+                reached = boarding.get(sources[index])
+                if reached is None or reached[0] > departure:
+                    continue
+                if journeys[index] in skip:
+                    continue
+                stop = destinations[index]
+                previous = arrived.get(stop)
+                if previous is None or arrivals[index] < previous[0]:
+                    arrived[stop] = (arrivals[index], index, reached[1])
+            rounds.append(arrived)
+
+            if destination in arrived and arrived[destination][0] < best:
+                best = arrived[destination][0]
+                itineraries.append(self._unwind(rounds, destination, legs))
+
+            improved = False
+            boarding = dict(boarding)
+            for stop, (arrival, _, _) in arrived.items():
+                ready = arrival + min_transfer
+                if stop not in boarding or ready < boarding[stop][0]:
+                    boarding[stop] = (ready, legs)
+                    improved = True
+            if not improved:
+                break
+        return itineraries
+
+    def _unwind(self, rounds, destination: int, legs: int) -> list[int]:
+        itinerary = []
+        stop = destination
+        while legs:
+            _, index, legs = rounds[legs][stop]
+            itinerary.append(index)
+            stop = self.sources[index]
+        itinerary.reverse()
+        return itinerary
+
+
+journey_changes = ChangeLog("planner")
+_table: Optional[ConnectionTable] = None
+_lock = threading.Lock()
+
+
+def get_connection_table() -> ConnectionTable:
+    """
+    The process-wide table, built on first use and then brought up to
+    date by replaying the journey change log, so only the journeys that
+    changed are read again. A lost or too long log means a rebuild.
+    """
+    global _table
+
+    position = journey_changes.position()
+    table = _table
+    if table is not None and table.position == position:
+        return table
+
+    with _lock:
+        table = _table
+        if table is None:
+            _table = ConnectionTable.build(position)
+        elif table.position != position:
+            changed = journey_changes.changes(table.position, position)
+            if changed is None:
+                _table = ConnectionTable.build(position)
+            else:
+                _table = table.updated(changed, position)
+        return _table
+
+
+def log_journey_changes(journey_ids: Iterable[int]) -> None:
+    """Queue the journeys for every process's table after the commit"""
+    journey_changes.record(journey_ids)
+
+
+def plan_journeys(
+    source: int,
+    destination: int,
+    after: datetime,
+    min_transfer: timedelta,
+    passengers: int = 1,
+    max_legs: int = MAX_LEGS,
+) -> list[dict]:
+    """
+    Itineraries from source to destination departing after the moment,
+    fewest legs first. Journeys without seats for every passenger are
+    left out, checked against the live counters in one query.
+    """
+    table = get_connection_table()
+    sold_out = frozenset(
+        Journey.objects.filter(
+            departure_time__gte=after,
+            departure_time__lt=after + HORIZON,
+            tickets_available__lt=passengers,
+        ).values_list("id", flat=True)
+    )
+    found = table.scan(
+        source,
+        destination,
+        _timestamp(after),
+        int(min_transfer.total_seconds()),
+        max_legs,
+        sold_out,
+    )
+
+    legs = {index for itinerary in found for index in itinerary}
+    journeys = Journey.objects.select_related(
+        "train", "route__source", "route__destination"
+    ).in_bulk([table.journeys[index] for index in legs])
+
+    itineraries = []
+    for itinerary in found:
+        if any(table.journeys[index] not in journeys for index in itinerary):
+            continue
+        itineraries.append(
+            {
+                "departure_time": _datetime(table.departures[itinerary[0]]),
+                "arrival_time": _datetime(table.arrivals[itinerary[-1]]),
+                "transfers": len(itinerary) - 1,
+                "legs": [
+                    {
+                        "journey": journeys[table.journeys[index]],
+                        "departure_time": _datetime(table.departures[index]),
+                        "arrival_time": _datetime(table.arrivals[index]),
+                    }
+                    for index in itinerary
+                ],
+            }
+        )
+    return itineraries
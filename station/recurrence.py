@@ -0,0 +1,226 @@
+import heapq
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Optional, Union
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from station.models import Train, Journey, JourneyTemplate
+
+# Ids of occurrences, as <template id>@<day>
+OCCURRENCE_ID = re.compile(r"(\d+)@(\d{4}-\d{2}-\d{2})")
+
+
+class Occurrence:
+    """A journey of a template on a day, not made into a Journey (yet)"""
+
+    __slots__ = ("template", "day", "departure_time")
+
+    def __init__(self, template: JourneyTemplate, day: date):
+        self.template = template
+        self.day = day
+        self.departure_time = template.departure_on(day)
+
+    @property
+    def id(self) -> str:
+        return occurrence_id(self.template.pk, self.day)
+
+    pk = id
+
+    @property
+    def train(self) -> Train:
+        return self.template.train
+
+    @property
+    def arrival_time(self) -> Optional[datetime]:
+        return self.template.arrival_on(self.day)
+
+
+def occurrence_id(template_id: int, day: date) -> str:
+    return f"{template_id}@{day.isoformat()}"
+
+
+def parse_occurrence_id(value) -> Optional[tuple[int, date]]:
+    """(template id, day) of an occurrence id, None for anything else"""
+    match = OCCURRENCE_ID.fullmatch(str(value))
+    if match is None:
+        return None
+    try:
+        return int(match[1]), date.fromisoformat(match[2])
+    except ValueError:
+        return None
+
+
+def _local_day(moment: datetime) -> date:
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment, timezone.get_default_timezone())
+    return moment.date()
+
+
+def _departures(
+    template: JourneyTemplate,
+    descending: bool,
+    key: Optional[list],
+    first: Optional[date],
+    last: Optional[date],
+    made: set[date],
+) -> Iterator[tuple]:
+    """
+    (departure time, -template id, day, template) of the days the
+    template runs on from first to last, in order and after the key,
+    leaving out the ones made into journeys
+    """
+    first = max(filter(None, (first, template.valid_from)))
+    last = min(filter(None, (last, template.valid_until)))
+    if key is not None:
+        key = tuple(key)
+
+    cancelled = set(template.cancelled_dates)
+    step = timedelta(days=-1 if descending else 1)
+    day = last if descending else first
+    while first <= day <= last:
+        if (
+            template.weekdays >> day.weekday() & 1
+            and day.isoformat() not in cancelled
+            and day not in made
+        ):
+            departure = (template.departure_on(day), -template.pk)
+            if key is None or (
+                departure < key if descending else departure > key
+            ):
+                yield *departure, day, template
+        day += step
+
+
+def occurrences(
+    templates: Iterable[JourneyTemplate],
+    descending: bool = False,
+    key: Optional[list] = None,
+    first: Optional[date] = None,
+    last: Optional[date] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[Occurrence]:
+    """
+    Occurrences of the templates from the first to the last day (both
+    included and optional) that are not made into journeys, ordered by
+    departure time and -template id (reversed when descending) and
+    strictly after the key in that order, if given. Until is the moment
+    no occurrence is wanted beyond, if known (like the last journey of
+    a full page).
+
+    The days made into journeys between the key and until are read with
+    one query, every template yields its other days lazily from the key
+    on, and the templates are merged on a heap, so reading n occurrences
+    costs O(templates + n log templates) and two queries whatever the
+    validity of templates.
+    """
+    templates = list(templates)
+    if not templates:
+        return
+    if key is not None:
+        # Nothing before the day of the key can come after it
+        if descending:
+            last = min(filter(None, (last, _local_day(key[0]))))
+        else:
+            first = max(filter(None, (first, _local_day(key[0]))))
+    if until is not None:
+        if descending:
+            first = max(filter(None, (first, _local_day(until))))
+        else:
+            last = min(filter(None, (last, _local_day(until))))
+
+    made = Journey.objects.filter(template__in=templates)
+    if first is not None:
+        made = made.filter(service_date__gte=first)
+    if last is not None:
+        made = made.filter(service_date__lte=last)
+    made_days = defaultdict(set)
+    for template_id, day in made.values_list("template_id", "service_date"):
+        made_days[template_id].add(day)
+
+    merged = heapq.merge(
+        *(
+            _departures(
+                template,
+                descending,
+                key,
+                first,
+                last,
+                made_days[template.pk],
+            )
+            for template in templates
+        ),
+        reverse=descending,
+    )
+    for _, _, day, template in merged:
+        yield Occurrence(template, day)
+
+
+def find_occurrence(template_id: int, day: date) -> Union[Journey, Occurrence]:
+    """
+    The journey made of the occurrence, or the occurrence while there is
+    none; raises Journey.DoesNotExist if the template does not run then
+    """
+    journey = (
+        Journey.objects.select_related("train")
+        .filter(template_id=template_id, service_date=day)
+        .first()
+    )
+    if journey is not None:
+        return journey
+    template = (
+        JourneyTemplate.objects.select_related("route", "train")
+        .filter(pk=template_id)
+        .first()
+    )
+    if template is None or not template.runs_on(day):
+        raise Journey.DoesNotExist
+    return Occurrence(template, day)
+
+
+def materialize(template_id: int, day: date) -> Journey:
+    """
+    The journey made of the occurrence, with the crew of the template,
+    created on first use; raises Journey.DoesNotExist if the template
+    does not run on the day
+    """
+    found = find_occurrence(template_id, day)
+    if isinstance(found, Journey):
+        return found
+
+    template = found.template
+    try:
+        with transaction.atomic():
+            journey = Journey.objects.create(
+                template=template,
+                service_date=day,
+                route=template.route,
+                train=template.train,
+                departure_time=found.departure_time,
+                arrival_time=found.arrival_time,
+            )
+            journey.crew_members.set(template.crew_members.all())
+    except IntegrityError:
+        # Made meanwhile by a concurrent booking
+        return Journey.objects.select_related("train").get(
+            template_id=template_id, service_date=day
+        )
+    return journey
+
+
+def cancel_occurrence(template_id: int, day: date) -> None:
+    """Stop the template running on the day"""
+    with transaction.atomic():
+        template = (
+            JourneyTemplate.objects.select_for_update()
+            .filter(pk=template_id)
+            .first()
+        )
+        if template is None or day.isoformat() in template.cancelled_dates:
+            return
+        template.cancelled_dates = sorted(
+            [*template.cancelled_dates, day.isoformat()]
+        )
+        template.save(update_fields=["cancelled_dates", "updated_at"])
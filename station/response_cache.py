@@ -0,0 +1,90 @@
+from typing import Iterable, Optional
+
+from django.core.cache import caches
+from django.http import HttpResponse
+
+CACHE_ALIAS = "responses"
+
+
+def _counter_key(name: str, outcome: str) -> str:
+    return f"station:responses:{name}:{outcome}"
+
+
+def _count(name: str, outcome: str) -> None:
+    cache = caches[CACHE_ALIAS]
+    key = _counter_key(name, outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted in between, the count starts over
+        cache.add(key, 1, None)
+
+
+# Headers describing how a response was served rather than what it is
+TRANSIENT_HEADERS = {"X-Cache"}
+
+
+def _response_key(key: str) -> str:
+    # v2 entries hold every header, not just the content type
+    return f"station:response:v2:{key}"
+
+
+def get_cached_response(name: str, key: str) -> Optional[HttpResponse]:
+    """The rendered response stored under key, counted as a hit or miss"""
+    cached = caches[CACHE_ALIAS].get(_response_key(key))
+    _count(name, "misses" if cached is None else "hits")
+    if cached is None:
+        return None
+
+    content, headers = cached
+    return HttpResponse(content, headers=headers)
+
+
+def cache_response(key: str, response) -> None:
+    """
+    Store the response under key with the headers its view set (Allow,
+    Vary...) once it is rendered, unless it is not a plain 200 or sets
+    cookies
+    """
+
+    def store(rendered):
+        if rendered.status_code == 200 and not rendered.cookies:
+            headers = {
+                header: value
+                for header, value in rendered.items()
+                if header not in TRANSIENT_HEADERS
+            }
+            caches[CACHE_ALIAS].set(
+                _response_key(key), (rendered.content, headers)
+            )
+
+    response.add_post_render_callback(store)
+
+
+def response_cache_stats(names: Iterable[str]) -> dict[str, dict]:
+    """Hits and misses per view name since the counters last started"""
+    names = list(names)
+    keys = {
+        (name, outcome): _counter_key(name, outcome)
+        for name in names
+        for outcome in ("hits", "misses")
+    }
+    counts = caches[CACHE_ALIAS].get_many(keys.values())
+    return {
+        name: {
+            outcome: counts.get(keys[name, outcome], 0)
+            for outcome in ("hits", "misses")
+        }
+        for name in names
+    }
+
+
+def reset_response_cache_stats(names: Iterable[str]) -> None:
+    caches[CACHE_ALIAS].delete_many(
+        [
+            _counter_key(name, outcome)
+            for name in names
+            for outcome in ("hits", "misses")
+        ]
+    )
@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models import F
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from station.models import Route, Train, Crew, Journey
+from station.planner import log_journey_changes
+from station.seatmap import forget_seat_maps
+
+# Journeys accepted in one request
+MAX_BULK_JOURNEYS = 5000
+
+CrewAssignment = Journey.crew_members.through
+
+
+def _does_not_exist(pk) -> list[str]:
+    message = PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+    return [message.format(pk_value=pk)]
+
+
+def _existing(queryset, ids: set) -> set:
+    return set(queryset.filter(pk__in=ids).values_list("pk", flat=True))
+
+
+def _reference_errors(items: dict[int, dict]) -> tuple[dict, dict, dict]:
+    """
+    Faults of the items whose route, train, crew or journey does not
+    exist, found with one query per table, plus the capacity of the
+    trains and the journeys to update
+    """
+    capacities = dict(
+        Train.objects.filter(
+            pk__in={item["train"] for item in items.values()}
+        ).values_list("pk", F("cargo_num") * F("places_in_cargo"))
+    )
+    routes = _existing(
+        Route.objects, {item["route"] for item in items.values()}
+    )
+    crew = _existing(
+        Crew.objects,
+        {pk for item in items.values() for pk in item["crew_members"]},
+    )
+    journeys = Journey.objects.only("pk").in_bulk(
+        {item["id"] for item in items.values() if "id" in item}
+    )
+
+    errors = {}
+    listed = set()
+    for index, item in items.items():
+        problems = {}
+        if "id" in item:
+            if item["id"] not in journeys:
+                problems["id"] = _does_not_exist(item["id"])
+            elif item["id"] in listed:
+                problems["id"] = ["The journey is listed twice."]
+            listed.add(item["id"])
+        if item["route"] not in routes:
+            problems["route"] = _does_not_exist(item["route"])
+        if item["train"] not in capacities:
+            problems["train"] = _does_not_exist(item["train"])
+        unknown = [pk for pk in item["crew_members"] if pk not in crew]
+        if unknown:
+            problems["crew_members"] = _does_not_exist(unknown[0])
+        if problems:
+            errors[index] = problems
+    return errors, capacities, journeys
+
+
+def save_journeys(
+    items: dict[int, dict], errors: dict[int, dict], atomic: bool = False
+) -> dict[int, tuple[int, bool]]:
+    """
+    Write the valid items (JourneyBulkSerializer data by their position
+    in the request) in one transaction: the ones without an id are
+    created, the ones with it updated, every field and the crew.
+
+    The references are checked with a query per table and the faults
+    added to errors; nothing is written when atomic and any item is at
+    fault. Journeys and crew assignments are inserted with a statement
+    per batch, and seats available recounted with one UPDATE for the
+    journeys updated. Returns (id, created) by position.
+    """
+    with transaction.atomic():
+        found, capacities, journeys = _reference_errors(items)
+        errors.update(found)
+        if atomic and errors:
+            return {}
+        items = {
+            index: item for index, item in items.items() if index not in errors
+        }
+
+        created, updated = {}, {}
+        for index, item in items.items():
+            if "id" in item:
+                journey = journeys[item["id"]]
+                updated[index] = journey
+            else:
+                journey = Journey(tickets_available=capacities[item["train"]])
+                created[index] = journey
+            journey.route_id = item["route"]
+            journey.train_id = item["train"]
+            journey.departure_time = item["departure_time"]
+            journey.arrival_time = item.get("arrival_time")
+            journey.departure_minute = Journey.minute_of_day(
+                journey.departure_time
+            )
+
+        Journey.objects.bulk_create(created.values(), batch_size=1000)
+        if updated:
+            Journey.objects.bulk_update(
+                updated.values(),
+                [
+                    "route",
+                    "train",
+                    "departure_time",
+                    "arrival_time",
+                    "departure_minute",
+                ],
+                batch_size=1000,
+            )
+            updated_ids = [journey.pk for journey in updated.values()]
+            CrewAssignment.objects.filter(journey_id__in=updated_ids).delete()
+            # The train may have changed
+            Journey.objects.filter(
+                pk__in=updated_ids
+            ).recount_tickets_available()
+            forget_seat_maps(updated_ids)
+
+        journeys = {**created, **updated}
+        CrewAssignment.objects.bulk_create(
+            [
+                CrewAssignment(journey_id=journeys[index].pk, crew_id=crew)
+                for index, item in items.items()
+                for crew in dict.fromkeys(item["crew_members"])
+            ],
+            batch_size=1000,
+        )
+        log_journey_changes(journey.pk for journey in journeys.values())
+
+    return {
+        index: (journey.pk, index in created)
+        for index, journey in sorted(journeys.items())
+    }
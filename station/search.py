@@ -0,0 +1,57 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Case, When, Value, Q, QuerySet
+
+from station.models import Station
+
+_trigram_enabled = {}
+
+
+def trigram_enabled(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """Whether the database can use pg_trgm (checked once per alias)"""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+
+    if using not in _trigram_enabled:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_enabled[using] = cursor.fetchone() is not None
+    return _trigram_enabled[using]
+
+
+def search_stations(term: str) -> QuerySet:
+    """
+    Stations whose name matches the term, best match first.
+
+    With pg_trgm both substring and misspelled matches are found through
+    the trigram GIN indexes on the name and ranked by similarity.
+    Otherwise it is a plain case-insensitive substring match where names
+    starting with the term come first.
+    """
+    queryset = Station.objects.all()
+
+    if trigram_enabled(queryset.db):
+        return (
+            queryset.annotate(similarity=TrigramSimilarity("name", term))
+            .filter(Q(name__icontains=term) | Q(name__trigram_similar=term))
+            .order_by("-similarity", "name")
+        )
+
+    return (
+        queryset.filter(name__icontains=term)
+        .annotate(
+            prefix=Case(
+                When(name__istartswith=term, then=Value(0)),
+                default=Value(1),
+            )
+        )
+        .order_by("prefix", "name")
+    )
+
+
+def station_ids(term: str) -> list[int]:
+    """Ids of the stations matching the term, to filter foreign keys by"""
+    return list(search_stations(term).values_list("id", flat=True))
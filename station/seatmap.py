@@ -0,0 +1,131 @@
+import base64
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+from station.models import Journey, Ticket, SeatHold
+
+CACHE_TIMEOUT = 60
+
+
+class SeatMap:
+    """
+    Occupancy of one journey: a bitmask of taken seats per cargo plus a
+    sorted index of free runs (length, cargo, first seat), so the smallest
+    block fitting a party is found with one bisection.
+    """
+
+    __slots__ = ("cargo_num", "places_in_cargo", "occupied", "runs")
+
+    def __init__(
+        self,
+        cargo_num: int,
+        places_in_cargo: int,
+        taken: Iterable[tuple[int, int]],
+    ):
+        self.cargo_num = cargo_num
+        self.places_in_cargo = places_in_cargo
+        self.occupied = [0] * cargo_num
+        for cargo, seat in taken:
+            if 1 <= cargo <= cargo_num and 1 <= seat <= places_in_cargo:
+                self.occupied[cargo - 1] |= 1 << (seat - 1)
+
+        self.runs = []
+        for cargo in range(1, cargo_num + 1):
+            for start, length in self.free_runs(cargo):
+                self.runs.append((length, cargo, start))
+        self.runs.sort()
+
+    def free_runs(self, cargo: int) -> Iterable[tuple[int, int]]:
+        """(first seat, length) of every block of free seats in the cargo"""
+        mask = self.occupied[cargo - 1]
+        seat = 1
+        while seat <= self.places_in_cargo:
+            if mask >> (seat - 1) & 1:
+                seat += 1
+                continue
+            start = seat
+            while seat <= self.places_in_cargo and not mask >> (seat - 1) & 1:
+                seat += 1
+            yield start, seat - start
+
+    def best_block(self, size: int) -> Optional[tuple[int, list[int]]]:
+        """
+        The tightest run of at least size free seats in one cargo, so big
+        runs stay intact for big parties. Ties go to the lowest cargo/seat.
+        """
+        index = bisect_left(self.runs, (size, 0, 0))
+        if index == len(self.runs):
+            return None
+        _, cargo, start = self.runs[index]
+        return cargo, list(range(start, start + size))
+
+    def as_bitmaps(self) -> list[str]:
+        """
+        Base64 of each cargo's occupancy, little-endian: bit 0 of the first
+        byte is seat 1, a set bit means the seat is taken or held.
+        """
+        size = (self.places_in_cargo + 7) // 8
+        return [
+            base64.b64encode(mask.to_bytes(size, "little")).decode()
+            for mask in self.occupied
+        ]
+
+    def as_runs(self) -> list[list[int]]:
+        """
+        Run lengths of each cargo, alternating free and taken seats and
+        always starting with free ones (so a leading 0 means seat 1 is taken)
+        """
+        cargos = []
+        for mask in self.occupied:
+            runs = []
+            taken, length = False, 0
+            for seat in range(self.places_in_cargo):
+                if bool(mask >> seat & 1) == taken:
+                    length += 1
+                    continue
+                runs.append(length)
+                taken, length = not taken, 1
+            runs.append(length)
+            cargos.append(runs)
+        return cargos
+
+
+def _cache_key(journey_id: int) -> str:
+    return f"station:seatmap:{journey_id}"
+
+
+def build_seat_map(journey: Journey) -> SeatMap:
+    """One query for the sold and actively held seats of the journey"""
+    sold = (
+        Ticket.objects.filter(journey=journey)
+        .order_by()
+        .values_list("cargo", "seat")
+    )
+    held = (
+        SeatHold.objects.filter(journey=journey)
+        .active()
+        .order_by()
+        .values_list("cargo", "seat")
+    )
+    return SeatMap(
+        journey.train.cargo_num,
+        journey.train.places_in_cargo,
+        sold.union(held, all=True),
+    )
+
+
+def get_seat_map(journey: Journey, rebuild: bool = False) -> SeatMap:
+    seat_map = None if rebuild else cache.get(_cache_key(journey.pk))
+    if seat_map is None:
+        seat_map = build_seat_map(journey)
+        cache.set(_cache_key(journey.pk), seat_map, CACHE_TIMEOUT)
+    return seat_map
+
+
+def forget_seat_maps(journey_ids: Iterable[int]) -> None:
+    """Drop cached maps once the surrounding transaction commits"""
+    keys = [_cache_key(journey_id) for journey_id in set(journey_ids)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,8 +1,13 @@
-from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework.validators import UniqueTogetherValidator
 
+from station.booking import book_tickets
+from station.clusters import MAX_MAP_ZOOM
+from station.nearby import MAX_NEARBY
+from station.planner import MAX_LEGS
+from station.recurrence import find_occurrence, parse_occurrence_id
+from station.seatmap import SeatMap, get_seat_map
+from station.snapshots import FORMATS
 from station.models import (
     TrainType,
     Train,
@@ -10,8 +15,10 @@ from station.models import (
     Route,
     Crew,
     Journey,
+    JourneyTemplate,
     Ticket,
     Order,
+    SeatHold,
 )
 
 
@@ -73,6 +80,81 @@ class StationListSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "image")
 
 
+class StationSuggestionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Station
+        fields = ("id", "name")
+
+
+class StationDistanceSerializer(serializers.Serializer):
+    station = serializers.IntegerField()
+    distance = serializers.IntegerField()
+
+
+class StationDistanceMatrixSerializer(serializers.Serializer):
+    stations = serializers.ListField(child=serializers.IntegerField())
+    distances = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.IntegerField(allow_null=True)
+        )
+    )
+
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(
+        min_value=1, max_value=MAX_NEARBY, required=False
+    )
+    radius = serializers.FloatField(min_value=0, required=False)
+
+
+class NearbyStationSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    distance = serializers.FloatField(help_text="Kilometres")
+
+
+class StationClusterQuerySerializer(serializers.Serializer):
+    bbox = serializers.CharField(
+        help_text="west,south,east,north in degrees (west > east when"
+        " the viewport crosses the antimeridian)"
+    )
+    zoom = serializers.IntegerField(min_value=0, max_value=MAX_MAP_ZOOM)
+
+    def validate_bbox(self, bbox):
+        try:
+            west, south, east, north = map(float, bbox.split(","))
+        except ValueError:
+            raise ValidationError(
+                "Expected four numbers: west,south,east,north."
+            )
+        if not (-180 <= west <= 180 and -180 <= east <= 180):
+            raise ValidationError("Longitudes must be within [-180, 180].")
+        if not -90 <= south <= north <= 90:
+            raise ValidationError(
+                "Latitudes must be within [-90, 90], south before north."
+            )
+        return west, south, east, north
+
+
+class StationClusterSerializer(serializers.Serializer):
+    latitude = serializers.FloatField()
+    longitude = serializers.FloatField()
+    count = serializers.IntegerField()
+    station = serializers.IntegerField(
+        allow_null=True, help_text="The station of a cluster of one"
+    )
+    name = serializers.CharField(allow_null=True)
+
+
+class StationClustersSerializer(serializers.Serializer):
+    zoom = serializers.IntegerField(help_text="Zoom of the grid served")
+    clusters = StationClusterSerializer(many=True)
+
+
 class StationDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Station
@@ -116,6 +198,73 @@ class CrewDetailSerializer(serializers.ModelSerializer):
         fields = ("id", "first_name", "last_name", "email")
 
 
+class WeekdaysField(serializers.ListField):
+    """ISO weekdays (1 Monday to 7 Sunday) stored as a bitmask"""
+
+    child = serializers.IntegerField(min_value=1, max_value=7)
+
+    def to_internal_value(self, data):
+        days = set(super().to_internal_value(data))
+        return sum(1 << (day - 1) for day in days)
+
+    def to_representation(self, mask):
+        return [day for day in range(1, 8) if mask >> (day - 1) & 1]
+
+
+class JourneyTemplateSerializer(serializers.ModelSerializer):
+    weekdays = WeekdaysField(
+        allow_empty=False,
+        required=False,
+        help_text="ISO weekdays it runs on, every day by default",
+    )
+    cancelled_dates = serializers.ListField(
+        child=serializers.DateField(),
+        required=False,
+        help_text="Days it does not run after all",
+    )
+
+    class Meta:
+        model = JourneyTemplate
+        fields = (
+            "id",
+            "route",
+            "train",
+            "departure",
+            "travel_time",
+            "weekdays",
+            "valid_from",
+            "valid_until",
+            "cancelled_dates",
+            "crew_members",
+        )
+
+    def validate_departure(self, departure):
+        if departure.second or departure.microsecond:
+            raise ValidationError("Give the time to the minute.")
+        return departure
+
+    def validate_travel_time(self, travel_time):
+        if travel_time is not None and travel_time.total_seconds() <= 0:
+            raise ValidationError("The train must arrive after it departs.")
+        return travel_time
+
+    def validate_cancelled_dates(self, days):
+        return sorted({day.isoformat() for day in days})
+
+    def validate(self, attrs):
+        valid_from = attrs.get(
+            "valid_from", getattr(self.instance, "valid_from", None)
+        )
+        valid_until = attrs.get(
+            "valid_until", getattr(self.instance, "valid_until", None)
+        )
+        if valid_until < valid_from:
+            raise ValidationError(
+                {"valid_until": "The template ends before it starts."}
+            )
+        return attrs
+
+
 class JourneySerializer(serializers.ModelSerializer):
     class Meta:
         model = Journey
@@ -124,13 +273,54 @@ class JourneySerializer(serializers.ModelSerializer):
             "route",
             "train",
             "departure_time",
+            "arrival_time",
             "crew_members",
         )
 
+    def validate(self, attrs):
+        departure_time = attrs.get(
+            "departure_time", getattr(self.instance, "departure_time", None)
+        )
+        arrival_time = attrs.get(
+            "arrival_time", getattr(self.instance, "arrival_time", None)
+        )
+        if arrival_time is not None and arrival_time <= departure_time:
+            raise ValidationError(
+                {"arrival_time": "The train must arrive after it departs."}
+            )
+        return attrs
+
+
+class JourneyBulkSerializer(JourneySerializer):
+    """
+    A journey of a bulk request, created without an id and updated with
+    it. References are plain ids, checked for the whole request at once.
+    """
+
+    id = serializers.IntegerField(required=False)
+    route = serializers.IntegerField()
+    train = serializers.IntegerField()
+    crew_members = serializers.ListField(child=serializers.IntegerField())
+
+
+class JourneyBulkQuerySerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(
+        default=False,
+        help_text="Write nothing if any journey is invalid",
+    )
+
+
+class JourneyBulkResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField(allow_null=True)
+    status = serializers.ChoiceField(
+        choices=("created", "updated", "invalid", "skipped"),
+        help_text="skipped: valid, but not saved as others are invalid",
+    )
+    errors = serializers.DictField(required=False)
+
 
 class JourneyListSerializer(JourneySerializer):
     route = serializers.StringRelatedField(many=False)
-    tickets_available = serializers.IntegerField()
     train = serializers.StringRelatedField(many=False)
     crew_members = serializers.StringRelatedField(many=True)
 
@@ -146,20 +336,127 @@ class JourneyListSerializer(JourneySerializer):
         )
 
 
+class JourneyRowListSerializer(serializers.ListSerializer):
+    """
+    Renders journeys fetched as .values(*COLUMNS) exactly the way
+    JourneyListSerializer renders model instances, without creating a
+    single model object: the __str__ of the route, train and crew are
+    formatted from their columns, and the crews of the whole page are
+    read with one query in the order prefetch_related would give.
+    """
+
+    COLUMNS = (
+        "id",
+        "departure_time",
+        "tickets_available",
+        "route__source__name",
+        "route__destination__name",
+        "train__name",
+        "train__cargo_num",
+        "train__places_in_cargo",
+        "train__train_type__name",
+    )
+
+    @staticmethod
+    def occurrence_row(occurrence) -> dict:
+        """The columns of an occurrence of a template, and its template"""
+        template = occurrence.template
+        train = template.train
+        return {
+            "id": occurrence.id,
+            "departure_time": occurrence.departure_time,
+            "tickets_available": train.capacity,
+            "route__source__name": template.route.source.name,
+            "route__destination__name": template.route.destination.name,
+            "train__name": train.name,
+            "train__cargo_num": train.cargo_num,
+            "train__places_in_cargo": train.places_in_cargo,
+            "train__train_type__name": train.train_type.name,
+            "template_id": template.pk,
+        }
+
+    @staticmethod
+    def crews(through, owner: str, ids: set) -> dict[int, list[str]]:
+        """Names of the crew of each owner, ordered as Crew is"""
+        crews = {pk: [] for pk in ids}
+        assignments = (
+            through.objects.filter(**{f"{owner}__in": ids})
+            .order_by(*(f"crew__{field}" for field in Crew._meta.ordering))
+            .values_list(owner, "crew__first_name", "crew__last_name")
+        )
+        for pk, first_name, last_name in assignments:
+            crews[pk].append(f"{first_name} {last_name}")
+        return crews
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        crews = self.crews(
+            Journey.crew_members.through,
+            "journey_id",
+            {row["id"] for row in rows if "template_id" not in row},
+        )
+        templates = {
+            row["template_id"] for row in rows if "template_id" in row
+        }
+        if templates:
+            template_crews = self.crews(
+                JourneyTemplate.crew_members.through,
+                "journeytemplate_id",
+                templates,
+            )
+            for row in rows:
+                if "template_id" in row:
+                    crews[row["id"]] = template_crews[row["template_id"]]
+
+        departure_time = self.child.fields["departure_time"]
+        return [
+            {
+                "id": row["id"],
+                "route": f"{row['route__source__name']} - "
+                f"{row['route__destination__name']}",
+                "tickets_available": row["tickets_available"],
+                "train": f"{row['train__name']} "
+                f"({row['train__train_type__name']}, "
+                f"{row['train__cargo_num'] * row['train__places_in_cargo']}"
+                " places)",
+                "departure_time": departure_time.to_representation(
+                    row["departure_time"]
+                ),
+                "crew_members": crews[row["id"]],
+            }
+            for row in rows
+        ]
+
+
+class JourneyRowSerializer(JourneyListSerializer):
+    """JourneyListSerializer for rows of JourneyRowListSerializer.COLUMNS"""
+
+    class Meta(JourneyListSerializer.Meta):
+        list_serializer_class = JourneyRowListSerializer
+
+
 class TicketCargoSeatSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = ("cargo", "seat")
 
 
+class SeatHoldCargoSeatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("cargo", "seat")
+
+
 class JourneyDetailSerializer(JourneySerializer):
     route = RouteDetailSerializer(many=False)
     train = TrainListSerializer(many=False)
     crew_members = serializers.StringRelatedField(many=True)
-    tickets_available = serializers.IntegerField()
     taken_seats = TicketCargoSeatSerializer(
         many=True, read_only=True, source="tickets"
     )
+    held_seats = SeatHoldCargoSeatSerializer(
+        many=True, read_only=True, source="holds"
+    )
 
     class Meta:
         model = Journey
@@ -168,23 +465,159 @@ class JourneyDetailSerializer(JourneySerializer):
             "route",
             "train",
             "departure_time",
+            "arrival_time",
             "crew_members",
             "tickets_available",
             "taken_seats",
+            "held_seats",
         )
 
 
+class JourneyPlanQuerySerializer(serializers.Serializer):
+    source = serializers.PrimaryKeyRelatedField(queryset=Station.objects.all())
+    destination = serializers.PrimaryKeyRelatedField(
+        queryset=Station.objects.all()
+    )
+    after = serializers.DateTimeField(required=False)
+    min_transfer = serializers.IntegerField(min_value=0, required=False)
+    passengers = serializers.IntegerField(min_value=1, default=1)
+    max_legs = serializers.IntegerField(
+        min_value=1, max_value=MAX_LEGS, default=MAX_LEGS
+    )
+
+    def validate(self, attrs):
+        if attrs["source"] == attrs["destination"]:
+            raise ValidationError("Source and destination are the same.")
+        return attrs
+
+
+class JourneyPlanLegSerializer(serializers.Serializer):
+    journey = serializers.IntegerField(source="journey.id")
+    route = serializers.StringRelatedField(source="journey.route")
+    train = serializers.StringRelatedField(source="journey.train")
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    tickets_available = serializers.IntegerField(
+        source="journey.tickets_available"
+    )
+
+
+class JourneyPlanSerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    transfers = serializers.IntegerField()
+    legs = JourneyPlanLegSerializer(many=True)
+
+
+class JourneyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves journeys from the ones OrderSerializer prefetched, if any,
+    and occurrences of templates to the journeys made of them or, while
+    there are none, to the Occurrence, which the booking engine makes
+    into a journey in the transaction booking it
+    """
+
+    def to_internal_value(self, data):
+        occurrence = parse_occurrence_id(data)
+        if occurrence is not None:
+            try:
+                return find_occurrence(*occurrence)
+            except Journey.DoesNotExist:
+                self.fail("does_not_exist", pk_value=data)
+
+        journeys = self.context.get("journeys")
+        if journeys is None:
+            return super().to_internal_value(data)
+
+        try:
+            return journeys[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class SeatAllocationSerializer(serializers.Serializer):
+    party_size = serializers.IntegerField(min_value=1)
+    cargo = serializers.IntegerField(read_only=True)
+    seats = serializers.ListField(
+        child=serializers.IntegerField(), read_only=True
+    )
+
+
+class JourneySeatMapSerializer(JourneyDetailSerializer):
+    """Journey detail with compact occupancy instead of seat lists"""
+
+    seat_map = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Journey
+        fields = (
+            "id",
+            "route",
+            "train",
+            "departure_time",
+            "arrival_time",
+            "crew_members",
+            "tickets_available",
+            "seat_map",
+        )
+
+    def get_seat_map(self, journey):
+        seat_map = get_seat_map(journey)
+        seat_format = self.context["seat_format"]
+        if seat_format == "bitmap":
+            cargos = seat_map.as_bitmaps()
+        else:
+            cargos = seat_map.as_runs()
+        return {"format": seat_format, "cargos": cargos}
+
+
+class JourneyOccurrenceSerializer(serializers.Serializer):
+    """
+    An occurrence of a template shown like JourneyDetailSerializer or
+    JourneySeatMapSerializer show journeys, with every seat free
+    """
+
+    id = serializers.CharField()
+    template = serializers.IntegerField(source="template.pk")
+    route = RouteDetailSerializer(source="template.route")
+    train = TrainListSerializer(source="template.train")
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    crew_members = serializers.StringRelatedField(
+        many=True, source="template.crew_members"
+    )
+    tickets_available = serializers.IntegerField(
+        source="template.train.capacity"
+    )
+
+    def to_representation(self, occurrence):
+        data = super().to_representation(occurrence)
+        seat_format = self.context.get("seat_format", "list")
+        if seat_format == "list":
+            data["taken_seats"] = []
+            data["held_seats"] = []
+            return data
+
+        train = occurrence.template.train
+        seat_map = SeatMap(train.cargo_num, train.places_in_cargo, ())
+        if seat_format == "bitmap":
+            cargos = seat_map.as_bitmaps()
+        else:
+            cargos = seat_map.as_runs()
+        data["seat_map"] = {"format": seat_format, "cargos": cargos}
+        return data
+
+
 class TicketSerializer(serializers.ModelSerializer):
+    journey = JourneyRelatedField(queryset=Journey.objects.all())
+
     class Meta:
         model = Ticket
         fields = ("id", "cargo", "seat", "journey")
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Ticket.objects.all(),
-                fields=["seat", "cargo", "journey"],
-                message="This seat is already booked.",
-            )
-        ]
+        # Seat uniqueness is checked for the whole order at once
+        validators = []
 
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -215,17 +648,112 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ("id", "created_at", "tickets")
 
-    def create(self, validated_data):
-        with transaction.atomic():
-            tickets = validated_data.pop("tickets")
-            order = Order.objects.create(**validated_data)
+    def to_internal_value(self, data):
+        tickets = data.get("tickets") if hasattr(data, "get") else None
+        if isinstance(tickets, list):
+            journey_ids = set()
             for ticket in tickets:
-                order.tickets.add(
-                    Ticket.objects.create(order=order, **ticket)
+                try:
+                    journey_ids.add(int(ticket["journey"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.context["journeys"] = Journey.objects.select_related(
+                "train"
+            ).in_bulk(journey_ids)
+        return super().to_internal_value(data)
+
+    def validate_tickets(self, tickets):
+        errors = self.booked_seat_errors(tickets)
+        if errors:
+            raise ValidationError(errors)
+        return tickets
+
+    @staticmethod
+    def booked_seat_errors(tickets: list[dict]) -> list[dict]:
+        """Per-ticket errors for seats already sold or repeated in the order"""
+        # Occurrences of templates have no tickets yet
+        booked = set(
+            Ticket.objects.among(
+                ticket
+                for ticket in tickets
+                if isinstance(ticket["journey"], Journey)
+            ).values_list("journey_id", "cargo", "seat")
+        )
+        errors = []
+        for ticket in tickets:
+            place = (ticket["journey"].pk, ticket["cargo"], ticket["seat"])
+            if place in booked:
+                errors.append(
+                    {"non_field_errors": ["This seat is already booked."]}
                 )
-            order.save()
-            return order
+            else:
+                errors.append({})
+            booked.add(place)
+        return errors if any(errors) else []
+
+    def create(self, validated_data):
+        return book_tickets(validated_data.pop("tickets"), **validated_data)
 
 
 class OrderListSerializer(OrderSerializer):
     tickets = TicketListSerializer(read_only=True, many=True)
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("id", "journey", "cargo", "seat", "expires_at")
+
+
+class SeatSerializer(serializers.Serializer):
+    cargo = serializers.IntegerField()
+    seat = serializers.IntegerField()
+
+
+class SeatHoldCreateSerializer(serializers.Serializer):
+    journey = JourneyRelatedField(
+        queryset=Journey.objects.select_related("train")
+    )
+    seats = SeatSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        journey = attrs["journey"]
+        places = set()
+        for seat in attrs["seats"]:
+            Ticket.validate_seat(
+                seat["seat"], seat["cargo"], journey, ValidationError
+            )
+            places.add((seat["cargo"], seat["seat"]))
+        if len(places) != len(attrs["seats"]):
+            raise ValidationError("The same seat is requested twice.")
+        return attrs
+
+
+class SeatHoldCheckoutSerializer(serializers.Serializer):
+    holds = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False
+    )
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False, help_text="First day")
+    end = serializers.DateField(required=False, help_text="Last day")
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end"):
+            if attrs["start"] > attrs["end"]:
+                raise ValidationError("The range ends before it starts.")
+        return attrs
+
+
+class TicketExportQuerySerializer(serializers.Serializer):
+    journey = serializers.PrimaryKeyRelatedField(
+        queryset=Journey.objects.all()
+    )
+
+
+class SnapshotSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(choices=FORMATS, default="parquet")
+    full = serializers.BooleanField(
+        default=False, help_text="Rewrite the whole snapshot"
+    )
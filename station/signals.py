@@ -0,0 +1,126 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from station.autocomplete import forget_station_index
+from station.clusters import forget_station_clusters
+from station.distances import forget_distances
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Crew,
+    Journey,
+    JourneyTemplate,
+    Order,
+    Ticket,
+    SeatHold,
+)
+from station.nearby import log_station_changes
+from station.planner import log_journey_changes
+from station.recurrence import cancel_occurrence
+from station.seatmap import forget_seat_maps
+from station.versions import bump_versions
+
+
+@receiver(post_save, sender=Ticket)
+def take_seat(sender, instance, created, **kwargs):
+    if created:
+        journey = Journey.objects.filter(pk=instance.journey_id)
+        journey.shift_tickets_available(-1)
+        forget_seat_maps([instance.journey_id])
+
+
+@receiver(post_delete, sender=Ticket)
+def release_seat(sender, instance, **kwargs):
+    Journey.objects.filter(pk=instance.journey_id).shift_tickets_available(1)
+    forget_seat_maps([instance.journey_id])
+
+
+@receiver(post_save, sender=Train)
+def recount_train_journeys(sender, instance, created, **kwargs):
+    if not created:
+        journeys = Journey.objects.filter(train=instance)
+        journeys.recount_tickets_available()
+        forget_seat_maps(journeys.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Journey)
+def forget_journey_seat_map(sender, instance, created, **kwargs):
+    if not created:
+        forget_seat_maps([instance.pk])
+
+
+@receiver(post_save, sender=Journey)
+@receiver(post_delete, sender=Journey)
+def replan_journey(sender, instance, **kwargs):
+    log_journey_changes([instance.pk])
+
+
+@receiver(post_delete, sender=Journey)
+def cancel_journey_occurrence(sender, instance, **kwargs):
+    # Otherwise the template would show the day again
+    if instance.template_id is not None:
+        cancel_occurrence(instance.template_id, instance.service_date)
+
+
+@receiver(post_save, sender=Route)
+def replan_route_journeys(sender, instance, created, **kwargs):
+    if not created:
+        log_journey_changes(instance.journeys.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def forget_station_names(sender, **kwargs):
+    forget_station_index()
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def relocate_station(sender, instance, **kwargs):
+    log_station_changes([instance.pk])
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def regroup_stations(sender, **kwargs):
+    forget_station_clusters()
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def forget_route_distances(sender, **kwargs):
+    forget_distances()
+
+
+def bump_table_version(sender, **kwargs):
+    bump_versions(sender)
+
+
+for model in (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Crew,
+    Journey,
+    JourneyTemplate,
+    Order,
+    Ticket,
+    SeatHold,
+):
+    post_save.connect(bump_table_version, sender=model)
+    post_delete.connect(bump_table_version, sender=model)
+
+
+@receiver(m2m_changed, sender=Journey.crew_members.through)
+def bump_crew_assignment(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_versions(Journey)
+
+
+@receiver(m2m_changed, sender=JourneyTemplate.crew_members.through)
+def bump_template_crew(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_versions(JourneyTemplate)
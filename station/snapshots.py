@@ -0,0 +1,400 @@
+import itertools
+import json
+import os
+import shutil
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, QuerySet
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from station.exceptions import SnapshotRunning
+from station.exports import CHUNK_SIZE, between_days
+from station.models import Station, Route, Journey, Order, Ticket
+from station.swr import in_background
+
+FORMATS = ("parquet", "arrow")
+# Rows held in memory and written at once, whatever the table size
+BATCH_SIZE = 50_000
+# Changes are looked for from this long before the previous run started,
+# so rows written by transactions still open then are not missed
+LAG = timedelta(minutes=5)
+LOCK_KEY = "station:snapshot:lock"
+LOCK_TIMEOUT = 60 * 60
+STATE_FILE = "_snapshot.json"
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+
+class Table:
+    """
+    Columns of a model written to <name>/ as one file, or with a
+    partition field to <name>/<partition>=<local day>/ as one file per
+    day of that moment (Hive-style, as pyarrow.dataset, DuckDB or Spark
+    read them)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        queryset: QuerySet,
+        schema: pa.Schema,
+        moment: str = None,
+        partition: str = None,
+    ):
+        self.name = name
+        self.queryset = queryset
+        self.schema = schema
+        self.moment = moment
+        self.partition = partition
+
+    def directory(self, root: Path, day: date = None) -> Path:
+        if day is None:
+            return root / self.name
+        return root / self.name / f"{self.partition}={day.isoformat()}"
+
+    def rows(self, queryset: QuerySet) -> Iterator[tuple]:
+        columns = self.schema.names
+        if self.moment:
+            columns = [*columns, self.moment]
+        return queryset.values_list(*columns).iterator(CHUNK_SIZE)
+
+    def batches(self, rows: Iterable[tuple]) -> Iterator[pa.RecordBatch]:
+        rows = iter(rows)
+        width = len(self.schema)
+        while chunk := list(itertools.islice(rows, BATCH_SIZE)):
+            columns = list(zip(*chunk))[:width]
+            yield pa.RecordBatch.from_arrays(
+                [
+                    pa.array(column, type=field.type)
+                    for column, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+
+    def day_counts(self) -> dict[str, int]:
+        """Rows per local day of the moment"""
+        days = (
+            self.queryset.order_by()
+            .annotate(
+                day=TruncDate(
+                    self.moment, tzinfo=timezone.get_default_timezone()
+                )
+            )
+            .values("day")
+            .annotate(rows=Count("id"))
+            .values_list("day", "rows")
+        )
+        return {day.isoformat(): rows for day, rows in days}
+
+    def changed_days(self, field: str, since: datetime) -> set[str]:
+        """Local days of the moment of rows whose field is since or later"""
+        days = (
+            self.queryset.order_by()
+            .filter(**{f"{field}__gte": since})
+            .annotate(
+                day=TruncDate(
+                    self.moment, tzinfo=timezone.get_default_timezone()
+                )
+            )
+            .values_list("day", flat=True)
+            .distinct()
+        )
+        return {day.isoformat() for day in days}
+
+
+STATIONS = Table(
+    "station",
+    Station.objects.order_by("id"),
+    pa.schema(
+        [
+            ("id", pa.int64()),
+            ("name", pa.string()),
+            ("latitude", pa.float64()),
+            ("longitude", pa.float64()),
+            ("updated_at", TIMESTAMP),
+        ]
+    ),
+)
+ROUTES = Table(
+    "route",
+    Route.objects.order_by("id"),
+    pa.schema(
+        [
+            ("id", pa.int64()),
+            ("source_id", pa.int64()),
+            ("destination_id", pa.int64()),
+            ("distance", pa.int32()),
+            ("updated_at", TIMESTAMP),
+        ]
+    ),
+)
+JOURNEYS = Table(
+    "journey",
+    Journey.objects.all(),
+    pa.schema(
+        [
+            ("id", pa.int64()),
+            ("route_id", pa.int64()),
+            ("train_id", pa.int64()),
+            ("departure_time", TIMESTAMP),
+            ("arrival_time", TIMESTAMP),
+            ("tickets_available", pa.int32()),
+            ("updated_at", TIMESTAMP),
+        ]
+    ),
+    moment="departure_time",
+    partition="departure_date",
+)
+TICKETS = Table(
+    "ticket",
+    Ticket.objects.all(),
+    pa.schema(
+        [
+            ("id", pa.int64()),
+            ("journey_id", pa.int64()),
+            ("order_id", pa.int64()),
+            ("cargo", pa.int32()),
+            ("seat", pa.int32()),
+        ]
+    ),
+    moment="journey__departure_time",
+    partition="departure_date",
+)
+ORDERS = Table(
+    "order",
+    Order.objects.all(),
+    pa.schema(
+        [
+            ("id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("created_at", TIMESTAMP),
+        ]
+    ),
+    moment="created_at",
+    partition="created_date",
+)
+TABLES = (STATIONS, ROUTES, JOURNEYS, TICKETS, ORDERS)
+
+
+def _write(
+    path: Path, schema: pa.Schema, batches: Iterable, file_format: str
+) -> int:
+    """Write the batches to the file and return the number of rows"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and renamed, so readers never open a partial file
+    # (dataset readers skip names starting with a dot)
+    partial = path.parent / f".{path.name}.{uuid.uuid4().hex}.partial"
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(str(partial), schema)
+    else:
+        writer = pa.ipc.new_file(str(partial), schema)
+    rows = 0
+    try:
+        with writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, path)
+    return rows
+
+
+def _local_day(moment: datetime) -> date:
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment, timezone.get_default_timezone())
+    return moment.date()
+
+
+def _ranges(days: Iterable[date]) -> Iterator[tuple[date, date]]:
+    """(first, last) of each run of consecutive days"""
+    days = sorted(days)
+    for _, run in itertools.groupby(
+        enumerate(days), lambda pair: pair[1] - timedelta(days=pair[0])
+    ):
+        run = [day for _, day in run]
+        yield run[0], run[-1]
+
+
+def _write_whole(table: Table, root: Path, file_format: str) -> int:
+    path = table.directory(root) / f"part.{file_format}"
+    return _write(
+        path,
+        table.schema,
+        table.batches(table.rows(table.queryset)),
+        file_format,
+    )
+
+
+def _write_days(
+    table: Table, days: set[str], root: Path, file_format: str
+) -> int:
+    """Rewrite the partitions of the days, dropping ones left empty"""
+    days = {date.fromisoformat(day) for day in days}
+    written = set()
+    rows = 0
+    for first, last in _ranges(days):
+        queryset = between_days(table.queryset, table.moment, first, last)
+        ordered = table.rows(queryset.order_by(table.moment, "id"))
+        for day, group in itertools.groupby(
+            ordered, lambda row: _local_day(row[-1])
+        ):
+            path = table.directory(root, day) / f"part.{file_format}"
+            rows += _write(
+                path, table.schema, table.batches(group), file_format
+            )
+            written.add(day)
+
+    for day in days - written:
+        shutil.rmtree(table.directory(root, day), ignore_errors=True)
+    return rows
+
+
+def _signature(table: Table) -> list:
+    found = table.queryset.aggregate(
+        rows=Count("id"), modified=Max("updated_at")
+    )
+    modified = found["modified"]
+    return [found["rows"], modified and modified.isoformat()]
+
+
+def _dirty_days(
+    table: Table, field: str, since: Optional[datetime], counts: dict
+) -> tuple[set[str], dict]:
+    """
+    Days whose partition is out of date: the ones of rows changed since
+    the previous run, plus the ones that lost rows (deleted or moved to
+    another day), which show as changed counts
+    """
+    current = table.day_counts()
+    if since is None:
+        return set(current), current
+    days = {
+        day
+        for day in current.keys() | counts.keys()
+        if current.get(day) != counts.get(day)
+    }
+    return days | table.changed_days(field, since), current
+
+
+def _load_state(root: Path) -> dict:
+    try:
+        with open(root / STATE_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(root: Path, state: dict) -> None:
+    partial = root / f"{STATE_FILE}.{uuid.uuid4().hex}.partial"
+    with open(partial, "w") as file:
+        json.dump(state, file, indent=2)
+    os.replace(partial, root / STATE_FILE)
+
+
+def snapshot_state(root: Path = None) -> dict:
+    """What the last snapshot covered, empty before the first one"""
+    return _load_state(Path(root or settings.SNAPSHOTS_DIR))
+
+
+def _lock(file_format: str) -> None:
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {file_format!r}")
+    if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+        raise SnapshotRunning
+
+
+def write_snapshot(
+    file_format: str = "parquet", full: bool = False, root: Path = None
+) -> dict:
+    """
+    Bring the snapshot in root (SNAPSHOTS_DIR by default) up to date,
+    rewriting only the partitions whose rows changed since the previous
+    run, or everything with full or a different format. Stations and
+    routes are small and rewritten whole when they change.
+
+    Bookings and cancellations move updated_at of their journey on, so
+    the ticket partitions follow the journey ones. Orders are never
+    changed, only placed or deleted.
+
+    Returns the rows written per table; raises SnapshotRunning while
+    another snapshot is being written.
+    """
+    _lock(file_format)
+    try:
+        return _write_snapshot(
+            file_format, full, Path(root or settings.SNAPSHOTS_DIR)
+        )
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def start_snapshot(file_format: str = "parquet", full: bool = False) -> None:
+    """write_snapshot in a background thread"""
+    _lock(file_format)
+
+    def run():
+        try:
+            _write_snapshot(file_format, full, Path(settings.SNAPSHOTS_DIR))
+        finally:
+            cache.delete(LOCK_KEY)
+
+    in_background(run)
+
+
+def _write_snapshot(file_format: str, full: bool, root: Path) -> dict:
+    state = _load_state(root)
+    if full or state.get("format") != file_format:
+        for table in TABLES:
+            shutil.rmtree(table.directory(root), ignore_errors=True)
+        state = {}
+    root.mkdir(parents=True, exist_ok=True)
+
+    started = timezone.now()
+    since = None
+    if "started_at" in state:
+        since = datetime.fromisoformat(state["started_at"]) - LAG
+    counts = state.get("rows_per_day", {})
+    written = {}
+
+    for table in (STATIONS, ROUTES):
+        signature = _signature(table)
+        if signature != state.get(table.name):
+            written[table.name] = _write_whole(table, root, file_format)
+            state[table.name] = signature
+
+    journey_days, journey_counts = _dirty_days(
+        JOURNEYS, "updated_at", since, counts.get(JOURNEYS.name, {})
+    )
+    order_days, order_counts = _dirty_days(
+        ORDERS, "created_at", since, counts.get(ORDERS.name, {})
+    )
+    for table, days in (
+        (JOURNEYS, journey_days),
+        (TICKETS, journey_days),
+        (ORDERS, order_days),
+    ):
+        if days:
+            written[table.name] = _write_days(table, days, root, file_format)
+
+    state.update(
+        format=file_format,
+        started_at=started.isoformat(),
+        finished_at=timezone.now().isoformat(),
+        written=written,
+        rows_per_day={
+            JOURNEYS.name: journey_counts,
+            ORDERS.name: order_counts,
+        },
+    )
+    _save_state(root, state)
+    return written
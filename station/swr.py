@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+from station.versions import table_versions
+
+logger = logging.getLogger(__name__)
+
+# Longest a computation may hold the lock others wait on or skip for
+LOCK_TIMEOUT = 30
+# How long a miss waits for the same search running in another process
+WAIT = 5
+POLL = 0.05
+
+
+def in_background(function: Callable[[], Any]) -> None:
+    def run():
+        try:
+            function()
+        except Exception:
+            logger.exception("Background refresh failed")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = self.error = None
+
+
+class SearchCache:
+    """
+    Results of expensive reads kept in the shared cache together with
+    the version of the data they were computed from. A result of the
+    current version is always served. Once the data changed, the result
+    is still served as it is for fresh seconds after it was computed,
+    then for up to stale seconds more while a single background refresh
+    recomputes it.
+
+    Identical concurrent misses are coalesced (singleflight): one
+    computes, the others in the process wait for it and the ones in
+    other processes poll the cache, either for up to WAIT seconds
+    before computing it themselves.
+    """
+
+    _flights: dict[str, _Flight] = {}
+    _flights_lock = threading.Lock()
+
+    def __init__(self, name: str, fresh: int, stale: int):
+        self.name = name
+        self.fresh = fresh
+        self.stale = stale
+
+    def _key(self, key: str) -> str:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return f"station:search:{self.name}:{digest}"
+
+    def _compute(self, key: str, compute: Callable[[], tuple]) -> tuple:
+        version, value = compute()
+        cache.set(key, (time.time(), version, value), self.fresh + self.stale)
+        return version, value
+
+    def _refresh(self, key: str, compute: Callable[[], tuple]) -> None:
+        try:
+            self._compute(key, compute)
+        finally:
+            cache.delete(f"{key}:lock")
+
+    def get(
+        self, key: str, version: Any, compute: Callable[[], tuple]
+    ) -> tuple:
+        """
+        (version, value) for the key, where compute() returns them for
+        the data as it is when it starts
+        """
+        key = self._key(key)
+        entry = cache.get(key)
+        if entry is not None:
+            stored_at, stored_version, value = entry
+            if stored_version == version:
+                return stored_version, value
+            if time.time() - stored_at < self.fresh:
+                return stored_version, value
+            if cache.add(f"{key}:lock", True, LOCK_TIMEOUT):
+                in_background(lambda: self._refresh(key, compute))
+            return stored_version, value
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(WAIT):
+                return self._compute(key, compute)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._coalesced(key, compute)
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def _coalesced(self, key: str, compute: Callable[[], tuple]) -> tuple:
+        if not cache.add(f"{key}:lock", True, LOCK_TIMEOUT):
+            deadline = time.monotonic() + WAIT
+            while time.monotonic() < deadline:
+                time.sleep(POLL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry[1:]
+            return self._compute(key, compute)
+
+        try:
+            return self._compute(key, compute)
+        finally:
+            cache.delete(f"{key}:lock")
+
+
+class StaleWhileRevalidateMixin:
+    """
+    Serve list through a SearchCache configured for the viewset's
+    basename in SEARCH_CACHE_FRESHNESS, versioned by version_tables.
+    A result that may be stale carries the validators of the versions
+    it was computed from.
+    """
+
+    def list(self, request, *args, **kwargs):
+        freshness = settings.SEARCH_CACHE_FRESHNESS.get(self.basename)
+        if freshness is None:
+            return super().list(request, *args, **kwargs)
+
+        handler = super().list
+
+        def compute():
+            versions = table_versions(self.version_tables)
+            return versions, handler(request, *args, **kwargs).data
+
+        current = self.versions or table_versions(self.version_tables)
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        versions, data = SearchCache(self.basename, **freshness).get(
+            f"{request.build_absolute_uri(request.path)}?{query}",
+            current,
+            compute,
+        )
+        response = Response(data)
+        self.set_validators(response, *self.get_validators(request, versions))
+        return response
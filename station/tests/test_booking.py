@@ -0,0 +1,219 @@
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.booking import book_tickets
+from station.exceptions import SeatsTaken
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Journey,
+    Order,
+    Ticket,
+)
+from station.serializers import OrderSerializer
+
+ORDER_URL = reverse("train-station:order-list")
+
+
+def sample_train_type():
+    return TrainType.objects.create(name=f"express{uuid.uuid4()}")
+
+
+def sample_train(**params):
+    defaults = {
+        "name": "Lincorn",
+        "cargo_num": 10,
+        "places_in_cargo": 15,
+        "train_type": sample_train_type(),
+    }
+    defaults.update(params)
+
+    return Train.objects.create(**defaults)
+
+
+def sample_station(**params):
+    defaults = {
+        "name": f"Sample vokzal{uuid.uuid4()}",
+        "latitude": 10.15,
+        "longitude": 32.14,
+    }
+    defaults.update(params)
+
+    return Station.objects.get_or_create(**defaults)[0]
+
+
+def sample_route(**params):
+    defaults = {
+        "source": sample_station(),
+        "destination": sample_station(),
+        "distance": random.randint(1, 10000),
+    }
+    defaults.update(params)
+    return Route.objects.create(**defaults)
+
+
+def sample_journey(**params):
+    defaults = {
+        "route": sample_route(),
+        "train": sample_train(),
+        "departure_time": timezone.now() + datetime.timedelta(days=1),
+    }
+    defaults.update(params)
+    return Journey.objects.create(**defaults)
+
+
+class BookingEngineTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            email="user@hmail.com", password="efeai341@"
+        )
+        self.journey = sample_journey()
+
+    def test_book_tickets_creates_order(self):
+        order = book_tickets(
+            [
+                {"journey": self.journey, "cargo": 1, "seat": 1},
+                {"journey": self.journey, "cargo": 1, "seat": 2},
+            ],
+            user=self.user,
+        )
+        self.assertEqual(order.tickets.count(), 2)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 148)
+
+    def test_book_tickets_lists_taken_seats(self):
+        book_tickets(
+            [{"journey": self.journey, "cargo": 2, "seat": 5}],
+            user=self.user,
+        )
+        with self.assertRaises(SeatsTaken) as error:
+            book_tickets(
+                [
+                    {"journey": self.journey, "cargo": 2, "seat": 4},
+                    {"journey": self.journey, "cargo": 2, "seat": 5},
+                ],
+                user=self.user,
+            )
+        self.assertEqual(
+            error.exception.detail["taken_seats"],
+            [{"journey": self.journey.id, "cargo": 2, "seat": 5}],
+        )
+        self.assertEqual(Order.objects.count(), 1)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 149)
+
+    def test_seat_race_returns_conflict(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        book_tickets(
+            [{"journey": self.journey, "cargo": 1, "seat": 1}],
+            user=self.user,
+        )
+        payload = {
+            "tickets": [{"seat": 1, "cargo": 1, "journey": self.journey.id}]
+        }
+
+        # Pretend the seat was sold between validation and booking
+        with mock.patch.object(
+            OrderSerializer, "booked_seat_errors", return_value=[]
+        ):
+            res = client.post(ORDER_URL, data=payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["taken_seats"],
+            [{"journey": self.journey.id, "cargo": 1, "seat": 1}],
+        )
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Seat races need a database with real row locks",
+)
+class BookingStressTest(TransactionTestCase):
+    """
+    Fires BOOKING_STRESS_BUYERS concurrent buyers at one journey, each
+    trying to book two random seats out of a small pool.
+    """
+
+    buyers = int(os.getenv("BOOKING_STRESS_BUYERS", 50))
+
+    def setUp(self):
+        self.journey = sample_journey(
+            train=sample_train(cargo_num=1, places_in_cargo=30)
+        )
+        self.users = [
+            get_user_model().objects.create(
+                email=f"buyer{i}@hmail.com", password="efeai341@"
+            )
+            for i in range(self.buyers)
+        ]
+
+    def buy(self, user, start, results):
+        seats = random.sample(range(1, 31), 2)
+        start.wait()
+        try:
+            journey = Journey.objects.get(pk=self.journey.pk)
+            book_tickets(
+                [
+                    {"journey": journey, "cargo": 1, "seat": seat}
+                    for seat in seats
+                ],
+                user=user,
+            )
+            results.append("booked")
+        except SeatsTaken:
+            results.append("conflict")
+        except Exception as error:
+            results.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_buyers(self):
+        results = []
+        start = threading.Barrier(self.buyers + 1)
+        threads = [
+            threading.Thread(target=self.buy, args=(user, start, results))
+            for user in self.users
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started_at
+
+        errors = [
+            result for result in results if isinstance(result, Exception)
+        ]
+        self.assertEqual(errors, [])
+
+        booked = results.count("booked")
+        conflicts = results.count("conflict")
+        self.assertEqual(booked + conflicts, self.buyers)
+        self.assertEqual(Ticket.objects.count(), booked * 2)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 30 - booked * 2)
+
+        sys.stderr.write(
+            f"\n{self.buyers} buyers in {elapsed:.2f}s: "
+            f"{self.buyers / elapsed:.1f} attempts/s, {booked} booked, "
+            f"conflict rate {conflicts / self.buyers:.0%}\n"
+        )
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.booking import book_tickets
+from station.models import Station, Route, TrainType, Train, Journey
+
+STATION_URL = reverse("train-station:station-list")
+
+
+def detail_url(station_id: int):
+    return reverse("train-station:station-detail", args=[station_id])
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lviv = Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            )
+            self.kyiv = Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            )
+
+    def test_list_and_detail_have_validators(self):
+        for url in (STATION_URL, detail_url(self.lviv.id)):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res["ETag"].startswith('"'))
+            self.assertIn("Last-Modified", res)
+
+    def test_matching_etag_is_not_modified_without_queries(self):
+        etag = self.client.get(STATION_URL)["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(STATION_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+        self.assertEqual(res.content, b"")
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get(STATION_URL)["ETag"]
+        res = self.client.get(
+            STATION_URL, {"name": "Lv"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_writes_change_etag(self):
+        etag = self.client.get(detail_url(self.lviv.id))["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kyiv.name = "Kyiv-Pasazhyrskyi"
+            self.kyiv.save()
+
+        res = self.client.get(
+            detail_url(self.lviv.id), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(STATION_URL)["Last-Modified"]
+        res = self.client.get(
+            STATION_URL, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_updated_at(self):
+        before = self.lviv.updated_at
+        Station.objects.filter(pk=self.lviv.pk).update(name="Lemberg")
+        self.lviv.refresh_from_db()
+        self.assertGreater(self.lviv.updated_at, before)
+
+
+class BulkWritesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "buyer@test.com", "password"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            source = Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            )
+            destination = Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            )
+            route = Route.objects.create(
+                source=source, destination=destination, distance=540
+            )
+            train = Train.objects.create(
+                name="Hyundai",
+                cargo_num=2,
+                places_in_cargo=10,
+                train_type=TrainType.objects.create(name="Intercity"),
+            )
+            self.journey = Journey.objects.create(
+                route=route,
+                train=train,
+                departure_time=timezone.make_aware(datetime(2030, 1, 3, 8)),
+            )
+
+    def test_booking_changes_journey_etag(self):
+        url = reverse("train-station:journey-detail", args=[self.journey.id])
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            book_tickets(
+                [{"journey": self.journey, "cargo": 1, "seat": 1}],
+                user=self.user,
+            )
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["tickets_available"], 19)
+
+    def test_bulk_update_stamps_updated_at(self):
+        before = self.journey.updated_at
+        self.journey.departure_time += timedelta(hours=1)
+        Journey.objects.bulk_update([self.journey], ["departure_time"])
+        self.journey.refresh_from_db()
+        self.assertGreater(self.journey.updated_at, before)
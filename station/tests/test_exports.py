@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.booking import book_tickets
+from station.models import Station, Route, TrainType, Train, Journey, Order
+
+JOURNEYS_URL = reverse("train-station:export-journeys")
+TICKETS_URL = reverse("train-station:export-tickets")
+ORDERS_URL = reverse("train-station:export-orders")
+
+
+def content(response) -> str:
+    return b"".join(response.streaming_content).decode()
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            "staff@test.com", "password", is_staff=True
+        )
+        self.buyer = get_user_model().objects.create_user(
+            "buyer@test.com", "password"
+        )
+        route = Route.objects.create(
+            source=Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            ),
+            destination=Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            ),
+            distance=540,
+        )
+        train = Train.objects.create(
+            name="Hyundai",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=TrainType.objects.create(name="Intercity"),
+        )
+        self.journeys = [
+            Journey.objects.create(
+                route=route,
+                train=train,
+                departure_time=timezone.make_aware(datetime(2030, 1, day, 8)),
+            )
+            for day in (3, 4)
+        ]
+        self.order = book_tickets(
+            [
+                {"journey": self.journeys[0], "cargo": 2, "seat": 5},
+                {"journey": self.journeys[0], "cargo": 1, "seat": 7},
+            ],
+            user=self.buyer,
+        )
+        self.client.force_authenticate(self.staff)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.buyer)
+        res = self.client.get(JOURNEYS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(res["Content-Type"], "application/json")
+
+    def test_journeys_csv(self):
+        res = self.client.get(JOURNEYS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="journeys.csv"', res["Content-Disposition"])
+
+        rows = list(csv.DictReader(io.StringIO(content(res))))
+        self.assertEqual(
+            [row["id"] for row in rows],
+            [str(journey.id) for journey in self.journeys],
+        )
+        self.assertEqual(rows[0]["source"], "Lviv")
+        self.assertEqual(rows[0]["train_type"], "Intercity")
+        self.assertEqual(rows[0]["capacity"], "20")
+        self.assertEqual(rows[0]["tickets_available"], "18")
+        self.assertEqual(
+            rows[0]["departure_time"], "2030-01-03T08:00:00+02:00"
+        )
+        self.assertEqual(rows[0]["arrival_time"], "")
+
+    def test_journeys_ndjson_between_days(self):
+        res = self.client.get(
+            JOURNEYS_URL,
+            {"start": "2030-01-04", "end": "2030-01-04"},
+            HTTP_ACCEPT="application/x-ndjson",
+        )
+        self.assertEqual(
+            res["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        rows = [json.loads(line) for line in content(res).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.journeys[1].id)
+        self.assertIsNone(rows[0]["arrival_time"])
+
+    def test_tickets_of_journey(self):
+        res = self.client.get(
+            TICKETS_URL, {"journey": self.journeys[0].id, "format": "ndjson"}
+        )
+        rows = [json.loads(line) for line in content(res).splitlines()]
+        self.assertEqual(
+            [(row["cargo"], row["seat"]) for row in rows], [(1, 7), (2, 5)]
+        )
+        self.assertEqual(rows[0]["email"], "buyer@test.com")
+        self.assertEqual(rows[0]["order_id"], self.order.id)
+
+    def test_orders_between_days(self):
+        Order.objects.create(user=self.buyer)
+        Order.objects.filter(pk=self.order.pk).update(
+            created_at=timezone.make_aware(datetime(2030, 1, 1, 23, 30))
+        )
+        res = self.client.get(
+            ORDERS_URL, {"start": "2030-01-01", "end": "2030-01-01"}
+        )
+        rows = list(csv.DictReader(io.StringIO(content(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], str(self.order.id))
+        self.assertEqual(rows[0]["tickets_count"], "2")
+
+    def test_invalid_query(self):
+        for url, params in (
+            (ORDERS_URL, {"start": "2030-01-02", "end": "2030-01-01"}),
+            (JOURNEYS_URL, {"start": "tomorrow"}),
+            (TICKETS_URL, {}),
+        ):
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(res["Content-Type"], "application/json")
+
+    def test_options_answered_in_json(self):
+        res = self.client.options(JOURNEYS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/json")
+        self.assertEqual(res.json()["name"], "Journeys")
+
+    def test_long_exports_are_sent_in_pieces(self):
+        Journey.objects.bulk_create(
+            Journey(
+                route=self.journeys[0].route,
+                train=self.journeys[0].train,
+                departure_time=self.journeys[0].departure_time,
+            )
+            for _ in range(3000)
+        )
+        res = self.client.get(JOURNEYS_URL)
+        pieces = list(res.streaming_content)
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual(b"".join(pieces).count(b"\n"), 3003)
@@ -0,0 +1,246 @@
+import tempfile
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from station.models import Station, Route, TrainType, Train, Crew, Journey
+from station.timetable import TimetableError, import_timetable
+from station.versions import table_versions
+
+
+class ImportTimetableTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        Station.objects.create(name="Kyiv", latitude=50.45, longitude=30.52)
+        self.train = Train.objects.create(
+            name="Hyundai",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=TrainType.objects.create(name="Intercity"),
+        )
+        self.crew = Crew.objects.create(first_name="Olena", last_name="Koval")
+
+        self.write(
+            "stations.csv",
+            "name,latitude,longitude",
+            "Lviv,49.84,24.03",
+            "Kyiv,50.4501,30.5234",
+        )
+        self.write(
+            "routes.csv",
+            "route_id,source,destination,distance",
+            "west,Lviv,Kyiv,540",
+            "east,Kyiv,Lviv,540",
+        )
+        self.write(
+            "trips.csv",
+            "trip_id,route_id,train_id,departure_time,arrival_time",
+            f"1,west,{self.train.id},2030-01-03 08:15,2030-01-03 14:00",
+            f"2,east,{self.train.id},2030-01-03T16:00:00+00:00,",
+        )
+        self.write(
+            "crew_assignments.csv", "trip_id,crew_id", f"1,{self.crew.id}"
+        )
+
+    def write(self, name: str, *lines: str) -> None:
+        (self.directory / name).write_text("\n".join(lines) + "\n")
+
+    def test_import(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rows, written = import_timetable(self.directory)
+        self.assertEqual(rows, 7)
+        self.assertEqual(
+            written,
+            {
+                "stations": {"inserted": 1, "updated": 1},
+                "routes": {"inserted": 2, "updated": 0},
+                "journeys": {"inserted": 2, "updated": 0},
+                "crew_assignments": {"inserted": 1, "deleted": 0},
+            },
+        )
+
+        kyiv = Station.objects.get(name="Kyiv")
+        self.assertEqual(kyiv.latitude, 50.4501)
+        journey = Journey.objects.get(route__source__name="Lviv")
+        self.assertEqual(
+            journey.departure_time,
+            timezone.make_aware(datetime(2030, 1, 3, 8, 15)),
+        )
+        self.assertEqual(journey.departure_minute, 8 * 60 + 15)
+        self.assertEqual(journey.tickets_available, 20)
+        self.assertEqual(list(journey.crew_members.all()), [self.crew])
+
+        other = Journey.objects.get(route__source__name="Kyiv")
+        self.assertIsNone(other.arrival_time)
+        # 16:00 UTC is 18:00 in Kyiv
+        self.assertEqual(other.departure_minute, 18 * 60)
+        self.assertEqual(
+            Route.objects.get(pk=other.route_id).description,
+            "Straight to the point of destination",
+        )
+
+    def test_reimport_writes_nothing(self):
+        import_timetable(self.directory)
+        _, written = import_timetable(self.directory)
+        self.assertEqual(
+            {table: sum(count.values()) for table, count in written.items()},
+            {"stations": 0, "routes": 0, "journeys": 0, "crew_assignments": 0},
+        )
+        self.assertEqual(Journey.objects.count(), 2)
+
+    def test_reimport_updates_changed_rows(self):
+        import_timetable(self.directory)
+        other = Crew.objects.create(first_name="Taras", last_name="Bondar")
+        self.write(
+            "stations.csv",
+            "name,latitude,longitude",
+            "Lviv,49.8397,24.0297",
+            "Kyiv,50.4501,30.5234",
+        )
+        self.write(
+            "routes.csv",
+            "route_id,source,destination,distance,description",
+            "west,Lviv,Kyiv,540,Through Ternopil",
+            "east,Kyiv,Lviv,540,",
+        )
+        self.write(
+            "trips.csv",
+            "trip_id,route_id,train_id,departure_time,arrival_time",
+            f"1,west,{self.train.id},2030-01-03 08:15,2030-01-03 14:30",
+            f"2,east,{self.train.id},2030-01-03T16:00:00+00:00,",
+        )
+        self.write(
+            "crew_assignments.csv",
+            "trip_id,crew_id",
+            f"1,{other.id}",
+            f"2,{self.crew.id}",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            _, written = import_timetable(self.directory)
+
+        self.assertEqual(
+            written,
+            {
+                "stations": {"inserted": 0, "updated": 1},
+                "routes": {"inserted": 0, "updated": 1},
+                "journeys": {"inserted": 0, "updated": 1},
+                "crew_assignments": {"inserted": 2, "deleted": 1},
+            },
+        )
+        self.assertEqual(Station.objects.get(name="Lviv").latitude, 49.8397)
+        journey = Journey.objects.get(route__source__name="Lviv")
+        self.assertEqual(journey.route.description, "Through Ternopil")
+        self.assertEqual(
+            journey.arrival_time,
+            timezone.make_aware(datetime(2030, 1, 3, 14, 30)),
+        )
+        self.assertEqual(list(journey.crew_members.all()), [other])
+        other_journey = Journey.objects.get(route__source__name="Kyiv")
+        self.assertEqual(
+            other_journey.route.description,
+            "Straight to the point of destination",
+        )
+        self.assertEqual(list(other_journey.crew_members.all()), [self.crew])
+
+    def test_reimport_without_crew_keeps_it(self):
+        import_timetable(self.directory)
+        (self.directory / "crew_assignments.csv").unlink()
+        _, written = import_timetable(self.directory)
+        self.assertEqual(
+            written["crew_assignments"], {"inserted": 0, "deleted": 0}
+        )
+        journey = Journey.objects.get(route__source__name="Lviv")
+        self.assertEqual(list(journey.crew_members.all()), [self.crew])
+
+    def test_bumps_versions(self):
+        before, _ = table_versions([Station, Journey])
+        with self.captureOnCommitCallbacks(execute=True):
+            import_timetable(self.directory)
+        after, _ = table_versions([Station, Journey])
+        self.assertGreater(after[0], before[0])
+        self.assertGreater(after[1], before[1])
+
+    def test_rows_at_fault_refuse_everything(self):
+        self.write(
+            "routes.csv",
+            "route_id,source,destination,distance",
+            "west,Lviv,Kyiv,540",
+            "west,Lviv,Odesa,480",
+        )
+        self.write(
+            "trips.csv",
+            "trip_id,route_id,train_id,departure_time",
+            f"1,west,{self.train.id + 1},2030-01-03 08:15",
+            f"2,north,{self.train.id},2030-01-03 08:15",
+        )
+        with self.assertRaises(TimetableError) as raised:
+            import_timetable(self.directory)
+
+        self.assertEqual(
+            raised.exception.problems,
+            [
+                "routes.csv, line 2: route_id used twice",
+                "routes.csv, line 3: route_id used twice",
+                "routes.csv, line 3: unknown source or destination station",
+                "trips.csv, line 3: route_id not in routes.csv",
+                "trips.csv, line 2: unknown train_id",
+            ],
+        )
+        self.assertFalse(Station.objects.filter(name="Lviv").exists())
+
+    def test_arrival_not_after_departure(self):
+        self.write(
+            "trips.csv",
+            "trip_id,route_id,train_id,departure_time,arrival_time",
+            f"1,west,{self.train.id},2030-01-03 08:15,2030-01-03 08:15",
+            f"2,east,{self.train.id},2030-01-03 16:00,2030-01-03 15:00",
+        )
+        with self.assertRaises(TimetableError) as raised:
+            import_timetable(self.directory)
+        self.assertEqual(
+            raised.exception.problems,
+            [
+                "trips.csv, line 2: arrival not after departure",
+                "trips.csv, line 3: arrival not after departure",
+            ],
+        )
+
+    def test_values_of_wrong_type(self):
+        self.write(
+            "trips.csv",
+            "trip_id,route_id,train_id,departure_time",
+            f"1,west,{self.train.id},next week",
+        )
+        with self.assertRaisesRegex(TimetableError, "trips.csv"):
+            import_timetable(self.directory)
+
+    def test_unknown_column(self):
+        self.write("stations.csv", "name,lat,longitude", "Lviv,49.84,24.03")
+        with self.assertRaises(TimetableError) as raised:
+            import_timetable(self.directory)
+        self.assertEqual(
+            raised.exception.problems,
+            [
+                "stations.csv: unknown column lat",
+                "stations.csv: missing column latitude",
+            ],
+        )
+
+    def test_command(self):
+        out = StringIO()
+        call_command("import_timetable", self.directory, stdout=out)
+        self.assertIn("journeys: 2 inserted, 0 updated", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+
+        (self.directory / "trips.csv").write_text("trip_id\n1\n")
+        with self.assertRaisesRegex(CommandError, "Nothing imported"):
+            call_command("import_timetable", self.directory, stdout=out)
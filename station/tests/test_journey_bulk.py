@@ -0,0 +1,224 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Crew,
+    Journey,
+    Order,
+    Ticket,
+)
+from station.scheduling import MAX_BULK_JOURNEYS
+from station.versions import table_versions
+
+BULK_URL = reverse("train-station:journey-bulk")
+
+
+def local(*args) -> datetime:
+    return timezone.make_aware(datetime(*args))
+
+
+class JourneyBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@test.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+
+        train_type = TrainType.objects.create(name="Intercity")
+        self.train = Train.objects.create(
+            name="Hyundai",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=train_type,
+        )
+        self.other_train = Train.objects.create(
+            name="Skoda",
+            cargo_num=3,
+            places_in_cargo=10,
+            train_type=train_type,
+        )
+        self.route = Route.objects.create(
+            source=Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            ),
+            destination=Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            ),
+            distance=540,
+        )
+        self.crew = Crew.objects.create(first_name="Olena", last_name="Koval")
+        self.other_crew = Crew.objects.create(
+            first_name="Taras", last_name="Bondar"
+        )
+
+    def journey(self, hour: int, **fields) -> dict:
+        data = {
+            "route": self.route.id,
+            "train": self.train.id,
+            "departure_time": local(2030, 1, 3, hour, 15).isoformat(),
+            "arrival_time": local(2030, 1, 3, hour + 6).isoformat(),
+            "crew_members": [self.crew.id],
+        }
+        data.update(fields)
+        return data
+
+    def post(self, journeys, **params):
+        url = BULK_URL
+        if params:
+            url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, journeys, format="json")
+
+    def test_create(self):
+        before = table_versions([Journey])
+        res = self.post([self.journey(8), self.journey(9)])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in res.data], ["created"] * 2
+        )
+        journeys = Journey.objects.order_by("departure_time")
+        self.assertEqual(
+            [journey.id for journey in journeys],
+            [result["id"] for result in res.data],
+        )
+        first = journeys[0]
+        self.assertEqual(first.departure_time, local(2030, 1, 3, 8, 15))
+        self.assertEqual(first.departure_minute, 8 * 60 + 15)
+        self.assertEqual(first.tickets_available, 20)
+        self.assertEqual(list(first.crew_members.all()), [self.crew])
+        self.assertNotEqual(table_versions([Journey]), before)
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        def queries(journeys: int) -> int:
+            with CaptureQueriesContext(connection) as context:
+                self.post([self.journey(8) for _ in range(journeys)])
+            return len(context)
+
+        self.assertEqual(queries(2), queries(50))
+        self.assertEqual(Journey.objects.count(), 52)
+
+    def test_update(self):
+        journey = Journey.objects.create(
+            route=self.route,
+            train=self.train,
+            departure_time=local(2030, 1, 3, 8),
+        )
+        journey.crew_members.add(self.crew)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(journey=journey, order=order, cargo=1, seat=1)
+
+        res = self.post(
+            [
+                self.journey(
+                    10,
+                    id=journey.id,
+                    train=self.other_train.id,
+                    crew_members=[self.other_crew.id],
+                )
+            ]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{"id": journey.id, "status": "updated"}])
+        journey.refresh_from_db()
+        self.assertEqual(journey.train, self.other_train)
+        self.assertEqual(journey.departure_minute, 10 * 60 + 15)
+        self.assertEqual(journey.tickets_available, 29)
+        self.assertEqual(list(journey.crew_members.all()), [self.other_crew])
+
+    def test_invalid_journeys_are_reported_and_the_rest_saved(self):
+        res = self.post(
+            [
+                self.journey(8),
+                self.journey(9, route=0),
+                self.journey(10, arrival_time=local(2030, 1, 3).isoformat()),
+                self.journey(11, crew_members=[self.crew.id, 0]),
+                self.journey(12, id=0),
+                self.journey(13, train="fast"),
+            ]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in res.data],
+            ["created"] + ["invalid"] * 5,
+        )
+        self.assertEqual(
+            [list(result.get("errors", {})) for result in res.data],
+            [
+                [],
+                ["route"],
+                ["arrival_time"],
+                ["crew_members"],
+                ["id"],
+                ["train"],
+            ],
+        )
+        self.assertEqual(
+            res.data[1]["errors"]["route"],
+            ['Invalid pk "0" - object does not exist.'],
+        )
+        self.assertEqual(
+            list(Journey.objects.values_list("id", flat=True)),
+            [res.data[0]["id"]],
+        )
+
+    def test_atomic_saves_nothing_if_any_is_invalid(self):
+        res = self.post(
+            [self.journey(8), self.journey(9, train=0)], atomic="true"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [result["status"] for result in res.data], ["skipped", "invalid"]
+        )
+        self.assertFalse(Journey.objects.exists())
+
+        res = self.post([self.journey(8)], atomic="true")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Journey.objects.count(), 1)
+
+    def test_journey_listed_twice(self):
+        journey = Journey.objects.create(
+            route=self.route,
+            train=self.train,
+            departure_time=local(2030, 1, 3, 8),
+        )
+        res = self.post(
+            [self.journey(8, id=journey.id), self.journey(9, id=journey.id)]
+        )
+        self.assertEqual(
+            [result["status"] for result in res.data], ["updated", "invalid"]
+        )
+
+    def test_not_a_list_of_journeys(self):
+        for payload in (
+            self.journey(8),
+            [self.journey(8)] * (MAX_BULK_JOURNEYS + 1),
+        ):
+            res = self.post(payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Journey.objects.exists())
+
+    def test_staff_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@test.com", "password")
+        )
+        res = self.post([self.journey(8)])
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
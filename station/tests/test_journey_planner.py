@@ -0,0 +1,183 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Train, TrainType, Station, Route, Journey
+from station.planner import (
+    ConnectionTable,
+    get_connection_table,
+    plan_journeys,
+)
+from station.serializers import JourneySerializer
+
+PLAN_URL = reverse("train-station:journey-plan")
+
+MORNING = datetime.datetime(2024, 1, 3, 7, 0, tzinfo=datetime.timezone.utc)
+
+
+def at(hour: int, minute: int = 0) -> datetime.datetime:
+    return MORNING.replace(hour=hour, minute=minute)
+
+
+def sample_train(**params):
+    defaults = {
+        "name": "Lincorn",
+        "cargo_num": 10,
+        "places_in_cargo": 15,
+        "train_type": TrainType.objects.get_or_create(name="express")[0],
+    }
+    defaults.update(params)
+    return Train.objects.create(**defaults)
+
+
+def sample_station(name: str):
+    return Station.objects.create(name=name, latitude=10.15, longitude=32.14)
+
+
+def sample_journey(source, destination, departure, arrival=None, **params):
+    route = Route.objects.get_or_create(
+        source=source, destination=destination, defaults={"distance": 120}
+    )[0]
+    return Journey.objects.create(
+        route=route,
+        train=params.pop("train", None) or sample_train(),
+        departure_time=departure,
+        arrival_time=arrival,
+        **params,
+    )
+
+
+class JourneyPlannerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lviv = sample_station("Lviv")
+        self.kyiv = sample_station("Kyiv")
+        self.odesa = sample_station("Odesa")
+        self.to_kyiv = sample_journey(self.lviv, self.kyiv, at(8), at(9))
+        self.quick_change = sample_journey(
+            self.kyiv, self.odesa, at(9, 5), at(10)
+        )
+        self.slow_change = sample_journey(
+            self.kyiv, self.odesa, at(9, 30), at(10, 30)
+        )
+        self.direct = sample_journey(self.lviv, self.odesa, at(8, 30), at(12))
+
+    def plan(self, min_transfer=10, **kwargs):
+        itineraries = plan_journeys(
+            self.lviv.id,
+            self.odesa.id,
+            MORNING,
+            datetime.timedelta(minutes=min_transfer),
+            **kwargs,
+        )
+        return [
+            [leg["journey"].id for leg in itinerary["legs"]]
+            for itinerary in itineraries
+        ]
+
+    def test_fewest_transfers_then_earliest_arrival(self):
+        self.assertEqual(
+            self.plan(),
+            [[self.direct.id], [self.to_kyiv.id, self.slow_change.id]],
+        )
+
+    def test_min_transfer(self):
+        self.assertEqual(
+            self.plan(min_transfer=0)[-1],
+            [self.to_kyiv.id, self.quick_change.id],
+        )
+
+    def test_max_legs(self):
+        self.assertEqual(self.plan(max_legs=1), [[self.direct.id]])
+
+    def test_sold_out_legs_are_skipped(self):
+        Journey.objects.filter(pk=self.slow_change.pk).update(
+            tickets_available=1
+        )
+        self.assertEqual(self.plan(passengers=2), [[self.direct.id]])
+
+    def test_departed_journeys_are_skipped(self):
+        itineraries = plan_journeys(
+            self.lviv.id,
+            self.odesa.id,
+            at(8, 15),
+            datetime.timedelta(minutes=10),
+        )
+        self.assertEqual(len(itineraries), 1)
+        self.assertEqual(itineraries[0]["arrival_time"], at(12))
+
+    def test_arrival_is_estimated_from_distance(self):
+        journey = sample_journey(self.odesa, self.lviv, at(13))
+        table = get_connection_table()
+        index = list(table.journeys).index(journey.id)
+        self.assertEqual(
+            table.arrivals[index] - table.departures[index], 2 * 60 * 60
+        )
+
+    def test_table_replays_journey_changes(self):
+        table = get_connection_table()
+        with self.captureOnCommitCallbacks(execute=True):
+            faster = sample_journey(self.lviv, self.odesa, at(8), at(9, 45))
+            self.direct.delete()
+
+        updated = get_connection_table()
+        self.assertIsNot(updated, table)
+        self.assertEqual(updated.position[1], table.position[1] + 2)
+        self.assertNotIn(self.direct.id, updated.journeys)
+        self.assertEqual(list(updated.departures), sorted(updated.departures))
+        self.assertEqual(self.plan(), [[faster.id]])
+
+    def test_updated_copy_matches_rebuild(self):
+        table = ConnectionTable.build()
+        Journey.objects.filter(pk=self.to_kyiv.pk).update(
+            departure_time=at(9, 50), arrival_time=at(11)
+        )
+        updated = table.updated([self.to_kyiv.id], table.position)
+        rebuilt = ConnectionTable.build()
+        for column in ConnectionTable.COLUMNS:
+            self.assertEqual(
+                getattr(updated, column), getattr(rebuilt, column)
+            )
+
+
+class JourneyPlanApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.lviv = sample_station("Lviv")
+        self.kyiv = sample_station("Kyiv")
+        self.journey = sample_journey(self.lviv, self.kyiv, at(8), at(9))
+
+    def test_plan(self):
+        res = self.client.get(
+            PLAN_URL,
+            data={
+                "source": self.lviv.id,
+                "destination": self.kyiv.id,
+                "after": MORNING.isoformat(),
+            },
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]["transfers"], 0)
+        leg = res.data[0]["legs"][0]
+        self.assertEqual(leg["journey"], self.journey.id)
+        self.assertEqual(leg["tickets_available"], 150)
+
+    def test_same_stations_rejected(self):
+        res = self.client.get(
+            PLAN_URL,
+            data={"source": self.lviv.id, "destination": self.lviv.id},
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_arrival_must_follow_departure(self):
+        serializer = JourneySerializer(
+            self.journey, data={"arrival_time": at(7)}, partial=True
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("arrival_time", serializer.errors)
@@ -0,0 +1,204 @@
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Station, Route, TrainType, Train, Journey
+from station.swr import SearchCache
+
+JOURNEY_URL = reverse("train-station:journey-list")
+
+
+def run_now(function):
+    function()
+
+
+class Computation:
+    def __init__(self, version=1, delay=0.0):
+        self.version = version
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.version, f"result {self.calls}"
+
+
+class SearchCacheTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_current_version_is_served(self):
+        search = SearchCache("test", fresh=0, stale=60)
+        compute = Computation()
+        self.assertEqual(search.get("q", 1, compute), (1, "result 1"))
+        self.assertEqual(search.get("q", 1, compute), (1, "result 1"))
+        self.assertEqual(compute.calls, 1)
+
+    def test_fresh_result_survives_changes(self):
+        search = SearchCache("test", fresh=60, stale=60)
+        compute = Computation()
+        search.get("q", 1, compute)
+        compute.version = 2
+        self.assertEqual(search.get("q", 2, compute), (1, "result 1"))
+        self.assertEqual(compute.calls, 1)
+
+    @mock.patch("station.swr.in_background", run_now)
+    def test_stale_result_is_served_while_refreshed(self):
+        search = SearchCache("test", fresh=0, stale=60)
+        compute = Computation()
+        search.get("q", 1, compute)
+        compute.version = 2
+
+        self.assertEqual(search.get("q", 2, compute), (1, "result 1"))
+        self.assertEqual(search.get("q", 2, compute), (2, "result 2"))
+        self.assertEqual(compute.calls, 2)
+
+    def test_one_refresh_at_a_time(self):
+        search = SearchCache("test", fresh=0, stale=60)
+        compute = Computation()
+        search.get("q", 1, compute)
+
+        with mock.patch("station.swr.in_background") as in_background:
+            for _ in range(5):
+                search.get("q", 2, compute)
+        self.assertEqual(in_background.call_count, 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        search = SearchCache("test", fresh=60, stale=60)
+        compute = Computation(delay=0.2)
+        results = []
+
+        def get():
+            results.append(search.get("q", 1, compute))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, [(1, "result 1")] * 8)
+
+    def test_miss_waits_for_other_process(self):
+        search = SearchCache("test", fresh=60, stale=60)
+        key = search._key("q")
+        cache.add(f"{key}:lock", True)
+        threading.Timer(
+            0.1, cache.set, [key, (time.time(), 1, "elsewhere")]
+        ).start()
+
+        compute = Computation()
+        self.assertEqual(search.get("q", 1, compute), (1, "elsewhere"))
+        self.assertEqual(compute.calls, 0)
+
+    @mock.patch("station.swr.WAIT", 0.1)
+    def test_miss_stops_waiting_for_slow_search(self):
+        search = SearchCache("test", fresh=60, stale=60)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 1, "slow"
+
+        leader = threading.Thread(target=search.get, args=("q", 1, slow))
+        leader.start()
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+        compute = Computation()
+        self.assertEqual(search.get("q", 1, compute), (1, "result 1"))
+        self.assertEqual(compute.calls, 1)
+
+    def test_errors_reach_every_waiter(self):
+        search = SearchCache("test", fresh=60, stale=60)
+        errors = []
+
+        def fail():
+            time.sleep(0.1)
+            raise ValueError("broken")
+
+        def get():
+            try:
+                search.get("q", 1, fail)
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=get) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertIsNone(cache.get(f"{search._key('q')}:lock"))
+
+
+@override_settings(
+    SEARCH_CACHE_FRESHNESS={"journey": {"fresh": 0, "stale": 60}}
+)
+class JourneySearchCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            source = Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            )
+            destination = Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            )
+            self.route = Route.objects.create(
+                source=source, destination=destination, distance=540
+            )
+            self.train = Train.objects.create(
+                name="Hyundai",
+                cargo_num=2,
+                places_in_cargo=10,
+                train_type=TrainType.objects.create(name="Intercity"),
+            )
+            self.add_journey(8)
+
+    def add_journey(self, hour: int) -> Journey:
+        return Journey.objects.create(
+            route=self.route,
+            train=self.train,
+            departure_time=timezone.make_aware(datetime(2030, 1, 3, hour)),
+        )
+
+    def search(self, **headers):
+        return self.client.get(
+            JOURNEY_URL,
+            {"source": "Lviv", "departure_date": "2030-01-03"},
+            **headers,
+        )
+
+    def test_repeated_search_runs_no_query(self):
+        first = self.search()
+        with self.assertNumQueries(0):
+            second = self.search()
+        self.assertEqual(second.data, first.data)
+
+    @mock.patch("station.swr.in_background", run_now)
+    def test_stale_result_then_refreshed(self):
+        first = self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_journey(9)
+
+        stale = self.search(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(stale.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        fresh = self.search(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(fresh.data["results"]), 2)
+        self.assertNotEqual(fresh["ETag"], first["ETag"])
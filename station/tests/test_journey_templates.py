@@ -0,0 +1,368 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Crew,
+    Journey,
+    JourneyTemplate,
+    SeatHold,
+)
+
+JOURNEY_URL = reverse("train-station:journey-list")
+TEMPLATE_URL = reverse("train-station:journeytemplate-list")
+ORDER_URL = reverse("train-station:order-list")
+HOLD_URL = reverse("train-station:seathold-list")
+
+
+def local(*args) -> datetime:
+    return timezone.make_aware(datetime(*args))
+
+
+def journey_url(journey_id) -> str:
+    return reverse("train-station:journey-detail", args=[journey_id])
+
+
+class JourneyTemplateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            "admin@test.com", "password"
+        )
+        self.client.force_authenticate(self.user)
+
+        self.train = Train.objects.create(
+            name="Hyundai",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=TrainType.objects.create(name="Intercity"),
+        )
+        self.lviv = Station.objects.create(
+            name="Lviv", latitude=49.84, longitude=24.03
+        )
+        self.kyiv = Station.objects.create(
+            name="Kyiv", latitude=50.45, longitude=30.52
+        )
+        self.route = Route.objects.create(
+            source=self.lviv, destination=self.kyiv, distance=540
+        )
+        self.crew = Crew.objects.create(first_name="Olena", last_name="Koval")
+        self.template = JourneyTemplate.objects.create(
+            route=self.route,
+            train=self.train,
+            departure=time(9, 30),
+            travel_time=timedelta(hours=6),
+            valid_from=datetime(2030, 1, 6).date(),
+            valid_until=datetime(2030, 1, 8).date(),
+        )
+        self.template.crew_members.add(self.crew)
+        self.journey = Journey.objects.create(
+            route=self.route,
+            train=self.train,
+            departure_time=local(2030, 1, 7, 12),
+        )
+
+    def occurrence(self, day: int) -> str:
+        return f"{self.template.id}@2030-01-{day:02d}"
+
+    def list_ids(self, **params) -> list:
+        res = self.client.get(JOURNEY_URL, data=params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [journey["id"] for journey in res.data["results"]]
+
+    def test_occurrences_listed_among_journeys(self):
+        res = self.client.get(JOURNEY_URL)
+
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]],
+            [
+                self.occurrence(8),
+                self.journey.id,
+                self.occurrence(7),
+                self.occurrence(6),
+            ],
+        )
+        first = res.data["results"][0]
+        self.assertEqual(
+            first["departure_time"], local(2030, 1, 8, 9, 30).isoformat()
+        )
+        self.assertEqual(first["tickets_available"], 20)
+        self.assertEqual(first["crew_members"], ["Olena Koval"])
+
+    def test_pages_walk_through_occurrences(self):
+        expected = self.list_ids()
+        pages = []
+        res = self.client.get(JOURNEY_URL, data={"page_size": 1})
+        while True:
+            pages += [journey["id"] for journey in res.data["results"]]
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+        self.assertEqual(pages, expected)
+
+        back = []
+        while res.data["previous"]:
+            res = self.client.get(res.data["previous"])
+            back += [journey["id"] for journey in res.data["results"]]
+        self.assertEqual(back, list(reversed(expected[:-1])))
+
+    def test_filters_apply_to_occurrences(self):
+        self.assertEqual(
+            self.list_ids(departure_date="2030-01-07"),
+            [self.journey.id, self.occurrence(7)],
+        )
+        self.assertEqual(
+            self.list_ids(departure_time="09:30"),
+            [self.occurrence(8), self.occurrence(7), self.occurrence(6)],
+        )
+        self.assertEqual(self.list_ids(departure_date="2030-01-09"), [])
+        self.assertEqual(self.list_ids(source="Kyiv"), [])
+
+    def test_weekdays_and_cancelled_dates_skipped(self):
+        # 2030-01-06 is a Sunday
+        self.template.weekdays = 0b0111111
+        self.template.cancelled_dates = ["2030-01-08"]
+        self.template.save()
+
+        self.assertEqual(
+            self.list_ids(), [self.journey.id, self.occurrence(7)]
+        )
+
+    def test_list_queries_do_not_grow_with_templates(self):
+        def queries() -> int:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(JOURNEY_URL)
+            return len(context)
+
+        before = queries()
+        for hour in range(10, 15):
+            template = JourneyTemplate.objects.create(
+                route=self.route,
+                train=self.train,
+                departure=time(hour),
+                valid_from=self.template.valid_from,
+                valid_until=self.template.valid_until,
+            )
+            template.crew_members.add(self.crew)
+        self.assertEqual(queries(), before)
+
+    def test_list_queries_do_not_grow_with_made_days(self):
+        daily = JourneyTemplate.objects.create(
+            route=self.route,
+            train=self.train,
+            departure=time(7),
+            valid_from=datetime(2029, 6, 1).date(),
+            valid_until=datetime(2029, 12, 31).date(),
+        )
+
+        def queries() -> tuple[int, list]:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.get(page)
+            return len(context), [row["id"] for row in res.data["results"]]
+
+        page = self.client.get(JOURNEY_URL, data={"page_size": 5}).data["next"]
+        before, _ = queries()
+
+        # Every day of the template is booked
+        day = daily.valid_until
+        while day >= daily.valid_from:
+            Journey.objects.create(
+                template=daily,
+                service_date=day,
+                route=self.route,
+                train=self.train,
+                departure_time=daily.departure_on(day),
+            )
+            day -= timedelta(days=1)
+
+        after, ids = queries()
+        self.assertEqual(after, before)
+        self.assertEqual(len(ids), 5)
+        self.assertTrue(all(isinstance(pk, int) for pk in ids))
+
+    def test_retrieve_occurrence(self):
+        res = self.client.get(
+            journey_url(self.occurrence(7)), data={"seat_format": "bitmap"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["id"], self.occurrence(7))
+        self.assertEqual(res.data["template"], self.template.id)
+        self.assertEqual(
+            res.data["arrival_time"], local(2030, 1, 7, 15, 30).isoformat()
+        )
+        self.assertEqual(res.data["tickets_available"], 20)
+        self.assertEqual(res.data["seat_map"]["format"], "bitmap")
+        self.assertFalse(Journey.objects.filter(template__isnull=False))
+
+        res = self.client.get(journey_url(f"{self.template.id}@2030-01-09"))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_booking_makes_the_journey(self):
+        payload = {
+            "tickets": [
+                {"seat": 1, "cargo": 1, "journey": self.occurrence(7)},
+                {"seat": 2, "cargo": 1, "journey": self.occurrence(7)},
+            ],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(ORDER_URL, data=payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        made = Journey.objects.get(template=self.template)
+        self.assertEqual(made.service_date, datetime(2030, 1, 7).date())
+        self.assertEqual(made.departure_time, local(2030, 1, 7, 9, 30))
+        self.assertEqual(made.tickets_available, 18)
+        self.assertEqual(list(made.crew_members.all()), [self.crew])
+        self.assertEqual(
+            self.list_ids(departure_date="2030-01-07"),
+            [self.journey.id, made.id],
+        )
+
+        res = self.client.get(journey_url(self.occurrence(7)))
+        self.assertEqual(res.data["id"], made.id)
+
+    def test_holding_makes_the_journey(self):
+        payload = {
+            "journey": self.occurrence(7),
+            "seats": [{"cargo": 1, "seat": 3}],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(HOLD_URL, data=payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        made = Journey.objects.get(template=self.template)
+        self.assertEqual(res.data[0]["journey"], made.id)
+        self.assertEqual(made.tickets_available, 19)
+
+    def test_allocating_makes_the_journey(self):
+        url = reverse(
+            "train-station:journey-allocate", args=[self.occurrence(7)]
+        )
+        res = self.client.get(url, data={"party_size": 3})
+        self.assertEqual(res.data["seats"], [1, 2, 3])
+        self.assertFalse(Journey.objects.filter(template=self.template))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, data={"party_size": 3})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        made = Journey.objects.get(template=self.template)
+        self.assertEqual(made.tickets_available, 17)
+
+    def test_rejected_booking_makes_no_journey(self):
+        res = self.client.post(
+            ORDER_URL,
+            data={
+                "tickets": [
+                    {"seat": 11, "cargo": 1, "journey": self.occurrence(7)}
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = get_user_model().objects.create_user(
+            "user@test.com", "password"
+        )
+        SeatHold.objects.create(
+            user=other,
+            journey=self.journey,
+            cargo=1,
+            seat=1,
+            expires_at=timezone.now() + timedelta(minutes=10),
+        )
+        res = self.client.post(
+            ORDER_URL,
+            data={
+                "tickets": [
+                    {"seat": 1, "cargo": 1, "journey": self.occurrence(7)},
+                    {"seat": 1, "cargo": 1, "journey": self.journey.id},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Journey.objects.filter(template=self.template))
+
+    def test_deleting_the_journey_cancels_the_day(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(journey_url(self.occurrence(7)))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.template.refresh_from_db()
+        self.assertEqual(self.template.cancelled_dates, ["2030-01-07"])
+        self.assertFalse(Journey.objects.filter(template=self.template))
+        self.assertEqual(
+            self.list_ids(departure_date="2030-01-07"), [self.journey.id]
+        )
+
+    def test_create_template(self):
+        payload = {
+            "route": self.route.id,
+            "train": self.train.id,
+            "departure": "07:15",
+            "travel_time": "05:00:00",
+            "weekdays": [1, 5],
+            "valid_from": "2030-02-01",
+            "valid_until": "2030-03-01",
+            "cancelled_dates": ["2030-02-08", "2030-02-04"],
+            "crew_members": [self.crew.id],
+        }
+        res = self.client.post(TEMPLATE_URL, data=payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        template = JourneyTemplate.objects.get(pk=res.data["id"])
+        self.assertEqual(template.weekdays, 0b10001)
+        self.assertEqual(
+            template.cancelled_dates, ["2030-02-04", "2030-02-08"]
+        )
+        self.assertEqual(res.data["weekdays"], [1, 5])
+
+    def test_invalid_template_rejected(self):
+        payload = {
+            "route": self.route.id,
+            "train": self.train.id,
+            "departure": "07:15:30",
+            "travel_time": "-01:00:00",
+            "weekdays": [0],
+            "valid_from": "2030-02-01",
+            "valid_until": "2030-01-01",
+            "crew_members": [self.crew.id],
+        }
+        res = self.client.post(TEMPLATE_URL, data=payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            set(res.data), {"departure", "travel_time", "weekdays"}
+        )
+
+        payload.update(departure="07:15", travel_time="01:00:00", weekdays=[1])
+        res = self.client.post(TEMPLATE_URL, data=payload, format="json")
+        self.assertEqual(set(res.data), {"valid_until"})
+
+    def test_templates_staff_only(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@test.com", "password")
+        )
+        res = self.client.delete(
+            reverse(
+                "train-station:journeytemplate-detail",
+                args=[self.template.id],
+            )
+        )
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
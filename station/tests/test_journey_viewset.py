@@ -1,17 +1,37 @@
 import datetime
 import random
 import uuid
+import zoneinfo
+from datetime import timezone
 
 from django.contrib.auth import get_user_model
-from django.db.models import F, Count
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from drf_spectacular.generators import SchemaGenerator
 from rest_framework import status
-from rest_framework.test import APIClient
-
-from station.models import TrainType, Train, Station, Route, Crew, Journey
-from station.serializers import JourneyListSerializer, JourneyDetailSerializer
-
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Crew,
+    Journey,
+    Order,
+    Ticket,
+)
+from station.serializers import (
+    JourneyListSerializer,
+    JourneyDetailSerializer,
+    JourneyRowSerializer,
+    JourneyRowListSerializer,
+)
+from station.views import JourneyViewSet, JourneyPagination
 
 JOURNEY_URL = reverse("train-station:journey-list")
 
@@ -81,6 +101,7 @@ class AnonymousJourneyApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
 
     def test_filtering_by_source_destination(self):
         first = sample_station(name="first")
@@ -95,30 +116,25 @@ class AnonymousJourneyApiTests(TestCase):
         sample_journey(route=route_two)
         sample_journey(route=route_three)
 
-        journeys = Journey.objects.all().annotate(
-            tickets_available=(
-                F("train__cargo_num") * F("train__places_in_cargo")
-                - Count(F("tickets"))
-            )
-        )
+        journeys = Journey.objects.order_by("id")
         journey_one = journeys[0]
         journey_two = journeys[1]
         journey_three = journeys[2]
 
         res = self.client.get(JOURNEY_URL, data={"source": "third"})
         from_third = JourneyListSerializer(
-            [journey_two, journey_three], many=True
+            [journey_three, journey_two], many=True
         )
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, from_third.data)
+        self.assertEqual(res.data["results"], from_third.data)
 
         res = self.client.get(JOURNEY_URL, data={"destination": "second"})
         to_second = JourneyListSerializer(
-            [journey_one, journey_three], many=True
+            [journey_three, journey_one], many=True
         )
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, to_second.data)
+        self.assertEqual(res.data["results"], to_second.data)
 
     def test_filtering_by_date_and_time(self):
         with override_settings(USE_TZ=False):
@@ -144,12 +160,7 @@ class AnonymousJourneyApiTests(TestCase):
             sample_journey(departure_time=datetime_two)
             sample_journey(departure_time=datetime_three)
 
-            journeys = Journey.objects.all().annotate(
-                tickets_available=(
-                    F("train__cargo_num") * F("train__places_in_cargo")
-                    - Count(F("tickets"))
-                )
-            )
+            journeys = Journey.objects.order_by("id")
             journey_one = journeys[0]
             journey_two = journeys[1]
             journey_three = journeys[2]
@@ -158,19 +169,56 @@ class AnonymousJourneyApiTests(TestCase):
                 JOURNEY_URL, data={"departure_date": "2023-04-01"}
             )
             april_first = JourneyListSerializer(
-                [journey_one, journey_two], many=True
+                [journey_two, journey_one], many=True
             )
             self.assertEqual(res.status_code, status.HTTP_200_OK)
-            self.assertEqual(res.data, april_first.data)
+            self.assertEqual(res.data["results"], april_first.data)
 
             res = self.client.get(
                 JOURNEY_URL, data={"departure_time": "12:00"}
             )
             at_twelve = JourneyListSerializer(
-                [journey_one, journey_three], many=True
+                [journey_three, journey_one], many=True
             )
             self.assertEqual(res.status_code, status.HTTP_200_OK)
-            self.assertEqual(res.data, at_twelve.data)
+            self.assertEqual(res.data["results"], at_twelve.data)
+
+    def test_compact_seat_formats(self):
+        journey = sample_journey(
+            train=sample_train(cargo_num=2, places_in_cargo=10)
+        )
+        order = Order.objects.create(
+            user=get_user_model().objects.create(
+                email="user@hmail.com", password="32r@!rgaf"
+            )
+        )
+        Ticket.objects.create(journey=journey, cargo=1, seat=2, order=order)
+        Ticket.objects.create(journey=journey, cargo=2, seat=1, order=order)
+
+        res = self.client.get(
+            get_detail_url(journey.id), data={"seat_format": "bitmap"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("taken_seats", res.data)
+        self.assertEqual(
+            res.data["seat_map"],
+            {"format": "bitmap", "cargos": ["AgA=", "AQA="]},
+        )
+
+        res = self.client.get(
+            get_detail_url(journey.id), data={"seat_format": "rle"}
+        )
+        self.assertEqual(
+            res.data["seat_map"],
+            {"format": "rle", "cargos": [[1, 1, 8], [0, 1, 9]]},
+        )
+
+    def test_unknown_seat_format_rejected(self):
+        journey = sample_journey()
+        res = self.client.get(
+            get_detail_url(journey.id), data={"seat_format": "png"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_create_method_forbidden(self):
         sample_train()
@@ -265,6 +313,276 @@ class AdminJourneyApiTest(TestCase):
         self.client.force_authenticate(self.user)
 
     def test_delete_allowed(self):
-        sample_journey()
-        res = self.client.delete(get_detail_url(1))
+        journey = sample_journey()
+        res = self.client.delete(get_detail_url(journey.id))
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class JourneyPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        departure = datetime.datetime(2024, 1, 3, 12)
+        route = sample_route()
+        other_route = sample_route(source_n="third")
+        self.journeys = [
+            sample_journey(route=route, departure_time=departure),
+            sample_journey(route=route, departure_time=departure),
+            sample_journey(
+                route=route,
+                departure_time=departure + datetime.timedelta(hours=1),
+            ),
+            sample_journey(
+                route=other_route,
+                departure_time=departure + datetime.timedelta(hours=2),
+            ),
+            sample_journey(
+                route=route,
+                departure_time=departure + datetime.timedelta(hours=3),
+            ),
+        ]
+
+    def walk(self, url, data=None, link="next"):
+        ids = []
+        res = self.client.get(url, data=data)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.append([journey["id"] for journey in res.data["results"]])
+            if not res.data[link]:
+                return ids, res
+            res = self.client.get(res.data[link])
+
+    def test_pages_follow_departure_time_and_id(self):
+        expected = [journey.id for journey in reversed(self.journeys)]
+        pages, last = self.walk(JOURNEY_URL, data={"page_size": 2})
+        self.assertEqual(pages, [expected[:2], expected[2:4], expected[4:]])
+
+        back, _ = self.walk(last.data["previous"], link="previous")
+        self.assertEqual(back, [expected[2:4], expected[:2]])
+
+    def test_pagination_works_with_filters(self):
+        pages, _ = self.walk(
+            JOURNEY_URL, data={"page_size": 2, "source": "first"}
+        )
+        self.assertEqual(
+            pages,
+            [
+                [self.journeys[4].id, self.journeys[2].id],
+                [self.journeys[1].id, self.journeys[0].id],
+            ],
+        )
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(JOURNEY_URL, data={"page_size": 2})
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_invalid_cursor(self):
+        res = self.client.get(JOURNEY_URL, data={"cursor": "nonsense"})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_schema_documents_cursor_pages(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        operation = schema["paths"][JOURNEY_URL]["get"]
+
+        parameters = {
+            parameter["name"] for parameter in operation["parameters"]
+        }
+        self.assertIn("cursor", parameters)
+        self.assertIn("page_size", parameters)
+        page = operation["responses"]["200"]["content"]["application/json"]
+        name = page["schema"]["$ref"].split("/")[-1]
+        self.assertEqual(
+            set(schema["components"]["schemas"][name]["properties"]),
+            {"next", "previous", "results"},
+        )
+
+
+class JourneySearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.route = sample_route()
+        self.train = sample_train()
+
+    def journey_at(self, departure_time: datetime.datetime) -> Journey:
+        return Journey.objects.create(
+            route=self.route, train=self.train, departure_time=departure_time
+        )
+
+    def test_departure_date_is_local_day(self):
+        kyiv = zoneinfo.ZoneInfo("Europe/Kiev")
+        late = self.journey_at(
+            datetime.datetime(2023, 4, 1, 23, 59, tzinfo=kyiv)
+        )
+        self.journey_at(datetime.datetime(2023, 4, 2, 0, 0, tzinfo=kyiv))
+        self.journey_at(datetime.datetime(2023, 3, 31, 23, 59, tzinfo=kyiv))
+
+        res = self.client.get(
+            JOURNEY_URL, data={"departure_date": "2023-04-01"}
+        )
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]], [late.id]
+        )
+
+    def test_departure_time_uses_local_minute(self):
+        kyiv = zoneinfo.ZoneInfo("Europe/Kiev")
+        at_nine = self.journey_at(
+            datetime.datetime(2023, 4, 1, 9, 0, tzinfo=kyiv)
+        )
+        self.journey_at(
+            datetime.datetime(2023, 4, 1, 9, 0, tzinfo=timezone.utc)
+        )
+
+        res = self.client.get(JOURNEY_URL, data={"departure_time": "09:00"})
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]], [at_nine.id]
+        )
+
+    def test_filtering_by_station_ids(self):
+        first = sample_station(name="first")
+        second = sample_station(name="second")
+        there = sample_journey(route=sample_route(source=first))
+        back = sample_journey(
+            route=sample_route(source=second, destination=first)
+        )
+
+        res = self.client.get(JOURNEY_URL, data={"source_id": first.id})
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]], [there.id]
+        )
+        res = self.client.get(JOURNEY_URL, data={"destination_id": first.id})
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]], [back.id]
+        )
+
+    def test_invalid_filters_rejected(self):
+        for params in (
+            {"departure_date": "yesterday"},
+            {"departure_time": "noon"},
+            {"source_id": "first"},
+        ):
+            res = self.client.get(JOURNEY_URL, data=params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class JourneySearchPlanTests(TestCase):
+    """The search filters must be answerable from indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Enough journeys on enough routes for the statistics to tell
+        # the filters apart
+        train = sample_train()
+        hub = sample_station(name="hub")
+        destinations = Station.objects.bulk_create(
+            Station(name=f"stop {n}", latitude=10.15, longitude=32.14)
+            for n in range(400)
+        )
+        routes = Route.objects.bulk_create(
+            Route(source=hub, destination=destination, distance=100)
+            for destination in destinations
+        )
+        cls.destination = destinations[0]
+        start = datetime.datetime(2023, 1, 1, tzinfo=timezone.utc)
+        journeys = []
+        for n in range(4000):
+            departure = start + datetime.timedelta(minutes=n * 97)
+            journeys.append(
+                Journey(
+                    route=routes[n % len(routes)],
+                    train=train,
+                    departure_time=departure,
+                    departure_minute=Journey.minute_of_day(departure),
+                )
+            )
+        Journey.objects.bulk_create(journeys)
+
+    def explain(self, params: dict) -> str:
+        if connection.vendor == "postgresql":
+            # Statistics of the rows above rather than whatever
+            # autovacuum left from earlier tests (rolled back with them)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE station_journey, station_route")
+
+        view = JourneyViewSet(action_map={"get": "list"}, format_kwarg=None)
+        view.request = view.initialize_request(
+            APIRequestFactory().get(JOURNEY_URL, params)
+        )
+        # As a page is read
+        page = JourneyPagination.page_size + 1
+        plan = view.get_queryset()[:page].explain()
+        self.assertNotIn("Seq Scan on station_journey", plan)
+        self.assertNotIn("SCAN station_journey", plan)
+        return plan
+
+    def test_departure_date_uses_index(self):
+        plan = self.explain({"departure_date": "2024-01-03"})
+        self.assertIn("journey_departure_id_idx", plan)
+
+    def test_departure_time_uses_index(self):
+        plan = self.explain({"departure_time": "21:38"})
+        self.assertIn("journey_minute_departure_idx", plan)
+
+    def test_route_station_and_date_use_index(self):
+        plan = self.explain({"source_id": 1, "departure_date": "2024-01-03"})
+        self.assertRegex(
+            plan, "journey_route_departure_idx|journey_departure_id_idx"
+        )
+
+    def test_route_station_uses_index(self):
+        plan = self.explain({"destination_id": self.destination.id})
+        self.assertIn("journey_route_departure_idx", plan)
+
+
+class JourneyRowsTests(TestCase):
+    """The list renders rows byte for byte like JourneyListSerializer"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        route = sample_route("Lviv", "Kyiv")
+        train = sample_train()
+        crew = [
+            sample_crew(first_name="Olena", last_name="Bondar"),
+            sample_crew(first_name="Andrii", last_name="Bondar"),
+            sample_crew(first_name="Taras", last_name="Koval"),
+        ]
+        departure = datetime.datetime(2030, 1, 3, 8, 15, tzinfo=timezone.utc)
+        for hour in range(3):
+            journey = Journey.objects.create(
+                route=route,
+                train=train,
+                departure_time=departure + datetime.timedelta(hours=hour),
+            )
+            journey.crew_members.set(crew[:hour])
+
+    def test_rows_match_instances(self):
+        journeys = (
+            Journey.objects.select_related(
+                "train__train_type", "route__source", "route__destination"
+            )
+            .prefetch_related("crew_members")
+            .order_by("id")
+        )
+        rows = Journey.objects.order_by("id").values(
+            *JourneyRowListSerializer.COLUMNS
+        )
+
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(JourneyRowSerializer(rows, many=True).data),
+            renderer.render(JourneyListSerializer(journeys, many=True).data),
+        )
+
+    def test_list_runs_three_queries(self):
+        # Journeys, templates and crews
+        with self.assertNumQueries(3):
+            res = self.client.get(JOURNEY_URL)
+        self.assertEqual(len(res.data["results"]), 3)
+        self.assertEqual(
+            res.data["results"][0]["crew_members"],
+            ["Andrii Bondar", "Olena Bondar"],
+        )
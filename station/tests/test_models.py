@@ -1,9 +1,11 @@
 import datetime
 import random
 import uuid
+from io import StringIO
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 
 from station.models import (
@@ -116,3 +118,56 @@ class TicketModelTest(TestCase):
 
         with self.assertRaises(ValidationError):
             create_ticket(order=self.order, seat=16)
+
+
+class JourneyTicketsAvailableTest(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create(
+            email="user@hmai.com", password="deaf#@314"
+        )
+        self.order = create_order(self.user)
+        self.journey = sample_journey()
+
+    def test_counter_starts_at_train_capacity(self):
+        self.assertEqual(self.journey.tickets_available, 150)
+
+    def test_counter_follows_tickets(self):
+        ticket = create_ticket(self.order, journey=self.journey)
+        create_ticket(self.order, journey=self.journey, seat=2)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 148)
+
+        ticket.delete()
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 149)
+
+    def test_counter_recounted_when_train_changes(self):
+        create_ticket(self.order, journey=self.journey)
+        self.journey.train = sample_train(cargo_num=2, places_in_cargo=5)
+        self.journey.save()
+        self.assertEqual(self.journey.tickets_available, 9)
+
+    def test_counter_recounted_when_train_capacity_changes(self):
+        create_ticket(self.order, journey=self.journey)
+        train = self.journey.train
+        train.cargo_num = 2
+        train.save()
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 29)
+
+    def test_stale_instance_does_not_overwrite_counter(self):
+        stale = Journey.objects.get(pk=self.journey.pk)
+        create_ticket(self.order, journey=self.journey)
+        stale.save()
+        self.assertEqual(stale.tickets_available, 149)
+
+    def test_recount_command_repairs_drift(self):
+        create_ticket(self.order, journey=self.journey)
+        Journey.objects.filter(pk=self.journey.pk).update(
+            tickets_available=3
+        )
+        out = StringIO()
+        call_command("recount_tickets_available", stdout=out)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 149)
+        self.assertIn("Repaired 1 journeys", out.getvalue())
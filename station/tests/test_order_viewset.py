@@ -5,6 +5,8 @@ import time
 import uuid
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse, NoReverseMatch
 from rest_framework import status
 
@@ -146,17 +148,115 @@ class PublicOrderApiTests(TestCase):
         self.assertIn(my_order_two.data, results)
         self.assertNotIn(not_my_order.data, results)
 
-    # def test_create_method_works(self):
-    #     sample_journey()
-    #     payload = json.dumps(
-    #         {
-    #             "tickets": [
-    #                 {"seat": 1, "cargo": 1, "journey": 1},
-    #             ],
-    #         }
-    #     )
-    #     res = self.client.post(
-    #         ORDER_URL, data=payload, content_type="application/json"
-    #     )
-    #     self.assertEqual(res.status_code, status.HTTP_201_CREATED)
-    #     self.assertTrue(Order.objects.filter(user=self.user).exists())
+    def test_create_method_works(self):
+        journey = sample_journey()
+        payload = {
+            "tickets": [
+                {"seat": 1, "cargo": 1, "journey": journey.id},
+                {"seat": 2, "cargo": 1, "journey": journey.id},
+            ],
+        }
+        res = self.client.post(ORDER_URL, data=payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.tickets.count(), 2)
+        journey.refresh_from_db()
+        self.assertEqual(journey.tickets_available, 148)
+
+    def test_create_rejects_booked_seats(self):
+        journey = sample_journey()
+        create_ticket(create_order(self.user), journey=journey)
+        payload = {
+            "tickets": [
+                {"seat": 2, "cargo": 1, "journey": journey.id},
+                {"seat": 1, "cargo": 1, "journey": journey.id},
+            ],
+        }
+        res = self.client.post(ORDER_URL, data=payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data["tickets"][1]["non_field_errors"][0],
+            "This seat is already booked.",
+        )
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_create_rejects_repeated_seats(self):
+        journey = sample_journey()
+        payload = {
+            "tickets": [
+                {"seat": 3, "cargo": 2, "journey": journey.id},
+                {"seat": 3, "cargo": 2, "journey": journey.id},
+            ],
+        }
+        res = self.client.post(ORDER_URL, data=payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_query_count_does_not_grow_with_tickets(self):
+        journey = sample_journey()
+
+        def book(seats):
+            return self.client.post(
+                ORDER_URL,
+                data={
+                    "tickets": [
+                        {"seat": seat, "cargo": 1, "journey": journey.id}
+                        for seat in seats
+                    ]
+                },
+                format="json",
+            )
+
+        with CaptureQueriesContext(connection) as single:
+            self.assertEqual(book([1]).status_code, status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as group:
+            res = book(range(2, 12))
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(single), len(group))
+
+
+class OrderCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email="user@gmali.com", password="dea@#31f"
+        )
+        self.client.force_authenticate(self.user)
+        self.orders = [create_order(self.user) for _ in range(5)]
+        create_order(
+            get_user_model().objects.create(
+                email="someone@gmoal.com", password="dewaf@#132"
+            )
+        )
+
+    def test_cursor_pages_cover_own_orders(self):
+        res = self.client.get(
+            ORDER_URL, data={"pagination": "cursor", "page_size": 2}
+        )
+        ids = []
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", res.data)
+            ids.extend(order["id"] for order in res.data["results"])
+            if not res.data["next"]:
+                break
+            res = self.client.get(res.data["next"])
+        self.assertEqual(ids, [order.id for order in reversed(self.orders)])
+
+    def test_cursor_pages_do_not_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(ORDER_URL, data={"pagination": "cursor"})
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        )
+
+    def test_approximate_total(self):
+        res = self.client.get(
+            ORDER_URL, data={"pagination": "cursor", "total": "approximate"}
+        )
+        self.assertEqual(res.data["total"], {"count": 5, "is_exact": True})
+
+    def test_page_numbers_stay_default(self):
+        res = self.client.get(ORDER_URL)
+        self.assertEqual(res.data["count"], 5)
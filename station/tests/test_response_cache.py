@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Station, Route
+from station.response_cache import response_cache_stats
+
+STATION_URL = reverse("train-station:station-list")
+ROUTE_URL = reverse("train-station:route-list")
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["responses"].clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lviv = Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            )
+            self.kyiv = Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            )
+            Route.objects.create(
+                source=self.lviv, destination=self.kyiv, distance=540
+            )
+
+    def test_second_request_is_a_hit(self):
+        first = self.client.get(STATION_URL)
+        self.assertEqual(first["X-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            second = self.client.get(STATION_URL)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_key_includes_query(self):
+        self.client.get(STATION_URL)
+        res = self.client.get(STATION_URL, {"name": "Lviv"})
+        self.assertEqual(res["X-Cache"], "MISS")
+
+    def test_browsable_api_is_not_cached(self):
+        self.client.get(STATION_URL)
+        for _ in range(2):
+            res = self.client.get(STATION_URL, HTTP_ACCEPT="text/html")
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn("X-Cache", res)
+
+    def test_hit_keeps_the_headers_of_the_view(self):
+        first = self.client.get(STATION_URL)
+        second = self.client.get(STATION_URL)
+        self.assertEqual(second["X-Cache"], "HIT")
+        for header in ("Allow", "Vary", "Content-Type"):
+            self.assertEqual(second[header], first[header])
+
+    def test_writes_invalidate_dependent_tables(self):
+        self.client.get(ROUTE_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kyiv.name = "Kyiv-Pasazhyrskyi"
+            self.kyiv.save()
+
+        res = self.client.get(ROUTE_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.data[0]["destination"], "Kyiv-Pasazhyrskyi")
+
+    def test_authenticated_responses_are_not_cached(self):
+        user = get_user_model().objects.create_user(
+            "user@test.com", "password"
+        )
+        self.client.force_authenticate(user)
+        self.client.get(STATION_URL)
+        res = self.client.get(STATION_URL)
+        self.assertNotIn("X-Cache", res)
+
+    def test_missing_objects_are_not_cached(self):
+        url = reverse("train-station:station-detail", args=[self.kyiv.id + 1])
+        self.client.get(url)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotEqual(res.get("X-Cache"), "HIT")
+
+    def test_counters(self):
+        for _ in range(3):
+            self.client.get(STATION_URL)
+        self.assertEqual(
+            response_cache_stats(["station"]),
+            {"station": {"hits": 2, "misses": 1}},
+        )
@@ -48,6 +48,17 @@ class PublicRouteApiTests(TestCase):
         )
         self.client.force_authenticate(self.user)
 
+    def test_filtering_by_station_names(self):
+        route = sample_route("Lviv Main", "Kyiv Pasazhyrskyi")
+        sample_route("Lviv Main", "Odesa")
+        sample_route("Kyiv Pasazhyrskyi", "Lviv Main")
+
+        res = self.client.get(
+            ROUTE_URL, data={"source": "lviv", "destination": "kyiv"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in res.data], [route.id])
+
     def test_create_method_forbidden(self):
         payload = {
             "source": sample_station(name="first"),
@@ -0,0 +1,165 @@
+import datetime
+import random
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.booking import book_tickets
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Journey,
+    Ticket,
+)
+from station.seatmap import SeatMap
+
+
+def sample_train_type():
+    return TrainType.objects.create(name=f"express{uuid.uuid4()}")
+
+
+def sample_train(**params):
+    defaults = {
+        "name": "Lincorn",
+        "cargo_num": 10,
+        "places_in_cargo": 15,
+        "train_type": sample_train_type(),
+    }
+    defaults.update(params)
+
+    return Train.objects.create(**defaults)
+
+
+def sample_station(**params):
+    defaults = {
+        "name": f"Sample vokzal{uuid.uuid4()}",
+        "latitude": 10.15,
+        "longitude": 32.14,
+    }
+    defaults.update(params)
+
+    return Station.objects.get_or_create(**defaults)[0]
+
+
+def sample_route(**params):
+    defaults = {
+        "source": sample_station(),
+        "destination": sample_station(),
+        "distance": random.randint(1, 10000),
+    }
+    defaults.update(params)
+    return Route.objects.create(**defaults)
+
+
+def sample_journey(**params):
+    defaults = {
+        "route": sample_route(),
+        "train": sample_train(),
+        "departure_time": timezone.now() + datetime.timedelta(days=1),
+    }
+    defaults.update(params)
+    return Journey.objects.create(**defaults)
+
+
+def get_allocate_url(journey_id: int):
+    return reverse("train-station:journey-allocate", args=[journey_id])
+
+
+class SeatMapTests(TestCase):
+    def test_best_block_is_tightest_fit(self):
+        # cargo 1: 1-3 free, 5-10 free; cargo 2: 1-4 free, 6-10 free
+        seat_map = SeatMap(2, 10, [(1, 4), (2, 5)])
+        self.assertEqual(seat_map.best_block(3), (1, [1, 2, 3]))
+        self.assertEqual(seat_map.best_block(4), (2, [1, 2, 3, 4]))
+        self.assertEqual(seat_map.best_block(5), (2, [6, 7, 8, 9, 10]))
+        self.assertEqual(seat_map.best_block(6), (1, [5, 6, 7, 8, 9, 10]))
+        self.assertIsNone(seat_map.best_block(7))
+
+    def test_compact_representations(self):
+        seat_map = SeatMap(2, 10, [(1, 1), (1, 2), (1, 10), (2, 5)])
+        self.assertEqual(seat_map.as_bitmaps(), ["AwI=", "EAA="])
+        self.assertEqual(seat_map.as_runs(), [[0, 2, 7, 1], [4, 1, 5]])
+
+    def test_sold_out_cargo_has_no_runs(self):
+        seat_map = SeatMap(1, 2, [(1, 1), (1, 2)])
+        self.assertEqual(seat_map.runs, [])
+        self.assertIsNone(seat_map.best_block(1))
+
+
+class SeatAllocationApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email="user@hmail.com", password="efeai341@"
+        )
+        self.journey = sample_journey(
+            train=sample_train(cargo_num=2, places_in_cargo=4)
+        )
+
+    def test_suggest_block(self):
+        book_tickets(
+            [{"journey": self.journey, "cargo": 1, "seat": 3}],
+            user=self.user,
+        )
+        res = self.client.get(
+            get_allocate_url(self.journey.id), data={"party_size": 2}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["cargo"], 1)
+        self.assertEqual(res.data["seats"], [1, 2])
+
+    def test_party_too_large(self):
+        res = self.client.get(
+            get_allocate_url(self.journey.id), data={"party_size": 5}
+        )
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_booking_requires_authentication(self):
+        res = self.client.post(
+            get_allocate_url(self.journey.id), data={"party_size": 2}
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_book_block(self):
+        self.client.force_authenticate(self.user)
+        url = get_allocate_url(self.journey.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(url, data={"party_size": 3})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(t["cargo"], t["seat"]) for t in res.data["tickets"]],
+            [(1, 1), (1, 2), (1, 3)],
+        )
+
+        res = self.client.post(url, data={"party_size": 3})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(t["cargo"], t["seat"]) for t in res.data["tickets"]],
+            [(2, 1), (2, 2), (2, 3)],
+        )
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 2)
+
+    def test_stale_map_is_rebuilt_on_conflict(self):
+        self.client.force_authenticate(self.user)
+        url = get_allocate_url(self.journey.id)
+        self.client.get(url, data={"party_size": 4})
+
+        # Sold without invalidating the cached map
+        order = self.user.orders.create()
+        Ticket.objects.bulk_create(
+            [Ticket(journey=self.journey, cargo=1, seat=2, order=order)]
+        )
+        res = self.client.post(url, data={"party_size": 4})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["tickets"][0]["cargo"], 2)
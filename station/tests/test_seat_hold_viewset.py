@@ -0,0 +1,222 @@
+import datetime
+import random
+import uuid
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import (
+    TrainType,
+    Train,
+    Station,
+    Route,
+    Journey,
+    Order,
+    SeatHold,
+)
+
+HOLD_URL = reverse("train-station:seathold-list")
+CHECKOUT_URL = reverse("train-station:seathold-checkout")
+ORDER_URL = reverse("train-station:order-list")
+
+
+def sample_train_type():
+    return TrainType.objects.create(name=f"express{uuid.uuid4()}")
+
+
+def sample_train(**params):
+    defaults = {
+        "name": "Lincorn",
+        "cargo_num": 10,
+        "places_in_cargo": 15,
+        "train_type": sample_train_type(),
+    }
+    defaults.update(params)
+
+    return Train.objects.create(**defaults)
+
+
+def sample_station(**params):
+    defaults = {
+        "name": f"Sample vokzal{uuid.uuid4()}",
+        "latitude": 10.15,
+        "longitude": 32.14,
+    }
+    defaults.update(params)
+
+    return Station.objects.get_or_create(**defaults)[0]
+
+
+def sample_route(**params):
+    defaults = {
+        "source": sample_station(),
+        "destination": sample_station(),
+        "distance": random.randint(1, 10000),
+    }
+    defaults.update(params)
+    return Route.objects.create(**defaults)
+
+
+def sample_journey(**params):
+    defaults = {
+        "route": sample_route(),
+        "train": sample_train(),
+        "departure_time": timezone.now() + datetime.timedelta(days=1),
+    }
+    defaults.update(params)
+    return Journey.objects.create(**defaults)
+
+
+def get_detail_url(hold_id: int):
+    return reverse("train-station:seathold-detail", args=[hold_id])
+
+
+class AnonymousSeatHoldApiTests(TestCase):
+    def test_hold_forbidden(self):
+        res = APIClient().post(HOLD_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SeatHoldApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create(
+            email="user@hmail.com", password="efeai341@"
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def hold(self, *seats, client=None):
+        return (client or self.client).post(
+            HOLD_URL,
+            data={
+                "journey": self.journey.id,
+                "seats": [{"cargo": 1, "seat": seat} for seat in seats],
+            },
+            format="json",
+        )
+
+    def other_client(self):
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.create(
+                email="other@hmail.com", password="efeai341@"
+            )
+        )
+        return client
+
+    def test_hold_takes_seats_out_of_availability(self):
+        res = self.hold(1, 2)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 148)
+
+        res = self.client.get(
+            reverse("train-station:journey-detail", args=[self.journey.id])
+        )
+        self.assertEqual(
+            res.data["held_seats"],
+            [{"cargo": 1, "seat": 1}, {"cargo": 1, "seat": 2}],
+        )
+
+    def test_rehold_extends_without_double_counting(self):
+        self.hold(1)
+        res = self.hold(1)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SeatHold.objects.count(), 1)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 149)
+
+    def test_seat_out_of_range_rejected(self):
+        res = self.hold(16)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_held_seat_unavailable_to_others(self):
+        self.hold(3)
+        other = self.other_client()
+
+        res = self.hold(3, client=other)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+        res = other.post(
+            ORDER_URL,
+            data={
+                "tickets": [
+                    {"cargo": 1, "seat": 3, "journey": self.journey.id}
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["taken_seats"],
+            [{"journey": self.journey.id, "cargo": 1, "seat": 3}],
+        )
+
+    def test_expired_hold_does_not_block_others(self):
+        self.hold(4)
+        SeatHold.objects.update(expires_at=timezone.now())
+
+        res = self.hold(4, client=self.other_client())
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 149)
+
+    def test_checkout_turns_holds_into_order(self):
+        holds = self.hold(5, 6).data
+        res = self.client.post(
+            CHECKOUT_URL,
+            data={"holds": [hold["id"] for hold in holds]},
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["tickets"]), 2)
+        self.assertFalse(SeatHold.objects.exists())
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 148)
+
+    def test_checkout_of_released_hold_rejected(self):
+        hold = self.hold(5).data[0]
+        SeatHold.objects.all().delete()
+        res = self.client.post(
+            CHECKOUT_URL, data={"holds": [hold["id"]]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_of_expired_hold_rejected(self):
+        hold = self.hold(5).data[0]
+        SeatHold.objects.update(expires_at=timezone.now())
+        res = self.client.post(
+            CHECKOUT_URL, data={"holds": [hold["id"]]}, format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_cancel_hold_frees_seat(self):
+        hold = self.hold(7).data[0]
+        res = self.client.delete(get_detail_url(hold["id"]))
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 150)
+
+    def test_sweeper_releases_expired_holds(self):
+        self.hold(8, 9)
+        self.hold(10)
+        SeatHold.objects.filter(seat__in=[8, 9]).update(
+            expires_at=timezone.now()
+        )
+        out = StringIO()
+        call_command("release_expired_holds", stdout=out)
+        self.assertIn("Released 2 expired holds", out.getvalue())
+        self.assertEqual(SeatHold.objects.count(), 1)
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 149)
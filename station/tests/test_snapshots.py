@@ -0,0 +1,178 @@
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.booking import book_tickets, hold_seats, checkout_holds
+from station.models import Station, Route, TrainType, Train, Journey
+from station.snapshots import LOCK_KEY, write_snapshot
+
+SNAPSHOT_URL = reverse("train-station:export-snapshot")
+
+
+def run_now(function):
+    function()
+
+
+@mock.patch("station.snapshots.LAG", timedelta(0))
+class SnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings = override_settings(SNAPSHOTS_DIR=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            "buyer@test.com", "password"
+        )
+        self.route = Route.objects.create(
+            source=Station.objects.create(
+                name="Lviv", latitude=49.84, longitude=24.03
+            ),
+            destination=Station.objects.create(
+                name="Kyiv", latitude=50.45, longitude=30.52
+            ),
+            distance=540,
+        )
+        self.train = Train.objects.create(
+            name="Hyundai",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=TrainType.objects.create(name="Intercity"),
+        )
+        self.journeys = [
+            self.add_journey(datetime(2030, 1, 3, 8)),
+            # Still the 3rd in Kyiv, already the 4th in UTC
+            self.add_journey(datetime(2030, 1, 3, 23, 30)),
+            self.add_journey(datetime(2030, 1, 5, 8)),
+        ]
+        book_tickets(
+            [{"journey": self.journeys[0], "cargo": 1, "seat": 1}],
+            user=self.user,
+        )
+
+    def add_journey(self, departure: datetime) -> Journey:
+        return Journey.objects.create(
+            route=self.route,
+            train=self.train,
+            departure_time=timezone.make_aware(departure),
+        )
+
+    def read(self, table: str, file_format: str = "parquet") -> pa.Table:
+        return ds.dataset(
+            self.root / table, format=file_format, partitioning="hive"
+        ).to_table()
+
+    def partitions(self, table: str) -> list[str]:
+        return sorted(path.name for path in (self.root / table).iterdir())
+
+    def test_first_snapshot_has_everything(self):
+        written = write_snapshot()
+        self.assertEqual(
+            written,
+            {"station": 2, "route": 1, "journey": 3, "ticket": 1, "order": 1},
+        )
+        self.assertEqual(
+            self.partitions("journey"),
+            ["departure_date=2030-01-03", "departure_date=2030-01-05"],
+        )
+
+        journeys = self.read("journey").sort_by("id").to_pylist()
+        self.assertEqual(
+            [journey["id"] for journey in journeys],
+            [journey.id for journey in self.journeys],
+        )
+        self.assertEqual(
+            journeys[0]["departure_time"], self.journeys[0].departure_time
+        )
+        self.assertEqual(journeys[0]["tickets_available"], 19)
+        self.assertEqual(
+            self.read("ticket").to_pylist()[0]["journey_id"],
+            self.journeys[0].id,
+        )
+        self.assertEqual(self.read("station").num_rows, 2)
+
+    def test_unchanged_tables_are_not_rewritten(self):
+        write_snapshot()
+        self.assertEqual(write_snapshot(), {})
+
+    def test_only_changed_days_are_rewritten(self):
+        write_snapshot()
+        book_tickets(
+            [{"journey": self.journeys[2], "cargo": 1, "seat": 1}],
+            user=self.user,
+        )
+        # Both orders were placed today, so share its partition
+        self.assertEqual(
+            write_snapshot(), {"journey": 1, "ticket": 1, "order": 2}
+        )
+        self.assertEqual(self.read("ticket").num_rows, 2)
+
+    def test_checked_out_holds_are_rewritten(self):
+        holds = hold_seats(
+            self.user, [{"journey": self.journeys[2], "cargo": 1, "seat": 2}]
+        )
+        write_snapshot()
+        checkout_holds(self.user, [hold.pk for hold in holds])
+
+        self.assertEqual(write_snapshot()["ticket"], 1)
+        self.assertEqual(self.read("ticket").num_rows, 2)
+
+    def test_moved_and_deleted_journeys_leave_their_day(self):
+        write_snapshot()
+        self.journeys[0].departure_time += timedelta(days=1)
+        self.journeys[0].save()
+        self.journeys[1].delete()
+
+        write_snapshot()
+        self.assertEqual(
+            self.partitions("journey"),
+            ["departure_date=2030-01-04", "departure_date=2030-01-05"],
+        )
+        self.assertEqual(self.read("journey").num_rows, 2)
+
+    def test_arrow_files(self):
+        write_snapshot("arrow")
+        path = self.root / "journey/departure_date=2030-01-05/part.arrow"
+        with pa.ipc.open_file(path) as reader:
+            self.assertEqual(reader.read_all().num_rows, 1)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("write_snapshot", "--full", stdout=out)
+        self.assertIn("journey: 3 rows", out.getvalue())
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.post(SNAPSHOT_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        with mock.patch("station.snapshots.in_background", run_now):
+            res = client.post(SNAPSHOT_URL, {"format": "arrow"})
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+
+        res = client.get(SNAPSHOT_URL)
+        self.assertEqual(res.data["format"], "arrow")
+        self.assertEqual(res.data["written"]["journey"], 3)
+
+        cache.add(LOCK_KEY, True)
+        res = client.post(SNAPSHOT_URL)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
@@ -0,0 +1,95 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.autocomplete import StationIndex, normalize
+from station.models import Station
+
+AUTOCOMPLETE_URL = reverse("train-station:station-autocomplete")
+
+
+def sample_station(**params):
+    defaults = {
+        "name": "Sample vokzal",
+        "latitude": 10.15,
+        "longitude": 32.14,
+    }
+    defaults.update(params)
+
+    return Station.objects.create(**defaults)
+
+
+class StationIndexTest(TestCase):
+    def setUp(self):
+        self.index = StationIndex(
+            [
+                (1, "Lviv Main"),
+                (2, "Kyiv Pasazhyrskyi"),
+                (3, "Kyiv Airport"),
+                (4, "Bila Kyivska"),
+                (5, "Kyïv-Darnytsia"),
+            ]
+        )
+
+    def suggest(self, query, **kwargs):
+        return [
+            station["id"] for station in self.index.suggest(query, **kwargs)
+        ]
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize("  Kyïv-Darnytsia (Left bank)"),
+            "kyiv darnytsia left bank",
+        )
+
+    def test_name_prefix_before_word_prefix(self):
+        self.assertEqual(self.suggest("kyiv"), [3, 5, 2, 4])
+        self.assertEqual(self.suggest("air"), [3])
+
+    def test_limit(self):
+        self.assertEqual(self.suggest("ky", limit=2), [3, 5])
+
+    def test_one_typo(self):
+        self.assertEqual(self.suggest("lvov"), [1])
+        self.assertEqual(self.suggest("lviv mian"), [1])
+        self.assertEqual(self.suggest("darm"), [5])
+
+    def test_exact_only(self):
+        self.assertEqual(self.suggest("lvov", max_distance=0), [])
+
+    def test_short_queries_are_not_fuzzy(self):
+        self.assertEqual(self.suggest("lb"), [])
+        self.assertEqual(self.suggest(" - "), [])
+
+
+class StationAutocompleteApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lviv = sample_station(name="Lviv Main")
+            self.kyiv = sample_station(name="Kyiv Pasazhyrskyi")
+
+    def test_suggestions(self):
+        res = self.client.get(AUTOCOMPLETE_URL, data={"q": "lvi"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{"id": self.lviv.id, "name": "Lviv Main"}])
+
+    def test_served_from_memory(self):
+        self.client.get(AUTOCOMPLETE_URL, data={"q": "kyiv"})
+        with self.assertNumQueries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, data={"q": "kyiv"})
+        self.assertEqual(res.data[0]["id"], self.kyiv.id)
+
+    def test_station_changes_rebuild_index(self):
+        self.client.get(AUTOCOMPLETE_URL, data={"q": "kyiv"})
+        with self.captureOnCommitCallbacks(execute=True):
+            airport = sample_station(name="Kyiv Airport")
+            self.kyiv.delete()
+
+        res = self.client.get(AUTOCOMPLETE_URL, data={"q": "kyiv"})
+        self.assertEqual([station["id"] for station in res.data], [airport.id])
+
+    def test_invalid_limit(self):
+        res = self.client.get(AUTOCOMPLETE_URL, data={"q": "k", "limit": "x"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
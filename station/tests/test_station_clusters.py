@@ -0,0 +1,136 @@
+import random
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.clusters import MAX_CELLS, MAX_ZOOM, StationClusters
+from station.models import Station
+
+CLUSTERS_URL = reverse("train-station:station-clusters")
+WORLD = (-180, -85, 180, 85)
+
+
+def sample_station(name: str, latitude: float, longitude: float):
+    return Station.objects.create(
+        name=name, latitude=latitude, longitude=longitude
+    )
+
+
+class StationClustersTest(TestCase):
+    def setUp(self):
+        rand = random.Random(0)
+        self.stations = [
+            (number, str(number), rand.uniform(44, 52), rand.uniform(22, 40))
+            for number in range(2000)
+        ]
+        self.clusters = StationClusters(self.stations)
+
+    def test_every_zoom_counts_every_station(self):
+        for zoom in range(MAX_ZOOM + 1):
+            _, clusters = self.clusters.clusters(22, 44, 40, 52, zoom)
+            self.assertEqual(
+                sum(cluster["count"] for cluster in clusters), 2000
+            )
+
+    def test_payload_is_bounded(self):
+        zoom, clusters = self.clusters.clusters(*WORLD, MAX_ZOOM + 4)
+        self.assertLess(zoom, MAX_ZOOM)
+        self.assertLessEqual(len(clusters), MAX_CELLS)
+
+    def test_viewport(self):
+        west, south, east, north = 30, 48, 31, 49
+        zoom, clusters = self.clusters.clusters(west, south, east, north, 11)
+        inside = [
+            number
+            for number, _, latitude, longitude in self.stations
+            if south <= latitude <= north and west <= longitude <= east
+        ]
+        self.assertEqual(zoom, 11)
+        # Cells on the edge may reach a little outside of the viewport
+        self.assertGreaterEqual(
+            sum(cluster["count"] for cluster in clusters), len(inside)
+        )
+        for cluster in clusters:
+            self.assertTrue(west - 0.1 < cluster["longitude"] < east + 0.1)
+            self.assertTrue(south - 0.1 < cluster["latitude"] < north + 0.1)
+
+    def test_single_station_clusters(self):
+        clusters = StationClusters(
+            [(1, "Lviv", 49.8397, 24.0297), (2, "Kyiv", 50.4501, 30.5234)]
+        )
+        _, found = clusters.clusters(22, 48, 32, 52, 6)
+        self.assertEqual(
+            found,
+            [
+                {
+                    "latitude": 49.8397,
+                    "longitude": 24.0297,
+                    "count": 1,
+                    "station": 1,
+                    "name": "Lviv",
+                },
+                {
+                    "latitude": 50.4501,
+                    "longitude": 30.5234,
+                    "count": 1,
+                    "station": 2,
+                    "name": "Kyiv",
+                },
+            ],
+        )
+
+    def test_antimeridian(self):
+        clusters = StationClusters(
+            [(1, "East", 0, 179.5), (2, "West", 0, -179.5), (3, "Far", 0, 0)]
+        )
+        _, found = clusters.clusters(179, -1, -179, 1, 6)
+        self.assertEqual(
+            sorted(cluster["station"] for cluster in found), [1, 2]
+        )
+
+
+class StationClustersApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lviv = sample_station("Lviv", 49.8397, 24.0297)
+            self.kyiv = sample_station("Kyiv", 50.4501, 30.5234)
+            self.brovary = sample_station("Brovary", 50.5113, 30.7903)
+
+    def get_clusters(self, bbox="22,44,40,53", zoom=4):
+        return self.client.get(CLUSTERS_URL, data={"bbox": bbox, "zoom": zoom})
+
+    def test_clusters(self):
+        res = self.get_clusters()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["zoom"], 4)
+        self.assertEqual(
+            sorted(
+                (cluster["count"], cluster["station"])
+                for cluster in res.data["clusters"]
+            ),
+            [(1, self.lviv.id), (2, None)],
+        )
+
+    def test_station_writes_regroup(self):
+        self.get_clusters()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brovary.delete()
+
+        res = self.get_clusters()
+        self.assertEqual(
+            sorted(cluster["station"] for cluster in res.data["clusters"]),
+            sorted([self.lviv.id, self.kyiv.id]),
+        )
+
+    def test_invalid_query(self):
+        for bbox in ("22,44,40", "22,44,40,x", "22,53,40,44", "22,44,190,53"):
+            res = self.get_clusters(bbox=bbox)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.get_clusters(zoom=-1)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
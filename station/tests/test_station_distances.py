@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.distances import (
+    STALE_AGE,
+    build_distance_matrix,
+    dijkstra,
+    floyd_warshall,
+    shortest_distances,
+)
+from station.models import Station, Route
+
+MATRIX_URL = reverse("train-station:station-distance-matrix")
+
+
+def get_distances_url(station_id: int):
+    return reverse("train-station:station-distances", args=[station_id])
+
+
+def sample_station(name: str):
+    return Station.objects.create(name=name, latitude=10.15, longitude=32.14)
+
+
+class ShortestDistancesTest(TestCase):
+    def test_one_way_routes(self):
+        distances = shortest_distances(
+            [1, 2, 3, 4],
+            [(1, 2, 100), (2, 3, 50), (1, 3, 200), (3, 1, 10)],
+        )
+        inf = np.inf
+        self.assertEqual(
+            distances.tolist(),
+            [
+                [0, 100, 150, inf],
+                [60, 0, 50, inf],
+                [10, 110, 0, inf],
+                [inf, inf, inf, 0],
+            ],
+        )
+
+    def test_algorithms_agree(self):
+        rng = np.random.default_rng(0)
+        matrix = np.full((40, 40), np.inf, np.float32)
+        np.fill_diagonal(matrix, 0)
+        for _ in range(120):
+            i, j = rng.integers(40, size=2)
+            if i != j:
+                matrix[i, j] = rng.integers(1, 500)
+
+        self.assertTrue(
+            np.array_equal(floyd_warshall(matrix.copy()), dijkstra(matrix))
+        )
+
+
+class StationDistancesApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = Path(directory)
+        settings = override_settings(STATION_DISTANCES_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.client = APIClient()
+        self.lviv = sample_station("Lviv")
+        self.kyiv = sample_station("Kyiv")
+        self.odesa = sample_station("Odesa")
+        Route.objects.create(
+            source=self.lviv, destination=self.kyiv, distance=540
+        )
+        Route.objects.create(
+            source=self.kyiv, destination=self.odesa, distance=475
+        )
+
+    def test_distances_from_station(self):
+        res = self.client.get(get_distances_url(self.lviv.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [
+                {"station": self.kyiv.id, "distance": 540},
+                {"station": self.odesa.id, "distance": 1015},
+            ],
+        )
+
+    def test_unknown_station(self):
+        res = self.client.get(get_distances_url(self.odesa.id + 100))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_matrix(self):
+        ids = [self.odesa.id, self.lviv.id, self.odesa.id + 100]
+        res = self.client.get(
+            MATRIX_URL, data={"ids": ",".join(map(str, ids))}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["stations"], ids)
+        self.assertEqual(
+            res.data["distances"],
+            [[0, None, None], [1015, 0, None], [None, None, None]],
+        )
+
+    def test_matrix_rejects_bad_ids(self):
+        res = self.client.get(MATRIX_URL, data={"ids": "1,x"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_route_changes_invalidate(self):
+        self.client.get(get_distances_url(self.lviv.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            Route.objects.create(
+                source=self.lviv, destination=self.odesa, distance=900
+            )
+
+        res = self.client.get(get_distances_url(self.lviv.id))
+        self.assertEqual(
+            res.data,
+            [
+                {"station": self.kyiv.id, "distance": 540},
+                {"station": self.odesa.id, "distance": 900},
+            ],
+        )
+
+    def test_build_keeps_recent_matrices(self):
+        build_distance_matrix("first")
+        build_distance_matrix("second")
+        self.assertEqual(len(list(self.directory.glob("*.npy"))), 4)
+
+        stale = time.time() - STALE_AGE - 1
+        for path in self.directory.glob("*-first.npy"):
+            os.utime(path, (stale, stale))
+        build_distance_matrix("third")
+        self.assertEqual(
+            sorted(path.name for path in self.directory.glob("*.npy")),
+            [
+                "distances-second.npy",
+                "distances-third.npy",
+                "stations-second.npy",
+                "stations-third.npy",
+            ],
+        )
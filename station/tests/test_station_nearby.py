@@ -0,0 +1,149 @@
+import math
+import random
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from station.models import Station
+from station.nearby import StationTree, chord_to_km, unit_vector
+
+NEARBY_URL = reverse("train-station:station-nearby")
+
+
+def haversine(first: tuple, second: tuple) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (*first, *second))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371.0088 * math.asin(math.sqrt(a))
+
+
+def sample_station(name: str, latitude: float, longitude: float):
+    return Station.objects.create(
+        name=name, latitude=latitude, longitude=longitude
+    )
+
+
+class StationTreeTest(TestCase):
+    def setUp(self):
+        rand = random.Random(0)
+        self.coordinates = {
+            number: (rand.uniform(44, 52), rand.uniform(22, 40))
+            for number in range(500)
+        }
+        self.tree = StationTree(
+            (number, str(number), *point)
+            for number, point in self.coordinates.items()
+        )
+
+    def brute_force(self, point, k=None, radius=None):
+        distances = sorted(
+            (haversine(point, other), number)
+            for number, other in self.coordinates.items()
+        )
+        if radius is not None:
+            distances = [item for item in distances if item[0] <= radius]
+        return [number for _, number in distances[:k]]
+
+    def found(self, *args, **kwargs):
+        return [number for _, number in self.tree.search(*args, **kwargs)]
+
+    def test_distance_is_haversine(self):
+        lviv, kyiv = (49.8397, 24.0297), (50.4501, 30.5234)
+        chord = math.dist(unit_vector(*lviv), unit_vector(*kyiv))
+        self.assertAlmostEqual(chord_to_km(chord), haversine(lviv, kyiv))
+
+    def test_k_nearest(self):
+        point = (48.5, 31.0)
+        self.assertEqual(self.found(*point, k=7), self.brute_force(point, k=7))
+
+    def test_within_radius(self):
+        point = (48.5, 31.0)
+        self.assertEqual(
+            self.found(*point, radius=120), self.brute_force(point, radius=120)
+        )
+        self.assertEqual(
+            self.found(*point, k=3, radius=120),
+            self.brute_force(point, k=3, radius=120),
+        )
+
+    def test_incremental_changes(self):
+        for number in range(0, 500, 3):
+            self.tree.remove(number)
+            del self.coordinates[number]
+        rand = random.Random(1)
+        for number in range(1000, 1100):
+            point = (rand.uniform(48, 49), rand.uniform(31, 32))
+            self.coordinates[number] = point
+            self.tree.add(number, str(number), *point)
+
+        point = (48.5, 31.3)
+        self.assertEqual(
+            self.found(*point, k=20), self.brute_force(point, k=20)
+        )
+
+    def test_copy_leaves_tree_as_it_is(self):
+        point = (48.5, 31.3)
+        before = self.found(*point, k=5)
+        copy = self.tree.copy()
+        for number in before:
+            copy.remove(number)
+        copy.add(1000, "1000", *point)
+
+        self.assertEqual(self.found(*point, k=5), before)
+        self.assertEqual(copy.search(*point, k=1), [(0.0, 1000)])
+
+
+class NearbyStationsApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lviv = sample_station("Lviv", 49.8397, 24.0297)
+            self.kyiv = sample_station("Kyiv", 50.4501, 30.5234)
+            self.odesa = sample_station("Odesa", 46.4825, 30.7233)
+
+    def test_nearest(self):
+        res = self.client.get(
+            NEARBY_URL, data={"lat": 50.0, "lon": 28.0, "k": 2}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [station["id"] for station in res.data],
+            [self.kyiv.id, self.lviv.id],
+        )
+        self.assertAlmostEqual(
+            res.data[0]["distance"],
+            haversine((50.0, 28.0), (50.4501, 30.5234)),
+            places=2,
+        )
+
+    def test_radius(self):
+        res = self.client.get(
+            NEARBY_URL, data={"lat": 46.5, "lon": 30.7, "radius": 500}
+        )
+        self.assertEqual(
+            [station["id"] for station in res.data],
+            [self.odesa.id, self.kyiv.id],
+        )
+
+    def test_station_writes_refresh_index(self):
+        self.client.get(NEARBY_URL, data={"lat": 50.0, "lon": 30.0})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kyiv.delete()
+            self.odesa.latitude = 50.1
+            self.odesa.longitude = 30.1
+            self.odesa.save()
+
+        res = self.client.get(
+            NEARBY_URL, data={"lat": 50.0, "lon": 30.0, "k": 1}
+        )
+        self.assertEqual(res.data[0]["id"], self.odesa.id)
+
+    def test_invalid_point(self):
+        res = self.client.get(NEARBY_URL, data={"lat": 95, "lon": 30})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
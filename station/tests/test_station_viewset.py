@@ -5,6 +5,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 
 from station.models import Station
+from station.search import trigram_enabled, station_ids
 from station.serializers import StationListSerializer, StationDetailSerializer
 
 
@@ -133,3 +134,33 @@ class AdminStationApiTest(TestCase):
         }
         res = self.client.post(STATION_URL, data=payload)
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+
+class StationSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.lviv = sample_station(name="Lviv Main")
+        self.kyiv = sample_station(name="Kyiv Pasazhyrskyi")
+        self.airport = sample_station(name="Kyiv Airport")
+        self.kyivska = sample_station(name="Bila Kyivska")
+
+    def test_prefix_matches_come_first(self):
+        if trigram_enabled():
+            self.skipTest("pg_trgm ranks by similarity instead")
+
+        res = self.client.get(STATION_URL, data={"name": "kyiv"})
+        self.assertEqual(
+            [station["id"] for station in res.data],
+            [self.airport.id, self.kyiv.id, self.kyivska.id],
+        )
+
+    def test_station_ids(self):
+        self.assertEqual(station_ids("lviv"), [self.lviv.id])
+        self.assertEqual(station_ids("odesa"), [])
+
+    def test_misspelled_name_is_found(self):
+        if not trigram_enabled():
+            self.skipTest("needs pg_trgm")
+
+        res = self.client.get(STATION_URL, data={"name": "Lvov Main"})
+        self.assertEqual(res.data[0]["id"], self.lviv.id)
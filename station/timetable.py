@@ -0,0 +1,582 @@
+import csv
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DataError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from station.autocomplete import forget_station_index
+from station.clusters import forget_station_clusters
+from station.distances import forget_distances
+from station.models import Station, Route, Train, Crew, Journey
+from station.nearby import station_changes
+from station.planner import journey_changes
+from station.versions import bump_versions
+
+# Rows sent per statement where COPY is not available
+BATCH_SIZE = 10_000
+# Problems listed before an import is refused
+MAX_PROBLEMS = 20
+# Journeys inserted from which the planner is given their statistics
+ANALYZE_ROWS = 10_000
+
+STATIONS = Station._meta.db_table
+ROUTES = Route._meta.db_table
+TRAINS = Train._meta.db_table
+CREW = Crew._meta.db_table
+JOURNEYS = Journey._meta.db_table
+ASSIGNMENTS = Journey.crew_members.through._meta.db_table
+
+
+class TimetableError(Exception):
+    def __init__(self, problems: list[str]):
+        super().__init__("\n".join(problems))
+        self.problems = problems
+
+
+class Staging:
+    """
+    A CSV file of the timetable and the temporary table it is loaded to
+    as it is: columns of the file (name, type, required) plus ones
+    filled in while importing. line is the file line of each row.
+    """
+
+    TYPES = {
+        "postgresql": {
+            "text": "text",
+            "float": "double precision",
+            "integer": "integer",
+            "datetime": "timestamp with time zone",
+        },
+        "other": {
+            "text": "text",
+            "float": "real",
+            "integer": "integer",
+            "datetime": "text",
+        },
+    }
+
+    def __init__(
+        self, file: str, table: str, columns: list, extra: tuple = ()
+    ):
+        self.file = file
+        self.table = table
+        self.columns = columns
+        self.extra = extra
+
+    def create(self, cursor) -> None:
+        vendor = "postgresql" if connection.vendor == "postgresql" else "other"
+        types = self.TYPES[vendor]
+        line = "bigserial" if vendor == "postgresql" else "integer"
+        columns = [f"line {line} PRIMARY KEY"] + [
+            f"{name} {types[kind]}" for name, kind, _ in self.columns
+        ]
+        columns += [f"{name} integer" for name in self.extra]
+        cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {self.table} ({', '.join(columns)})"
+        )
+
+    def header(self, header: list[str]) -> list[str]:
+        known = {name for name, _, _ in self.columns}
+        required = {name for name, _, needed in self.columns if needed}
+        problems = [
+            f"{self.file}: unknown column {name}"
+            for name in header
+            if name not in known
+        ] + [
+            f"{self.file}: missing column {name}"
+            for name in sorted(required - set(header))
+        ]
+        if problems:
+            raise TimetableError(problems)
+        return header
+
+    def load(self, cursor, path: Path) -> int:
+        """Load the file and return the number of its rows"""
+        with open(path, newline="", encoding="utf-8") as file:
+            header = self.header(next(csv.reader([file.readline()])))
+            if connection.vendor == "postgresql":
+                self.copy(cursor, file, header)
+            else:
+                self.insert(cursor, file, header)
+        cursor.execute(f"SELECT COUNT(*) FROM {self.table}")
+        return cursor.fetchone()[0]
+
+    def copy(self, cursor, file, header: list[str]) -> None:
+        try:
+            with connection.wrap_database_errors:
+                cursor.copy_expert(
+                    f"COPY {self.table} ({', '.join(header)}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    file,
+                )
+        except DataError as error:
+            raise TimetableError(
+                [f"{self.file}: {str(error).strip()}"]
+            ) from error
+
+    def insert(self, cursor, file, header: list[str]) -> None:
+        kinds = dict((name, kind) for name, kind, _ in self.columns)
+        convert = [self.converter(kinds[name]) for name in header]
+        statement = (
+            f"INSERT INTO {self.table} (line, {', '.join(header)}) "
+            f"VALUES (%s{', %s' * len(header)})"
+        )
+        batch = []
+        for line, row in enumerate(csv.reader(file), start=2):
+            if len(row) != len(header):
+                raise TimetableError(
+                    [f"{self.file}, line {line}: not {len(header)} values"]
+                )
+            try:
+                values = [
+                    function(value) if value != "" else None
+                    for function, value in zip(convert, row)
+                ]
+            except ValueError as error:
+                raise TimetableError(
+                    [f"{self.file}, line {line}: {error}"]
+                ) from error
+            batch.append([line, *values])
+            if len(batch) == BATCH_SIZE:
+                cursor.executemany(statement, batch)
+                batch = []
+        if batch:
+            cursor.executemany(statement, batch)
+
+    @staticmethod
+    def converter(kind: str):
+        if kind == "float":
+            return float
+        if kind == "integer":
+            return int
+        if kind == "datetime":
+            return _datetime
+        return str
+
+    def line(self, line: int) -> int:
+        # COPY numbers the rows from 1, after the header line
+        if connection.vendor == "postgresql":
+            return line + 1
+        return line
+
+
+def _datetime(value: str) -> str:
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"invalid date and time {value!r}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return connection.ops.adapt_datetimefield_value(moment)
+
+
+STATION_FILE = Staging(
+    "stations.csv",
+    "import_station",
+    [
+        ("name", "text", True),
+        ("latitude", "float", True),
+        ("longitude", "float", True),
+    ],
+)
+ROUTE_FILE = Staging(
+    "routes.csv",
+    "import_route",
+    [
+        ("route_id", "text", True),
+        ("source", "text", True),
+        ("destination", "text", True),
+        ("distance", "integer", True),
+        ("description", "text", False),
+    ],
+    extra=("source_pk", "destination_pk", "route_pk"),
+)
+TRIP_FILE = Staging(
+    "trips.csv",
+    "import_trip",
+    [
+        ("trip_id", "text", True),
+        ("route_id", "text", True),
+        ("train_id", "integer", True),
+        ("departure_time", "datetime", True),
+        ("arrival_time", "datetime", False),
+    ],
+    extra=("departure_minute", "journey_pk"),
+)
+CREW_FILE = Staging(
+    "crew_assignments.csv",
+    "import_crew",
+    [("trip_id", "text", True), ("crew_id", "integer", True)],
+)
+FILES = (STATION_FILE, ROUTE_FILE, TRIP_FILE, CREW_FILE)
+
+
+def _unknown_station(name: str) -> str:
+    return (
+        f"NOT EXISTS (SELECT 1 FROM import_station s WHERE s.name = {name})"
+        f" AND NOT EXISTS (SELECT 1 FROM {STATIONS} s WHERE s.name = {name})"
+    )
+
+
+# (file, problem, rows with it), each a query for the lines of the rows.
+# References are checked with NOT EXISTS, which the planner turns into
+# anti-joins, where NOT IN over a large table is a nested loop.
+CHECKS = (
+    (
+        STATION_FILE,
+        "missing name, latitude or longitude",
+        "SELECT line FROM import_station WHERE name IS NULL"
+        " OR latitude IS NULL OR longitude IS NULL",
+    ),
+    (
+        STATION_FILE,
+        "latitude or longitude over 360",
+        "SELECT line FROM import_station"
+        " WHERE latitude > 360 OR longitude > 360",
+    ),
+    (
+        STATION_FILE,
+        "station listed twice",
+        "SELECT line FROM import_station WHERE name IN ("
+        " SELECT name FROM import_station"
+        " GROUP BY name HAVING COUNT(*) > 1)",
+    ),
+    (
+        ROUTE_FILE,
+        "missing route_id, source, destination or distance",
+        "SELECT line FROM import_route WHERE route_id IS NULL"
+        " OR source IS NULL OR destination IS NULL OR distance IS NULL",
+    ),
+    (
+        ROUTE_FILE,
+        "route_id used twice",
+        "SELECT line FROM import_route WHERE route_id IN ("
+        " SELECT route_id FROM import_route"
+        " GROUP BY route_id HAVING COUNT(*) > 1)",
+    ),
+    (
+        ROUTE_FILE,
+        "unknown source or destination station",
+        "SELECT line FROM import_route r"
+        f" WHERE {_unknown_station('r.source')}"
+        f" OR {_unknown_station('r.destination')}",
+    ),
+    (
+        TRIP_FILE,
+        "missing trip_id, route_id, train_id or departure_time",
+        "SELECT line FROM import_trip WHERE trip_id IS NULL"
+        " OR route_id IS NULL OR train_id IS NULL"
+        " OR departure_time IS NULL",
+    ),
+    (
+        TRIP_FILE,
+        "trip_id used twice",
+        "SELECT line FROM import_trip WHERE trip_id IN ("
+        " SELECT trip_id FROM import_trip"
+        " GROUP BY trip_id HAVING COUNT(*) > 1)",
+    ),
+    (
+        TRIP_FILE,
+        "route_id not in routes.csv",
+        "SELECT line FROM import_trip t WHERE NOT EXISTS ("
+        " SELECT 1 FROM import_route r WHERE r.route_id = t.route_id)",
+    ),
+    (
+        TRIP_FILE,
+        "unknown train_id",
+        f"SELECT line FROM import_trip t WHERE NOT EXISTS ("
+        f" SELECT 1 FROM {TRAINS} train WHERE train.id = t.train_id)",
+    ),
+    (
+        TRIP_FILE,
+        "arrival not after departure",
+        "SELECT line FROM import_trip WHERE arrival_time <= departure_time",
+    ),
+    (
+        TRIP_FILE,
+        "same route, train and departure as another trip",
+        "SELECT line FROM import_trip t WHERE EXISTS ("
+        " SELECT 1 FROM import_trip other"
+        " WHERE other.route_id = t.route_id"
+        " AND other.train_id = t.train_id"
+        " AND other.departure_time = t.departure_time"
+        " AND other.line <> t.line)",
+    ),
+    (
+        CREW_FILE,
+        "trip_id not in trips.csv",
+        "SELECT line FROM import_crew c WHERE NOT EXISTS ("
+        " SELECT 1 FROM import_trip t WHERE t.trip_id = c.trip_id)",
+    ),
+    (
+        CREW_FILE,
+        "unknown crew_id",
+        f"SELECT line FROM import_crew c WHERE NOT EXISTS ("
+        f" SELECT 1 FROM {CREW} crew WHERE crew.id = c.crew_id)",
+    ),
+)
+
+
+def _validate(cursor) -> None:
+    """Refuse the import listing the first MAX_PROBLEMS rows at fault"""
+    problems = []
+    for staging, problem, query in CHECKS:
+        cursor.execute(f"{query} ORDER BY line LIMIT {MAX_PROBLEMS}")
+        problems += [
+            f"{staging.file}, line {staging.line(line)}: {problem}"
+            for line, in cursor.fetchall()
+        ]
+        if len(problems) >= MAX_PROBLEMS:
+            break
+    if problems:
+        raise TimetableError(problems[:MAX_PROBLEMS])
+
+
+def _upsert(cursor, now, crew: bool) -> dict:
+    """
+    Write the staged rows and return the rows inserted and updated (and
+    crew assignments deleted) per table. With crew_assignments.csv, the
+    crew of every trip in trips.csv is replaced by the one listed there.
+    """
+    counts = {
+        "stations": {"inserted": 0, "updated": 0},
+        "routes": {"inserted": 0, "updated": 0},
+        "journeys": {"inserted": 0, "updated": 0},
+        "crew_assignments": {"inserted": 0, "deleted": 0},
+    }
+    # Updated before inserting, which would otherwise count in the
+    # rows updated the ones it has just written
+    cursor.execute(
+        f"UPDATE {STATIONS} SET latitude = s.latitude,"
+        f" longitude = s.longitude, updated_at = %s FROM import_station s"
+        f" WHERE {STATIONS}.name = s.name"
+        f" AND ({STATIONS}.latitude <> s.latitude"
+        f" OR {STATIONS}.longitude <> s.longitude)",
+        [now],
+    )
+    counts["stations"]["updated"] = cursor.rowcount
+    cursor.execute(
+        f"INSERT INTO {STATIONS} (name, latitude, longitude, updated_at)"
+        f" SELECT name, latitude, longitude, %s FROM import_station"
+        f" WHERE true ON CONFLICT (name) DO NOTHING",
+        [now],
+    )
+    counts["stations"]["inserted"] = cursor.rowcount
+
+    cursor.execute(
+        f"UPDATE import_route SET"
+        f" source_pk = (SELECT id FROM {STATIONS}"
+        f" WHERE name = import_route.source),"
+        f" destination_pk = (SELECT id FROM {STATIONS}"
+        f" WHERE name = import_route.destination)"
+    )
+    cursor.execute(
+        f"INSERT INTO {ROUTES}"
+        f" (source_id, destination_id, distance, description, updated_at)"
+        f" SELECT source_pk, destination_pk, distance,"
+        f" COALESCE(description, %s), %s FROM import_route"
+        f" WHERE true ON CONFLICT (source_id, destination_id, distance)"
+        f" DO NOTHING",
+        [Route._meta.get_field("description").default, now],
+    )
+    counts["routes"]["inserted"] = cursor.rowcount
+    cursor.execute(
+        f"UPDATE import_route SET route_pk = (SELECT id FROM {ROUTES}"
+        f" WHERE source_id = import_route.source_pk"
+        f" AND destination_id = import_route.destination_pk"
+        f" AND distance = import_route.distance)"
+    )
+    # A file without descriptions keeps the ones of the routes
+    cursor.execute(
+        f"UPDATE {ROUTES} SET description = r.description, updated_at = %s"
+        f" FROM import_route r WHERE {ROUTES}.id = r.route_pk"
+        f" AND r.description IS NOT NULL"
+        f" AND {ROUTES}.description <> r.description",
+        [now],
+    )
+    counts["routes"]["updated"] = cursor.rowcount
+    if connection.vendor == "postgresql":
+        # Planned with route_pk all empty, the joins below would expect
+        # one row and loop over the trips for every one
+        cursor.execute("ANALYZE import_route")
+
+    # Trips whose journey exists already are matched before inserting,
+    # as a statement searching the table it inserts into reads its own
+    # new rows again for every row
+    match = (
+        f"UPDATE import_trip SET journey_pk = journey.id"
+        f" FROM import_route route, {JOURNEYS} journey"
+        f" WHERE route.route_id = import_trip.route_id"
+        f" AND journey.route_id = route.route_pk"
+        f" AND journey.departure_time = import_trip.departure_time"
+        f" AND journey.train_id = import_trip.train_id"
+    )
+    cursor.execute(match)
+    cursor.execute(
+        f"UPDATE {JOURNEYS} SET arrival_time = t.arrival_time,"
+        f" updated_at = %s FROM import_trip t"
+        f" WHERE {JOURNEYS}.id = t.journey_pk"
+        f" AND {JOURNEYS}.arrival_time IS DISTINCT FROM t.arrival_time",
+        [now],
+    )
+    counts["journeys"]["updated"] = cursor.rowcount
+    if crew:
+        cursor.execute(
+            f"DELETE FROM {ASSIGNMENTS} WHERE journey_id IN ("
+            f" SELECT journey_pk FROM import_trip)"
+            f" AND NOT EXISTS (SELECT 1 FROM import_crew c"
+            f" JOIN import_trip t ON t.trip_id = c.trip_id"
+            f" WHERE t.journey_pk = {ASSIGNMENTS}.journey_id"
+            f" AND c.crew_id = {ASSIGNMENTS}.crew_id)"
+        )
+        counts["crew_assignments"]["deleted"] = cursor.rowcount
+
+    if connection.vendor == "postgresql":
+        minute, params = (
+            "EXTRACT(HOUR FROM t.departure_time AT TIME ZONE %s) * 60"
+            " + EXTRACT(MINUTE FROM t.departure_time AT TIME ZONE %s)",
+            [settings.TIME_ZONE, settings.TIME_ZONE, now],
+        )
+    else:
+        minute, params = "t.departure_minute", [now]
+    cursor.execute(
+        f"INSERT INTO {JOURNEYS} (route_id, train_id, departure_time,"
+        f" arrival_time, departure_minute, tickets_available, updated_at)"
+        f" SELECT route.route_pk, t.train_id, t.departure_time,"
+        f" t.arrival_time, {minute},"
+        f" train.cargo_num * train.places_in_cargo, %s"
+        f" FROM import_trip t"
+        f" JOIN import_route route ON route.route_id = t.route_id"
+        f" JOIN {TRAINS} train ON train.id = t.train_id"
+        f" WHERE t.journey_pk IS NULL",
+        params,
+    )
+    counts["journeys"]["inserted"] = cursor.rowcount
+
+    if (
+        counts["journeys"]["inserted"] >= ANALYZE_ROWS
+        and connection.vendor == "postgresql"
+    ):
+        # So that the new journeys are found through the index
+        cursor.execute(f"ANALYZE {JOURNEYS}")
+    cursor.execute(
+        f"{match} AND import_trip.journey_pk IS NULL"
+        f" AND import_trip.trip_id IN (SELECT trip_id FROM import_crew)"
+    )
+    cursor.execute(
+        f"INSERT INTO {ASSIGNMENTS} (journey_id, crew_id)"
+        f" SELECT DISTINCT t.journey_pk, c.crew_id FROM import_crew c"
+        f" JOIN import_trip t ON t.trip_id = c.trip_id"
+        f" WHERE true ON CONFLICT (journey_id, crew_id) DO NOTHING"
+    )
+    counts["crew_assignments"]["inserted"] = cursor.rowcount
+    return counts
+
+
+def import_timetable(directory: Path) -> tuple[int, dict]:
+    """
+    Load stations.csv, routes.csv, trips.csv and crew_assignments.csv
+    from the directory (any of them may be missing) in one transaction
+    and return the rows read and the rows inserted, updated or deleted
+    per table.
+
+    Stations are matched by name and updated, routes by their ends and
+    distance, journeys by route, train and departure; the crew of the
+    trips is replaced by crew_assignments.csv if given. route_id and
+    trip_id only link the rows of the files; train_id and crew_id are
+    ids of existing trains and crew. Departure and arrival times without
+    an offset are in TIME_ZONE.
+
+    The files are loaded as they are into temporary tables (with COPY
+    on PostgreSQL), checked there as a whole and merged with a few
+    set-based statements. Nothing is written if any row is at fault;
+    TimetableError lists the first of them.
+    """
+    directory = Path(directory)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        postgresql = connection.vendor == "postgresql"
+        if postgresql:
+            # Times without an offset are local, as in the API
+            cursor.execute("SET LOCAL TIME ZONE %s", [settings.TIME_ZONE])
+
+        for staging in FILES:
+            staging.create(cursor)
+            path = directory / staging.file
+            if path.exists():
+                rows += staging.load(cursor, path)
+
+        if postgresql:
+            cursor.execute(
+                "SET LOCAL TIME ZONE %s", [connection.timezone_name]
+            )
+        else:
+            _minutes(cursor)
+        for index, table, columns in (
+            ("import_route_idx", "import_route", "route_id"),
+            ("import_trip_idx", "import_trip", "trip_id"),
+            (
+                "import_trip_departure_idx",
+                "import_trip",
+                "route_id, train_id, departure_time",
+            ),
+        ):
+            cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+        if postgresql:
+            for staging in FILES:
+                cursor.execute(f"ANALYZE {staging.table}")
+
+        _validate(cursor)
+        counts = _upsert(
+            cursor, now, crew=(directory / CREW_FILE.file).exists()
+        )
+
+        for staging in FILES:
+            cursor.execute(f"DROP TABLE {staging.table}")
+
+    changed = {table: sum(count.values()) for table, count in counts.items()}
+    if changed["stations"]:
+        forget_station_index()
+        forget_station_clusters()
+        station_changes.reset()
+    if changed["stations"] or changed["routes"]:
+        forget_distances()
+    if changed["journeys"] or changed["crew_assignments"]:
+        journey_changes.reset()
+    bump_versions(
+        *(
+            model
+            for model, rows in (
+                (Station, changed["stations"]),
+                (Route, changed["routes"]),
+                (Journey, changed["journeys"] + changed["crew_assignments"]),
+            )
+            if rows
+        )
+    )
+    return rows, counts
+
+
+def _minutes(cursor) -> None:
+    """departure_minute of the trips where SQL cannot convert time zones"""
+    cursor.execute("SELECT line, departure_time FROM import_trip")
+    minutes = [
+        (Journey.minute_of_day(_parse_stored(moment)), line)
+        for line, moment in cursor.fetchall()
+        if moment is not None
+    ]
+    cursor.executemany(
+        "UPDATE import_trip SET departure_minute = %s WHERE line = %s",
+        minutes,
+    )
+
+
+def _parse_stored(value: str) -> datetime:
+    moment = parse_datetime(value)
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
@@ -7,19 +7,24 @@ from station.views import (
     StationViewSet,
     RouteViewSet,
     CrewViewSet,
+    JourneyTemplateViewSet,
     JourneyViewSet,
     OrderViewSet,
+    SeatHoldViewSet,
+    ExportViewSet,
 )
 
-
 router = routers.DefaultRouter()
 router.register("train_types", TrainTypeViewSet)
 router.register("trains", TrainViewSet)
 router.register("stations", StationViewSet)
 router.register("routes", RouteViewSet)
 router.register("crews", CrewViewSet)
+router.register("journey_templates", JourneyTemplateViewSet)
 router.register("journeys", JourneyViewSet)
 router.register("orders", OrderViewSet)
+router.register("seat_holds", SeatHoldViewSet)
+router.register("exports", ExportViewSet, basename="export")
 
 urlpatterns = [
     path("", include(router.urls)),
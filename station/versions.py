@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+
+def _keys(model) -> tuple[str, str]:
+    label = model._meta.label_lower
+    return f"station:version:{label}", f"station:modified:{label}"
+
+
+def _seed() -> int:
+    # Counters start from the clock in microseconds, so one that was
+    # evicted from the cache comes back larger than it ever was
+    return time.time_ns() // 1000
+
+
+def bump_versions(*tables) -> None:
+    """Move the version of the tables on once the transaction commits"""
+
+    def bump():
+        now = time.time()
+        for model in tables:
+            version_key, modified_key = _keys(model)
+            cache.add(version_key, _seed(), None)
+            cache.incr(version_key)
+            cache.set(modified_key, now, None)
+
+    transaction.on_commit(bump)
+
+
+def table_versions(tables: Iterable) -> tuple[list[int], datetime]:
+    """
+    Current version of each table and when any of them last changed,
+    read with one cache round trip
+    """
+    tables = list(tables)
+    keys = [key for model in tables for key in _keys(model)]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, _seed() if ":version:" in key else now, None)
+        found.update(cache.get_many(missing))
+
+    versions = [found[key] for key in keys[::2]]
+    modified = max(found[key] for key in keys[1::2])
+    return versions, datetime.fromtimestamp(modified, dt_timezone.utc)
+
+
+class VersionedQuerySet(models.QuerySet):
+    """
+    Bulk writes, which send no model signals, still move the table
+    version on and stamp updated_at where the model has one
+    """
+
+    def _stamps_updates(self) -> bool:
+        return any(
+            field.name == "updated_at" for field in self.model._meta.fields
+        )
+
+    def update(self, **kwargs) -> int:
+        if self._stamps_updates():
+            kwargs.setdefault("updated_at", timezone.now())
+        updated = super().update(**kwargs)
+        if updated:
+            bump_versions(self.model)
+        return updated
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            bump_versions(self.model)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs) -> int:
+        # Runs its batches through update()
+        objs = list(objs)
+        if self._stamps_updates():
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields = list(dict.fromkeys([*fields, "updated_at"]))
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    bulk_update.alters_data = True
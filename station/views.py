@@ -1,10 +1,30 @@
-from django.db.models import Q, F, Count
+import heapq
+import itertools
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db.models import Q, Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.mixins import ListModelMixin, CreateModelMixin
+from rest_framework.exceptions import ValidationError
+from rest_framework.mixins import (
+    ListModelMixin,
+    CreateModelMixin,
+    DestroyModelMixin,
+)
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import (
+    IsAuthenticated,
+    IsAdminUser,
+    IsAuthenticatedOrReadOnly,
+)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from station.models import (
@@ -14,8 +34,44 @@ from station.models import (
     Route,
     Crew,
     Journey,
+    JourneyTemplate,
     Order,
+    Ticket,
+    SeatHold,
+)
+from station.autocomplete import get_station_index, MAX_SUGGESTIONS
+from station.booking import (
+    hold_seats,
+    cancel_hold,
+    checkout_holds,
+    book_tickets,
+)
+from station.clusters import get_station_clusters
+from station.conditional import ConditionalGetMixin
+from station.distances import get_distance_matrix
+from station.exports import (
+    CSVRenderer,
+    NDJSONRenderer,
+    journey_rows,
+    ticket_rows,
+    order_rows,
 )
+from station.exceptions import SeatsTaken, NoContiguousSeats
+from station.nearby import nearby_stations, MAX_NEARBY
+from station.pagination import KeysetPagination, ApproximateTotalMixin
+from station.planner import plan_journeys
+from station.recurrence import (
+    Occurrence,
+    occurrences,
+    find_occurrence,
+    materialize,
+    parse_occurrence_id,
+)
+from station.scheduling import save_journeys, MAX_BULK_JOURNEYS
+from station.search import search_stations, station_ids
+from station.seatmap import SeatMap, get_seat_map
+from station.snapshots import snapshot_state, start_snapshot
+from station.swr import StaleWhileRevalidateMixin
 from station.serializers import (
     TrainTypeSerializer,
     TrainSerializer,
@@ -26,26 +82,53 @@ from station.serializers import (
     RouteListSerializer,
     CrewSerializer,
     JourneySerializer,
-    JourneyListSerializer,
+    JourneyTemplateSerializer,
+    JourneyOccurrenceSerializer,
+    JourneyBulkSerializer,
+    JourneyBulkQuerySerializer,
+    JourneyBulkResultSerializer,
+    JourneyRowSerializer,
+    JourneyRowListSerializer,
     JourneyDetailSerializer,
+    JourneySeatMapSerializer,
+    JourneyPlanQuerySerializer,
+    JourneyPlanSerializer,
     OrderSerializer,
     OrderListSerializer,
     TrainImageSerializer,
     StationListSerializer,
     StationDetailSerializer,
     StationImageSerializer,
+    StationSuggestionSerializer,
+    StationDistanceSerializer,
+    StationDistanceMatrixSerializer,
+    NearbyQuerySerializer,
+    NearbyStationSerializer,
+    StationClusterQuerySerializer,
+    StationClustersSerializer,
     CrewDetailSerializer,
+    SeatHoldSerializer,
+    SeatHoldCreateSerializer,
+    SeatHoldCheckoutSerializer,
+    SeatAllocationSerializer,
+    ExportQuerySerializer,
+    TicketExportQuerySerializer,
+    SnapshotSerializer,
 )
 
 
-class TrainTypeViewSet(viewsets.ModelViewSet):
+class TrainTypeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TrainTypeSerializer
     queryset = TrainType.objects.all()
+    version_tables = (TrainType,)
+    cache_responses = True
 
 
-class TrainViewSet(viewsets.ModelViewSet):
+class TrainViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TrainSerializer
     queryset = Train.objects.all()
+    version_tables = (Train, TrainType)
+    cache_responses = True
 
     def get_serializer_class(self):
         if self.action in ["list", "retrieve"]:
@@ -90,9 +173,14 @@ class TrainViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class StationViewSet(viewsets.ModelViewSet):
+MAX_MATRIX_STATIONS = 500
+
+
+class StationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = StationSerializer
     queryset = Station.objects.all()
+    version_tables = (Station,)
+    cache_responses = True
 
     def get_queryset(self):
         queryset = self.queryset
@@ -102,7 +190,7 @@ class StationViewSet(viewsets.ModelViewSet):
 
         name = self.request.query_params.get("name")
         if name:
-            queryset = queryset.filter(name__icontains=name)
+            queryset = search_stations(name)
 
         return queryset
 
@@ -116,6 +204,15 @@ class StationViewSet(viewsets.ModelViewSet):
         if self.action == "upload_image":
             return StationImageSerializer
 
+        if self.action == "autocomplete":
+            return StationSuggestionSerializer
+
+        if self.action == "nearby":
+            return NearbyQuerySerializer
+
+        if self.action == "clusters":
+            return StationClusterQuerySerializer
+
         return self.serializer_class
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
@@ -127,12 +224,138 @@ class StationViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type=str,
+                description="Beginning of a station name or of a word in"
+                " it, one typo allowed (ex. ?q=lvo)",
+            ),
+            OpenApiParameter(
+                "limit",
+                type=int,
+                description=f"How many suggestions to return, at most"
+                f" {MAX_SUGGESTIONS} (ex. ?limit=5)",
+            ),
+        ],
+        responses=StationSuggestionSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False)
+    def autocomplete(self, request):
+        """Type-ahead station suggestions served from memory"""
+        limit = parse_param(
+            "limit", request.query_params.get("limit", "10"), int
+        )
+        suggestions = get_station_index().suggest(
+            request.query_params.get("q", ""), limit
+        )
+        return Response(suggestions)
+
+    @extend_schema(
+        parameters=[NearbyQuerySerializer],
+        responses=NearbyStationSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False)
+    def nearby(self, request):
+        """
+        Endpoint for the k nearest stations to a point (10 by default)
+        or for the ones within radius km of it (at most k, or
+        MAX_NEARBY), nearest first
+        (ex. ?lat=49.84&lon=24.03&k=5, ?lat=49.84&lon=24.03&radius=30)
+        """
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        radius = query.get("radius")
+        k = query.get("k", 10 if radius is None else MAX_NEARBY)
+
+        stations = nearby_stations(query["lat"], query["lon"], k, radius)
+        return Response(stations)
+
+    @extend_schema(
+        parameters=[StationClusterQuerySerializer],
+        responses=StationClustersSerializer,
+    )
+    @action(methods=["GET"], detail=False)
+    def clusters(self, request):
+        """
+        Endpoint for drawing the stations on a map: those in the grid
+        cells the viewport touches, counted per cell, precomputed for
+        every zoom. A viewport too large for the zoom is served from a
+        coarser grid, so there are never more than MAX_CELLS clusters
+        (ex. ?bbox=22.1,44.3,40.2,52.4&zoom=6)
+        """
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+
+        zoom, clusters = get_station_clusters().clusters(
+            *query["bbox"], query["zoom"]
+        )
+        return Response({"zoom": zoom, "clusters": clusters})
+
+    @extend_schema(responses=StationDistanceSerializer(many=True))
+    @action(methods=["GET"], detail=True)
+    def distances(self, request, pk=None):
+        """
+        Endpoint for the shortest distances over the route network from
+        a station to every station reachable from it, nearest first
+        """
+        station = self.get_object()
+        return Response(get_distance_matrix().from_station(station.id))
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                type=str,
+                description="Comma separated station ids, all stations by"
+                f" default (at most {MAX_MATRIX_STATIONS};"
+                " ex. ?ids=1,4,7)",
+            ),
+        ],
+        responses=StationDistanceMatrixSerializer,
+    )
+    @action(methods=["GET"], detail=False, url_path="distances")
+    def distance_matrix(self, request):
+        """
+        Endpoint for shortest distances between every pair of the
+        stations: distances[i][j] is from stations[i] to stations[j],
+        null where there is no way
+        """
+        ids = request.query_params.get("ids")
+        if ids:
+            stations = [
+                parse_param("ids", station_id, int)
+                for station_id in ids.split(",")
+            ]
+        else:
+            stations = list(
+                Station.objects.order_by("id").values_list("id", flat=True)[
+                    : MAX_MATRIX_STATIONS + 1
+                ]
+            )
+        if len(stations) > MAX_MATRIX_STATIONS:
+            raise ValidationError(
+                {"ids": f"Ask for at most {MAX_MATRIX_STATIONS} stations."}
+            )
+
+        matrix = get_distance_matrix()
+        return Response(
+            {
+                "stations": stations,
+                "distances": matrix.between(stations),
+            }
+        )
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 "name",
                 type=str,
-                description="Filter by name (ex. ?title=North Station)",
+                description="Search by name, best match first"
+                " (ex. ?name=North Station)",
             ),
         ]
     )
@@ -140,9 +363,11 @@ class StationViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = RouteSerializer
     queryset = Route.objects.all()
+    version_tables = (Route, Station)
+    cache_responses = True
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -158,12 +383,12 @@ class RouteViewSet(viewsets.ModelViewSet):
 
         source = self.request.query_params.get("source")
         if source:
-            queryset = queryset.filter(source__name__icontains=source)
+            queryset = queryset.filter(source_id__in=station_ids(source))
 
         destination = self.request.query_params.get("destination")
         if destination:
             queryset = queryset.filter(
-                destination__name__icontains=destination
+                destination_id__in=station_ids(destination)
             )
 
         if self.action == "list":
@@ -189,10 +414,11 @@ class RouteViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CrewSerializer
     queryset = Crew.objects.all()
     permission_classes = [IsAdminUser]
+    version_tables = (Crew,)
 
     def get_queryset(self):
         queryset = Crew.objects.all()
@@ -240,59 +466,243 @@ class CrewViewSet(viewsets.ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class JourneyViewSet(viewsets.ModelViewSet):
+SEAT_FORMATS = ("list", "bitmap", "rle")
+
+
+def parse_param(name: str, value: str, parse):
+    try:
+        return parse(value)
+    except ValueError:
+        raise ValidationError({name: f"Invalid value: {value}"})
+
+
+class JourneyTemplateViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    serializer_class = JourneyTemplateSerializer
+    queryset = JourneyTemplate.objects.prefetch_related("crew_members")
+    version_tables = (JourneyTemplate,)
+
+
+class JourneyPagination(KeysetPagination):
+    """
+    Journeys merged with the occurrences of templates, which come after
+    the journeys leaving at the same time, keyed by -template id
+    """
+
+    ordering = ("-departure_time", "-id")
+    page_size = 20
+
+    def fetch(self, queryset, ordering, key, limit):
+        descending = ordering[0].startswith("-")
+        rows = super().fetch(queryset, ordering, key, limit)
+        # A full page of journeys ends at the last one at the latest
+        until = self.row_key(rows[-1])[0] if len(rows) == limit else None
+        merged = heapq.merge(
+            rows,
+            self.view.occurrence_rows(descending, key, until),
+            key=self.row_key,
+            reverse=descending,
+        )
+        return list(itertools.islice(merged, limit))
+
+    def row_key(self, row) -> list:
+        if "template_id" in row:
+            return [row["departure_time"], -row["template_id"]]
+        return super().row_key(row)
+
+
+class JourneyViewSet(
+    ConditionalGetMixin, StaleWhileRevalidateMixin, viewsets.ModelViewSet
+):
     serializer_class = JourneySerializer
     queryset = Journey.objects.all()
+    pagination_class = JourneyPagination
+    version_tables = (
+        Journey,
+        JourneyTemplate,
+        Route,
+        Station,
+        Train,
+        TrainType,
+        Crew,
+        Ticket,
+        SeatHold,
+    )
+    # Held seats stop showing once their holds expire
+    validators_lifetime = 60
 
     def get_serializer_class(self):
         if self.action == "list":
-            return JourneyListSerializer
+            return JourneyRowSerializer
 
         if self.action == "retrieve":
+            if self.seat_format != "list":
+                return JourneySeatMapSerializer
             return JourneyDetailSerializer
 
-        return self.serializer_class
+        if self.action == "allocate":
+            return SeatAllocationSerializer
 
-    def get_queryset(self):
-        queryset = self.queryset
+        if self.action == "plan":
+            return JourneyPlanQuerySerializer
+
+        if self.action == "bulk":
+            return JourneyBulkSerializer
+
+        return self.serializer_class
 
+    @cached_property
+    def search(self) -> tuple[Q, Optional[date], Optional[time]]:
+        """
+        The filters of the query: on the route (which journeys and their
+        templates both have), the local day and time of departure
+        """
         source = self.request.query_params.get("source")
         destination = self.request.query_params.get("destination")
+        source_id = self.request.query_params.get("source_id")
+        destination_id = self.request.query_params.get("destination_id")
         departure_date = self.request.query_params.get("departure_date")
         departure_time = self.request.query_params.get("departure_time")
 
+        route = Q()
         if source:
-            queryset = queryset.filter(route__source__name__icontains=source)
+            route &= Q(route__source_id__in=station_ids(source))
 
         if destination:
-            queryset = queryset.filter(
-                route__destination__name__icontains=destination
+            route &= Q(route__destination_id__in=station_ids(destination))
+
+        if source_id:
+            route &= Q(
+                route__source_id=parse_param("source_id", source_id, int)
+            )
+
+        if destination_id:
+            route &= Q(
+                route__destination_id=parse_param(
+                    "destination_id", destination_id, int
+                )
             )
 
+        day = moment = None
         if departure_date:
-            queryset = queryset.filter(departure_time__date=departure_date)
+            day = parse_param(
+                "departure_date", departure_date, date.fromisoformat
+            )
 
         if departure_time:
-            queryset = queryset.filter(departure_time__time=departure_time)
+            moment = parse_param(
+                "departure_time", departure_time, time.fromisoformat
+            )
+        return route, day, moment
 
-        if self.action in ["list", "retrieve"]:
-            queryset = (
-                queryset.select_related(
-                    "train__train_type", "route__source", "route__destination"
-                )
-                .prefetch_related("crew_members")
-                .annotate(
-                    tickets_available=(
-                        (
-                            F("train__cargo_num")
-                            * F("train__places_in_cargo")
-                            - Count("tickets")
-                        )
-                    )
-                )
+    def get_queryset(self):
+        route, day, moment = self.search
+        queryset = self.queryset.filter(route)
+
+        if day is not None:
+            queryset = queryset.departing_on(day)
+
+        if moment is not None:
+            queryset = queryset.departing_at(moment)
+
+        if self.action == "list":
+            # Only the columns shown, rendered without model instances
+            queryset = queryset.values(*JourneyRowListSerializer.COLUMNS)
+
+        if self.action == "retrieve":
+            queryset = queryset.select_related(
+                "train__train_type", "route__source", "route__destination"
+            ).prefetch_related("crew_members")
+
+        if self.action == "retrieve" and self.seat_format == "list":
+            queryset = queryset.prefetch_related(
+                "tickets",
+                Prefetch("holds", queryset=SeatHold.objects.active()),
             )
         return queryset
 
+    def occurrence_rows(
+        self, descending: bool, key, until: Optional[datetime] = None
+    ) -> Iterator[dict]:
+        """
+        Rows of the occurrences of templates the search matches up to
+        until, for JourneyPagination to merge with the journeys
+        """
+        route, day, moment = self.search
+        templates = JourneyTemplate.objects.filter(route).select_related(
+            "route__source", "route__destination", "train__train_type"
+        )
+        if day is not None:
+            templates = templates.filter(
+                valid_from__lte=day, valid_until__gte=day
+            )
+        if moment is not None:
+            templates = templates.filter(
+                departure=moment.replace(second=0, microsecond=0)
+            )
+        return map(
+            JourneyRowListSerializer.occurrence_row,
+            occurrences(templates, descending, key, day, day, until),
+        )
+
+    def get_object(self):
+        """
+        Occurrences of templates (ex. 12@2030-01-03) are shown as they
+        are, and made into journeys to be changed
+        """
+        occurrence = parse_occurrence_id(self.kwargs[self.lookup_field])
+        if occurrence is None:
+            return super().get_object()
+
+        try:
+            if self.action == "retrieve":
+                journey = find_occurrence(*occurrence)
+            else:
+                journey = materialize(*occurrence)
+        except Journey.DoesNotExist:
+            raise Http404
+        if isinstance(journey, Occurrence):
+            self.check_object_permissions(self.request, journey)
+            return journey
+
+        self.kwargs[self.lookup_field] = str(journey.pk)
+        return super().get_object()
+
+    def get_serializer(self, *args, **kwargs):
+        if args and isinstance(args[0], Occurrence):
+            kwargs.setdefault("context", self.get_serializer_context())
+            return JourneyOccurrenceSerializer(*args, **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+    @property
+    def seat_format(self) -> str:
+        seat_format = self.request.query_params.get("seat_format", "list")
+        if seat_format not in SEAT_FORMATS:
+            raise ValidationError(
+                {"seat_format": f"Choose one of: {', '.join(SEAT_FORMATS)}."}
+            )
+        return seat_format
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == "retrieve":
+            context["seat_format"] = self.seat_format
+        return context
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "seat_format",
+                type=str,
+                enum=SEAT_FORMATS,
+                description="How to show occupied seats: list of taken and"
+                " held seats (default), base64 bitmap or run lengths"
+                " per cargo (ex. ?seat_format=bitmap)",
+            ),
+        ]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -305,23 +715,200 @@ class JourneyViewSet(viewsets.ModelViewSet):
                 type=str,
                 description="Filter by destination (ex. ?destination=Rabat)",
             ),
+            OpenApiParameter(
+                "source_id",
+                type=int,
+                description="Filter by source station id (ex. ?source_id=3)",
+            ),
+            OpenApiParameter(
+                "destination_id",
+                type=int,
+                description="Filter by destination station id"
+                " (ex. ?destination_id=7)",
+            ),
             OpenApiParameter(
                 "departure_date",
                 type=str,
-                description="Filter by date of departure"
+                description="Filter by local date of departure"
                 " (ex. ?departure_date=2024-01-03)",
             ),
             OpenApiParameter(
                 "departure_time",
                 type=str,
-                description="Filter by time of departure"
-                " (ex. ?departure_time=21:38)",
+                description="Filter by local time of departure, to the"
+                " minute (ex. ?departure_time=21:38)",
             ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "party_size",
+                type=int,
+                description="Number of adjacent seats needed"
+                " (ex. ?party_size=4)",
+            ),
+        ]
+    )
+    @action(
+        methods=["GET", "POST"],
+        detail=True,
+        url_path="allocate",
+        permission_classes=[IsAuthenticatedOrReadOnly],
+    )
+    def allocate(self, request, pk=None):
+        """
+        Endpoint for the best block of adjacent free seats in one cargo.
+        GET suggests the seats, POST books them.
+        """
+        occurrence = parse_occurrence_id(pk)
+        try:
+            if occurrence is None:
+                journey = Journey.objects.select_related("train").get(pk=pk)
+            else:
+                journey = find_occurrence(*occurrence)
+        except (Journey.DoesNotExist, ValueError):
+            raise Http404
+        if request.method == "GET":
+            serializer = self.get_serializer(data=request.query_params)
+        else:
+            serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        party_size = serializer.validated_data["party_size"]
+
+        # A cached map may lag behind a booking made elsewhere, so a
+        # conflict gets one more try with a freshly built map
+        for attempt in range(2):
+            if attempt and isinstance(journey, Occurrence):
+                # Made into a journey by the booking that got in first
+                journey = find_occurrence(journey.template.pk, journey.day)
+            if isinstance(journey, Occurrence):
+                train = journey.template.train
+                seat_map = SeatMap(train.cargo_num, train.places_in_cargo, ())
+            else:
+                seat_map = get_seat_map(journey, rebuild=bool(attempt))
+            block = seat_map.best_block(party_size)
+            if block is None:
+                raise NoContiguousSeats()
+            cargo, seats = block
+
+            if request.method == "GET":
+                return Response(
+                    {"party_size": party_size, "cargo": cargo, "seats": seats}
+                )
+
+            try:
+                order = book_tickets(
+                    [
+                        {"journey": journey, "cargo": cargo, "seat": seat}
+                        for seat in seats
+                    ],
+                    user=request.user,
+                )
+            except SeatsTaken:
+                if attempt:
+                    raise
+            else:
+                return Response(
+                    OrderSerializer(order).data,
+                    status=status.HTTP_201_CREATED,
+                )
+
+    @extend_schema(
+        parameters=[JourneyPlanQuerySerializer],
+        responses=JourneyPlanSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False)
+    def plan(self, request):
+        """
+        Endpoint for itineraries between two stations, with changes if
+        needed: the one with the fewest transfers first and the earliest
+        arrival last (ex. ?source=1&destination=5&after=2024-01-03T08:00)
+        """
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        min_transfer = settings.PLANNER_MIN_TRANSFER
+        if "min_transfer" in query:
+            min_transfer = timedelta(minutes=query["min_transfer"])
+
+        itineraries = plan_journeys(
+            query["source"].pk,
+            query["destination"].pk,
+            query.get("after") or timezone.now(),
+            min_transfer,
+            query["passengers"],
+            query["max_legs"],
+        )
+        return Response(JourneyPlanSerializer(itineraries, many=True).data)
+
+    @extend_schema(
+        parameters=[JourneyBulkQuerySerializer],
+        request=JourneyBulkSerializer(many=True),
+        responses=JourneyBulkResultSerializer(many=True),
+    )
+    @action(methods=["POST"], detail=False)
+    def bulk(self, request):
+        """
+        Endpoint for creating journeys, and updating the ones with an id,
+        many at once (ex. a week of the whole fleet). Every journey gets
+        a result in the order sent; the valid ones are saved, unless
+        ?atomic=true and any journey is invalid.
+        """
+        query = JourneyBulkQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        if not isinstance(request.data, list):
+            raise ValidationError("Send a list of journeys.")
+        if len(request.data) > MAX_BULK_JOURNEYS:
+            raise ValidationError(
+                f"Send at most {MAX_BULK_JOURNEYS} journeys at once."
+            )
+
+        items, errors = {}, {}
+        for index, data in enumerate(request.data):
+            serializer = self.get_serializer(data=data)
+            if serializer.is_valid():
+                items[index] = serializer.validated_data
+            else:
+                errors[index] = serializer.errors
+        atomic = query.validated_data["atomic"]
+        saved = save_journeys(items, errors, atomic)
+
+        results = []
+        for index in range(len(request.data)):
+            if index in errors:
+                journey = items.get(index, {}).get("id")
+                results.append(
+                    {
+                        "id": journey,
+                        "status": "invalid",
+                        "errors": errors[index],
+                    }
+                )
+            elif index in saved:
+                journey, created = saved[index]
+                results.append(
+                    {
+                        "id": journey,
+                        "status": "created" if created else "updated",
+                    }
+                )
+            else:
+                results.append(
+                    {"id": items[index].get("id"), "status": "skipped"}
+                )
+        return Response(
+            JourneyBulkResultSerializer(results, many=True).data,
+            status=(
+                status.HTTP_400_BAD_REQUEST
+                if atomic and errors
+                else status.HTTP_200_OK
+            ),
+        )
+
 
 class OrderPagination(PageNumberPagination):
     page_size = 8
@@ -329,7 +916,14 @@ class OrderPagination(PageNumberPagination):
     max_page_size = 100
 
 
+class OrderCursorPagination(ApproximateTotalMixin, KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 8
+    max_page_size = 100
+
+
 class OrderViewSet(
+    ConditionalGetMixin,
     viewsets.GenericViewSet,
     ListModelMixin,
     CreateModelMixin,
@@ -341,6 +935,18 @@ class OrderViewSet(
     )
     pagination_class = OrderPagination
     permission_classes = [IsAuthenticated]
+    version_tables = (Order, Ticket, Journey, Route, Station)
+
+    @property
+    def paginator(self):
+        """Keyset pages for ?pagination=cursor, numbered pages otherwise"""
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                self._paginator = OrderCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -361,3 +967,193 @@ class OrderViewSet(
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "pagination",
+                type=str,
+                enum=["page", "cursor"],
+                description="Use cursor pages, which stay fast however deep"
+                " you go (ex. ?pagination=cursor)",
+            ),
+            OpenApiParameter(
+                "cursor",
+                type=str,
+                description="Cursor from the next/previous link",
+            ),
+            OpenApiParameter(
+                "total",
+                type=str,
+                enum=["approximate"],
+                description="Add a total capped at 1000 orders to cursor"
+                " pages (ex. ?pagination=cursor&total=approximate)",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class SeatHoldViewSet(
+    viewsets.GenericViewSet,
+    ListModelMixin,
+    CreateModelMixin,
+    DestroyModelMixin,
+):
+    serializer_class = SeatHoldSerializer
+    queryset = SeatHold.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_class(self):
+        if self.action == "create":
+            return SeatHoldCreateSerializer
+
+        if self.action == "checkout":
+            return SeatHoldCheckoutSerializer
+
+        return self.serializer_class
+
+    def get_queryset(self):
+        return self.queryset.active().filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        """Hold seats of a journey for SEAT_HOLD_TTL before buying them"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        journey = serializer.validated_data["journey"]
+        holds = hold_seats(
+            request.user,
+            [
+                {"journey": journey, **seat}
+                for seat in serializer.validated_data["seats"]
+            ],
+        )
+        return Response(
+            SeatHoldSerializer(holds, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def perform_destroy(self, instance):
+        cancel_hold(instance)
+
+    @action(methods=["POST"], detail=False, url_path="checkout")
+    def checkout(self, request):
+        """Endpoint for buying the held seats"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = checkout_holds(
+            request.user, serializer.validated_data["holds"]
+        )
+        return Response(
+            OrderSerializer(order).data, status=status.HTTP_201_CREATED
+        )
+
+
+class ExportViewSet(viewsets.GenericViewSet):
+    """
+    Bulk data for staff as CSV (the default) or NDJSON
+    (ex. Accept: application/x-ndjson or ?format=ndjson), streamed from
+    a server-side cursor while it is read
+    """
+
+    permission_classes = [IsAdminUser]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    serializer_class = ExportQuerySerializer
+
+    def get_serializer_class(self):
+        if self.action == "tickets":
+            return TicketExportQuerySerializer
+
+        if self.action == "snapshot":
+            return SnapshotSerializer
+
+        return self.serializer_class
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Only the exports are streamed; errors and OPTIONS are answered
+        # in JSON whichever format was asked for
+        if isinstance(response, Response):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def query(self) -> dict:
+        serializer = self.get_serializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def export(self, name: str, rows: tuple) -> StreamingHttpResponse:
+        renderer = self.request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(*rows),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{name}.{renderer.format}"'
+        )
+        return response
+
+    @extend_schema(
+        parameters=[ExportQuerySerializer], responses={200: OpenApiTypes.STR}
+    )
+    @action(methods=["GET"], detail=False)
+    def journeys(self, request):
+        """
+        Endpoint for journeys departing from start to end (inclusive,
+        both optional) with their free seats (ex. ?start=2024-01-01)
+        """
+        query = self.query()
+        return self.export(
+            "journeys", journey_rows(query.get("start"), query.get("end"))
+        )
+
+    @extend_schema(
+        parameters=[TicketExportQuerySerializer],
+        responses={200: OpenApiTypes.STR},
+    )
+    @action(methods=["GET"], detail=False)
+    def tickets(self, request):
+        """Endpoint for the tickets of a journey (ex. ?journey=1)"""
+        journey = self.query()["journey"]
+        return self.export(
+            f"journey-{journey.pk}-tickets", ticket_rows(journey)
+        )
+
+    @extend_schema(
+        parameters=[ExportQuerySerializer], responses={200: OpenApiTypes.STR}
+    )
+    @action(methods=["GET"], detail=False)
+    def orders(self, request):
+        """
+        Endpoint for orders placed from start to end (inclusive, both
+        optional) with the number of their tickets
+        (ex. ?start=2024-01-01&end=2024-01-31)
+        """
+        query = self.query()
+        return self.export(
+            "orders", order_rows(query.get("start"), query.get("end"))
+        )
+
+    @extend_schema(request=SnapshotSerializer, responses={202: None})
+    @action(
+        methods=["GET", "POST"],
+        detail=False,
+        renderer_classes=[JSONRenderer],
+    )
+    def snapshot(self, request):
+        """
+        Endpoint for the state of the columnar snapshot for analytics in
+        SNAPSHOTS_DIR (GET), or for bringing it up to date in the
+        background (POST)
+        """
+        if request.method == "GET":
+            return Response(snapshot_state())
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        start_snapshot(
+            serializer.validated_data["format"],
+            serializer.validated_data["full"],
+        )
+        return Response(status=status.HTTP_202_ACCEPTED)
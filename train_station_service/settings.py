@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "drf_spectacular",
@@ -119,6 +120,33 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "user.User"
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Local memory by default. With several workers, point CACHE_BACKEND and
+# CACHE_LOCATION at a shared cache (ex.
+# django.core.cache.backends.redis.RedisCache, redis://redis:6379) so
+# that they all see the same table versions and change logs.
+# Rendered responses of public reference data go to their own cache,
+# configured the same way with RESPONSE_CACHE_BACKEND and
+# RESPONSE_CACHE_LOCATION (ex. a file-based one).
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    },
+    "responses": {
+        "BACKEND": os.getenv(
+            "RESPONSE_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("RESPONSE_CACHE_LOCATION", "responses"),
+        "TIMEOUT": int(os.getenv("RESPONSE_CACHE_TIMEOUT", 60 * 60)),
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -138,6 +166,14 @@ MEDIA_ROOT = BASE_DIR / "vol/web/media"
 
 MEDIA_URL = "/media/"
 
+# Precomputed shortest distances between stations (memory-mapped files)
+STATION_DISTANCES_DIR = BASE_DIR / "vol/web/distances"
+
+# Columnar snapshots of the booking tables for analytics
+SNAPSHOTS_DIR = Path(
+    os.getenv("SNAPSHOTS_DIR", BASE_DIR / "vol/web/snapshots")
+)
+
 STATIC_URL = "static/"
 
 # Default primary key field type
@@ -169,3 +205,18 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+
+SEAT_HOLD_TTL = timedelta(minutes=10)
+
+# Journey planner: shortest time to change trains, and the speed (km/h)
+# used to estimate arrival of journeys that have no arrival_time
+PLANNER_MIN_TRANSFER = timedelta(minutes=10)
+PLANNER_AVERAGE_SPEED = 60
+
+# Searches served through a stale-while-revalidate cache, per viewset
+# basename: once the data changes, a result is still served for "fresh"
+# seconds after it was computed, then for "stale" seconds more while one
+# background refresh recomputes it
+SEARCH_CACHE_FRESHNESS = {
+    "journey": {"fresh": 10, "stale": 120},
+}